@@ -1,6 +1,8 @@
+import asyncio
 import time
-from typing import Any
+from typing import Any, AsyncIterator
 from ChatStateSystem.DefaultChatStateSystem import DefaultChatStateSystem
+from ContextAssembler.ContextPacker import ContextPacker
 from ContextAssembler.DefaultGlobalContextAssembler import DefaultGlobalContextAssembler
 from DataClass.EventType import EventType
 from EventBus import EventBus
@@ -8,10 +10,14 @@ from LLM.LLMManagement import LLMManagement
 from DataClass.ChatMessage import ChatMessage
 from PerceptionSystem.PerceptionSystem import PerceptionSystem
 from MemorySystem.MemorySystem import MemorySystem
+from MemorySystem.RetrievalPipeline import RetrievalPipeline
 from loguru import logger
-from src.logging_config import timeit_logger
+from src.logging_config import timing
 from QuerySystem.DefaultQuerySchemaBuilder import DefaultQuerySchemaBuilder
+from QuerySystem.LowSignalGate import LowSignalGate
 from tools.tools import tools
+from tools.TokenCounter import TokenCounter
+from tools.ConfigWatcher import ConfigWatcher
 
 from PostTreatmentSystem.PostHandleSystem import PostHandleSystem
 from PostTurnProcessor import PostTurnProcessor
@@ -33,21 +39,54 @@ class Alice:
     - default_dialogue_length: 原始聊天历史的摘要最大长度（轮数）/缓存多少轮摘要
     - db_path: 聊天历史数据库路径
     - db_echo: 是否开启数据库操作日志
+    - db_performance_mode / db_mmap_size / db_cache_size_kb / db_busy_timeout_ms / db_writer_max_batch / db_writer_max_wait_ms: 见 SqlitManagementSystem
     - analysis_window: 聊天状态分析窗口大小（轮数）
+    - ollama_base_url / ollama_read_timeout / model_concurrency 等: 透传给 LLMManagement 的共享连接池
+    - ollama_keep_alive / pinned_models: 模型常驻设置，pinned_models 中的模型 keep_alive=-1
+    - llm_cache / llm_cache_ttl / llm_cache_db_path 等: temperature=0 的 generate 结果缓存，见 LLMResponseCache
+    - ltp_profile / ltp_fast_max_chars / ltp_lazy_deep: LTP 任务档位与深层任务延后计算，见 LtpAnalyze
+    - perception_mode: separate（默认）或 fused（text_analysis 与 intent_classifier 合并为一次调用）
+    - low_signal_gate: 是否启用低信号快速链路（默认开启），命中的消息跳过感知与意图分类
+    - low_signal_max_chars: 透传给 LowSignalGate
+    - slim_history_window: 快速链路携带的原始对话条数
+    - prompt_layout: system prompt 布局，classic（默认）或 prefix_stable（前缀稳定，便于复用 KV cache）
+    - config_hot_reload: 是否监视 template_input.yaml / system_prompt.yaml 并热更新（默认开启）
+    - config_watch_interval: 配置文件轮询间隔（秒）
+    - vector_memory / vector_embedder / vector_memory_path 等: 向量记忆，见 MemoryStorage / VectorMemoryStore
+    - retrieval: 是否启用 QuerySchema 驱动的记忆检索阶段（默认开启）
+    - retrieval_history_window: 本轮有召回记忆时携带的原始对话条数（代替 history_window）
+    - retrieval_timeout / retrieval_source_weights 等: 透传给 RetrievalPipeline
+    - token_counter / tokenizer_model: token 计数方式（approx 近似计数或 transformers 分词器），见 TokenCounter
+    - context_token_budget / context_section_budgets 等: prompt 的 token 预算，见 ContextPacker
+    - analyze_prompt_mode: 分析结果块的渲染方式，compact（默认）或 full，见 AnalyzePromptCache
 
 
     """
+    DEFAULT_ERROR_MSG = "抱歉，生成响应时出错。请稍后再试。"
+
     def __init__(self, **kwargs):
         self.history_window = kwargs.get("history_window", 20)
         self.dialogue_window = kwargs.get("dialogue_window", 4)
         self.min_raw_for_summary = kwargs.get("min_raw_for_summary", 4)
 
         self.system_prompt = SystemPrompt()
-        self.llm_management = LLMManagement(self.system_prompt)
+        # token 计数器由 ContextPacker / RetrievalPipeline / OllamaChat（cached token 统计）共用
+        self.token_counter = TokenCounter.create(**kwargs)
+        self.llm_management = LLMManagement(self.system_prompt, prompt_token_counter=self.token_counter, **kwargs)
         
         self.event_bus = EventBus()
 
-        self.perception_system = PerceptionSystem(self.llm_management, **kwargs)
+        self.query_builder = DefaultQuerySchemaBuilder(
+            llm_management=self.llm_management,
+            template_path="config/template_input.yaml"
+        )
+        # fused 感知模式下，感知阶段直接产出意图，候选意图与 IntentJudgeL 共用
+        intent_judge = self.query_builder.getBuilder("IntentJudgeL")
+        self.perception_system = PerceptionSystem(
+            self.llm_management,
+            router_input_builder=getattr(intent_judge, "build_router_input", None),
+            **kwargs,
+        )
 
         
 
@@ -56,16 +95,20 @@ class Alice:
                 history_length= kwargs.get("default_history_length", 100), 
                 dialogue_length= kwargs.get("default_dialogue_length", 20), 
                 db_path= kwargs.get("db_path", "chat_history.db"), 
-                echo= kwargs.get("db_echo", True)
+                echo= kwargs.get("db_echo", True),
+                **{k: v for k, v in kwargs.items() if k.startswith("db_") and k not in ("db_path", "db_echo")},
         )
 
 
 
 
-        self.query_builder = DefaultQuerySchemaBuilder(
-            llm_management=self.llm_management,
-            template_path="config/template_input.yaml"
-        )
+        self.low_signal_gate: LowSignalGate | None = None
+        if kwargs.get("low_signal_gate", True):
+            self.low_signal_gate = LowSignalGate(
+                template_path="config/template_input.yaml",
+                low_signal_max_chars=kwargs.get("low_signal_max_chars", 4),
+            )
+        self.slim_history_window = kwargs.get("slim_history_window", 6)
 
 
         self.memory_system = MemorySystem(
@@ -73,7 +116,8 @@ class Alice:
             self.dialogue_window, 
             self.min_raw_for_summary,
             self.raw_history, 
-            self.llm_management
+            self.llm_management,
+            **kwargs
         )
         self.chat_state_system = DefaultChatStateSystem(
             llm_management=self.llm_management,
@@ -97,40 +141,168 @@ class Alice:
         
 
 
+        self.retrieval_pipeline: RetrievalPipeline | None = None
+        if kwargs.get("retrieval", True):
+            self.retrieval_pipeline = RetrievalPipeline(self.memory_system.storage, self.token_counter, **kwargs)
+
         self.assembler = DefaultGlobalContextAssembler(
             memory_system=self.memory_system,  # 后续设置
             chat_state_system=self.chat_state_system,  # 后续设置
             system_prompt=self.system_prompt,
             history_window=self.history_window,
             analysis_window=kwargs.get("analysis_window",3),
+            layout=kwargs.get("prompt_layout", "classic"),
+            retrieval_pipeline=self.retrieval_pipeline,
+            retrieval_history_window=kwargs.get("retrieval_history_window", 8),
+            packer=ContextPacker(self.token_counter, **kwargs),
+            analyze_mode=kwargs.get("analyze_prompt_mode", "compact"),
         )
 
+        self.config_watcher: ConfigWatcher | None = None
+        if kwargs.get("config_hot_reload", True):
+            self.config_watcher = ConfigWatcher(**kwargs)
+            self.config_watcher.watch("config/template_input.yaml", self.query_builder.reload)
+            if self.low_signal_gate is not None:
+                self.config_watcher.watch("config/template_input.yaml", self.low_signal_gate.reload)
+            self.config_watcher.watch(str(self.system_prompt.yaml_path), self.system_prompt.load_template)
+            self.config_watcher.watch(str(self.system_prompt.yaml_path), self.llm_management.reload_config)
+            self.config_watcher.start()
+
         
 
     
     
-    @timeit_logger(name="Alice.respond", level="INFO")
     async def respond(self, user_inputs: dict[str, Any]) -> str:
         """
         生成对用户输入的响应
         """
-        logger.debug(f"Alice received user inputs: {user_inputs}")
-        # 处理响应
-        user_input = await self.perception_system.analyze(user_inputs)
-        logger.debug("User input after perception analysis: " + str(user_input))
+        route = self._route(user_inputs)
+        with timing(f"Alice.respond route={route}", level="INFO"):
+            messages, user_input_id = await self._prepare_turn(user_inputs, route)
+
+            # 调用LLM生成响应
+            try:
+                response = await self.llm_management.achat(messages, "qw8")
+            except Exception as e:
+                logger.error(f"Error during LLM response: {e}")
+                self.memory_system.storage.delete_history_by_id(user_input_id)
+                return self.DEFAULT_ERROR_MSG
+            logger.debug(f"Alice response: {response}")
+
+            await self._finish_turn(response)
+            return response
+
+    async def respond_stream(self, user_inputs: dict[str, Any]) -> AsyncIterator[str]:
+        """
+        流式生成响应：逐段产出 LLM 增量文本
+        完整回复在流结束后一次性落库并触发回合完成事件（与 respond 一致）
+        """
+        route = self._route(user_inputs)
+        with timing(f"Alice.respond_stream route={route}", level="INFO"):
+            async for delta in self._respond_stream(user_inputs, route):
+                yield delta
+
+    async def _respond_stream(self, user_inputs: dict[str, Any], route: str) -> AsyncIterator[str]:
+        messages, user_input_id = await self._prepare_turn(user_inputs, route)
 
-        user_input = self.query_builder.addMessage(user_input)
-        logger.debug("User input after query schema building: " + str(user_input.query_schema))
+        parts: list[str] = []
+        settled = False
+        try:
+            try:
+                async for delta in self.llm_management.astream_chat(messages, "qw8"):
+                    parts.append(delta)
+                    yield delta
+            except Exception as e:
+                logger.error(f"Error during LLM streaming response: {e}")
+                # 已经发出部分内容：保留已生成的部分作为本轮回复
 
+            settled = True
+            response = "".join(parts)
+            if not response:
+                # 一个字都没发出去：与 respond 相同的回退
+                self.memory_system.storage.delete_history_by_id(user_input_id)
+                yield self.DEFAULT_ERROR_MSG
+                return
+            logger.debug(f"Alice response (stream): {response}")
+            await asyncio.shield(self._finish_turn(response))
+        finally:
+            if not settled:
+                # 客户端中途断开（GeneratorExit / CancelledError）：不能再 yield，只做落库收尾
+                response = "".join(parts)
+                if response:
+                    logger.info(f"Stream aborted by client, keeping partial response ({len(response)} chars)")
+                    await asyncio.shield(self._finish_turn(response))
+                else:
+                    self.memory_system.storage.delete_history_by_id(user_input_id)
 
-        # 添加到数据库
-        user_input_id = self.memory_system.storage.add_history(user_input)
+    def _route(self, user_inputs: dict[str, Any]) -> str:
+        """
+        感知前分流：纯文本且命中低信号闸门 -> "low_signal"，否则 "full"
+        """
+        if self.low_signal_gate is None:
+            return "full"
+        if any(user_inputs.get(k) for k in ("image", "audio", "video")):
+            return "full"
+        reason = self.low_signal_gate.judge(user_inputs.get("text", "") or "")
+        if reason is None:
+            return "full"
+        logger.info(f"Low-signal input routed to fast path ({reason})")
+        return "low_signal"
 
+    async def _prepare_fast_turn(self, user_inputs: dict[str, Any]) -> tuple[list[dict[str, Any]], int]:
+        """
+        低信号快速链路：不调用任何分析模型，QuerySchema 直接取 ping_presence，上下文使用精简版
+        """
+        user_input = self.perception_system.build_message(user_inputs)
+        user_input.query_schema = self.low_signal_gate.build_query_schema()
+
+        user_input_id = await self.memory_system.storage.aadd_history(user_input)
         logger.info(f"Added user input to history with ID: {user_input_id}")
 
+        messages = await asyncio.to_thread(self.assembler.build_slim_messages, self.slim_history_window)
+        return messages, user_input_id
+
+    async def _prepare_turn(self, user_inputs: dict[str, Any], route: str = "full") -> tuple[list[dict[str, Any]], int]:
+        """
+        感知 -> 查询 -> 落库 -> 组装 messages，返回 (messages, user_input_id)
+
+        依赖关系：
+        - 与当前消息无关的 system prompt 片段（世界核心 / 记忆 / 协议 / 对话状态）在感知期间并行构建
+        - 感知完成后，查询构建与落库并行（落库不依赖 query_schema）
+        - 只有检索记忆块、分析结果块和最新一条历史需要等待以上完成
+        """
+        logger.debug(f"Alice received user inputs: {user_inputs}")
+        if route == "low_signal":
+            return await self._prepare_fast_turn(user_inputs)
+
+        static_task = asyncio.create_task(asyncio.to_thread(self.assembler.prepare_static_sections))
+
+        try:
+            # 处理响应
+            user_input = await self.perception_system.analyze(user_inputs)
+            logger.debug("User input after perception analysis: " + str(user_input))
+
+            # 查询构建与落库并行
+            insert_task = asyncio.create_task(self.memory_system.storage.aadd_history(user_input))
+            try:
+                user_input = await self.query_builder.aaddMessage(user_input)
+            finally:
+                # 添加到数据库
+                user_input_id = await insert_task
+            logger.debug("User input after query schema building: " + str(user_input.query_schema))
+            logger.info(f"Added user input to history with ID: {user_input_id}")
+            # 延后的深层分析（ltp_lazy_deep）在后台补算并回填
+            self.perception_system.schedule_deferred(user_input, self.memory_system.storage.attach_analyze)
+
+            # 按 QuerySchema 召回记忆（各来源并行）
+            retrieved = await self.assembler.abuild_retrieval_section(user_input.query_schema)
+            prepared = await static_task
+        except BaseException:
+            static_task.cancel()
+            raise
 
         # 构建消息
-        messages = self.assembler.build_messages()
+        messages = self.assembler.build_messages(prepared=prepared, retrieved=retrieved)
         logger.debug("System Prompt:")
         logger.debug(messages[0]['content'])
 
@@ -140,21 +312,14 @@ class Alice:
             width=100,
         )
         logger.debug("\n" + block)
+        return messages, user_input_id
 
-        # 调用LLM生成响应
-        try:
-            response = self.llm_management.chat(messages, "qw8")
-        except Exception as e:
-            logger.error(f"Error during LLM response: {e}")
-            default_error_msg = "抱歉，生成响应时出错。请稍后再试。"
-            self.memory_system.storage.delete_history_by_id(user_input_id)
-            return default_error_msg
-        logger.debug(f"Alice response: {response}")
-
-
-
+    async def _finish_turn(self, response: str) -> int:
+        """
+        助手回复落库并触发回合完成事件，返回助手消息的 turn_id
+        """
         # 添加助手响应到数据库
-        assistant_response_id = self.memory_system.storage.add_history(ChatMessage(
+        assistant_response_id = await self.memory_system.storage.aadd_history(ChatMessage(
 				sender_name="Alice",
 				sender_id=-1,
                 role="assistant", content=response,
@@ -167,5 +332,17 @@ class Alice:
             data=response,
             turn_id=assistant_response_id
         )
-        return response
-    
+        return assistant_response_id
+
+    def getStats(self) -> dict[str, Any]:
+        """
+        运行统计：聊天历史（COUNT 聚合，不加载消息）、LLM 响应缓存与分析块渲染缓存的命中情况，
+        以及意图级联分类的本地路由命中率 / 估算节省的耗时（未注册 IntentJudgeL 时为空 dict）
+        """
+        intent_judge = self.query_builder.getBuilder("IntentJudgeL")
+        return {
+            "history": self.raw_history.getStats(),
+            "llm_cache": self.llm_management.getCacheStats(),
+            "analyze_prompt_cache": self.assembler.analyze_cache.getStats(),
+            "intent": intent_judge.getMetrics() if intent_judge is not None else {},
+        }
@@ -20,4 +20,10 @@ class ChatStateSystem(ABC):
         pass
     @abstractmethod
     def assemble(self) -> PromptBuilder:
-        pass
\ No newline at end of file
+        pass
+
+    def getVersion(self) -> Any:
+        """
+        状态版本号，状态变化时必须变化；返回 None 表示不可缓存
+        """
+        return None
\ No newline at end of file
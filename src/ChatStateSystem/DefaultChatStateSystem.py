@@ -30,6 +30,7 @@ class DefaultChatStateSystem(ChatStateSystem):
         self.history_window = history_window
 
         self.activated_turn = 0
+        self.state_version = 0
         self.chat_state: ChatState = ChatState(
                                     interaction = "闲聊",
                                     user_attitude = "积极",
@@ -58,6 +59,7 @@ class DefaultChatStateSystem(ChatStateSystem):
         if data is not None:
             data['updated_at'] =chat_buffer[0].chat_turn_id
             self.chat_state = ChatState.from_dict(data)
+            self.state_version += 1
             self.activated_turn = chat_buffer[0].chat_turn_id
     
     def checkAndUpdateState(self, turn_id: int):
@@ -66,4 +68,7 @@ class DefaultChatStateSystem(ChatStateSystem):
                 self.activate_update_state()
     
     def assemble(self) -> PromptBuilder:
-        return self.chat_state.to_prompt()
\ No newline at end of file
+        return self.chat_state.to_prompt()
+
+    def getVersion(self) -> tuple[int, int | None]:
+        return (self.state_version, self.chat_state.updated_at)
\ No newline at end of file
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from DataClass.ChatMessage import ChatMessage
+from tools.PromptBuilder import PromptBuilder
+
+
+class AnalyzePromptCache:
+    """
+    分析结果块中单条用户消息的渲染缓存（按 chat_turn_id 的 LRU）：
+    - 分析窗口是滑动的，同一条消息会在接下来 analysis_window 轮里反复出现，只在第一次渲染
+    - 缓存的是该消息整块（User Message ID / 原文 / 时间 / 分析结果）在 0 层缩进下的文本，
+      嵌进 <ANALYZE> 时由 PromptBuilder 按行补缩进
+    - 校验键为 AnalyzeResult.prompt_fingerprint()，延后的深层分析回填后会重新渲染
+    - mode: full（analyze_result_to_prompt）或 compact（analyze_result_to_compact_prompt）
+    """
+
+    MODES = ("full", "compact")
+
+    def __init__(self, mode: str = "compact", max_entries: int = 256):
+        if mode not in self.MODES:
+            raise ValueError(f"Unsupported analyze prompt mode: {mode}")
+        self.mode = mode
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[int, Tuple[Any, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, msg: ChatMessage) -> str:
+        anl = msg.analyze_result
+        fingerprint: Optional[str] = anl.prompt_fingerprint() if anl is not None else None
+        turn_id = msg.chat_turn_id
+
+        if turn_id is not None:
+            hit = self._entries.get(turn_id)
+            if hit is not None and hit[0] == fingerprint:
+                self._entries.move_to_end(turn_id)
+                self.hits += 1
+                return hit[1]
+
+        self.misses += 1
+        b = PromptBuilder(f"User Message ID {turn_id}")
+        b.add(msg.buildContent())
+        b.add(f"TimeDate: {msg.timedate}")
+        if anl is not None:
+            if self.mode == "compact":
+                b.include(anl.analyze_result_to_compact_prompt())
+            else:
+                b.include(anl.analyze_result_to_prompt())
+        text = b.build()
+
+        if turn_id is not None:
+            self._entries[turn_id] = (fingerprint, text)
+            self._entries.move_to_end(turn_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return text
+
+    def invalidate(self, turn_id: int) -> None:
+        self._entries.pop(turn_id, None)
+
+    def getStats(self) -> dict:
+        return {"mode": self.mode, "entries": len(self._entries), "hits": self.hits, "misses": self.misses}
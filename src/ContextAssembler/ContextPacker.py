@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+from tools.TokenCounter import TokenCounter
+
+
+class ContextPacker:
+    """
+    按 token 预算装配上下文（system prompt 各片段 + 原始对话），让 prompt 长度有上界、可预期：
+    - 各片段先按 section_budgets 单独封顶，超出的从尾部截断（保留闭合标签）
+    - system 部分合计超过 token_budget - min_history_tokens 时，按 SECTION_PRIORITY 从低到高继续裁剪
+    - 原始对话用剩余预算从新到旧装入：单条超过 max_message_tokens 的先截断（用户粘贴的长文），
+      装不下就停止，更早的消息不再携带；最新一条（当前用户输入）总会保留，必要时截断
+    - 每条消息额外计 message_overhead 个 token（chat template 的角色标记）
+
+    **kwargs 参数说明**:
+    - context_token_budget: 整个 prompt（system + 原始对话）的 token 上限
+    - context_section_budgets: 各片段上限 dict，未列出的沿用默认值，None 表示不单独封顶
+    - context_max_message_tokens: 单条原始消息的 token 上限
+    - context_min_history_tokens: 原始对话至少保留的预算（system 部分不会挤占这部分）
+    - context_message_overhead: 每条消息的模板开销
+    """
+
+    DEFAULT_SECTION_BUDGETS: Dict[str, Optional[int]] = {
+        "world_core": 1024,
+        "memory": 1024,
+        "retrieval": 1024,
+        "user_protocol": 512,
+        "analyze": 768,
+        "chat_state": 256,
+        "response_protocol": 512,
+    }
+
+    # 超出总预算时的裁剪顺序：数值越小越先裁
+    SECTION_PRIORITY: Dict[str, int] = {
+        "analyze": 0,
+        "retrieval": 1,
+        "chat_state": 2,
+        "memory": 3,
+        "world_core": 4,
+        "user_protocol": 5,
+        "response_protocol": 6,
+    }
+
+    def __init__(self, token_counter: Optional[TokenCounter] = None, **kwargs):
+        self.token_counter = token_counter or TokenCounter()
+        self.token_budget = int(kwargs.get("context_token_budget", 6144))
+        self.section_budgets = {**self.DEFAULT_SECTION_BUDGETS, **(kwargs.get("context_section_budgets") or {})}
+        self.max_message_tokens = int(kwargs.get("context_max_message_tokens", 1024))
+        self.min_history_tokens = int(kwargs.get("context_min_history_tokens", 1024))
+        self.message_overhead = int(kwargs.get("context_message_overhead", 4))
+        self.last_stats: Dict[str, Any] = {}
+
+    def count(self, text: str) -> int:
+        return self.token_counter.count(text)
+
+    def section_budget(self, name: str) -> Optional[int]:
+        return self.section_budgets.get(name)
+
+    # ---------------- 截断 ----------------
+
+    def truncate_block(self, text: str, max_tokens: int) -> str:
+        """截断一个渲染好的片段：超出部分从尾部丢弃，最后一行是闭合标签时保留它"""
+        if self.count(text) <= max_tokens:
+            return text
+        lines = text.rstrip().split("\n")
+        tail = lines[-1] if len(lines) > 1 and lines[-1].strip().startswith("</") else ""
+        body = "\n".join(lines[:-1]) if tail else text
+        body = self.token_counter.truncate(body, max_tokens - self.count(tail))
+        if not body:
+            return ""
+        return f"{body}\n{tail}" if tail else body
+
+    # ---------------- system 片段 ----------------
+
+    def fit_sections(self, sections: Dict[str, str]) -> Dict[str, str]:
+        """按单片段上限与 system 总上限裁剪，返回新的 dict；被裁剪的片段名记在 last_stats["trimmed"]"""
+        fitted: Dict[str, str] = {}
+        tokens: Dict[str, int] = {}
+        trimmed: List[str] = []
+        for name, text in sections.items():
+            text = text or ""
+            cap = self.section_budgets.get(name)
+            if cap is not None and text and self.count(text) > cap:
+                text = self.truncate_block(text, cap)
+                trimmed.append(name)
+            fitted[name] = text
+            tokens[name] = self.count(text)
+
+        system_cap = max(0, self.token_budget - self.min_history_tokens - self.message_overhead)
+        overflow = sum(tokens.values()) - system_cap
+        for name in sorted(fitted, key=lambda n: self.SECTION_PRIORITY.get(n, -1)):
+            if overflow <= 0:
+                break
+            if not tokens[name]:
+                continue
+            fitted[name] = self.truncate_block(fitted[name], max(0, tokens[name] - overflow))
+            new_tokens = self.count(fitted[name])
+            overflow -= tokens[name] - new_tokens
+            tokens[name] = new_tokens
+            if name not in trimmed:
+                trimmed.append(name)
+
+        self.last_stats = {"sections": tokens, "trimmed": trimmed}
+        return fitted
+
+    # ---------------- 原始对话 ----------------
+
+    def history_budget(self, system_content: str) -> int:
+        """system prompt 装好后留给原始对话的预算"""
+        left = self.token_budget - self.count(system_content) - self.message_overhead
+        return max(self.min_history_tokens, left)
+
+    def fit_history(self, messages: List[Dict[str, Any]], budget: int) -> List[Dict[str, Any]]:
+        """messages 按时间从旧到新；从最新一条往前装，返回装下的部分（仍按从旧到新）"""
+        packed: List[Dict[str, Any]] = []
+        used = 0
+        truncated = 0
+        for msg in reversed(messages):
+            content = msg.get("content") or ""
+            limit = self.max_message_tokens if packed else min(self.max_message_tokens, budget - self.message_overhead)
+            if self.count(content) > limit:
+                content = self.token_counter.truncate(content, limit)
+                msg = {**msg, "content": content}
+                truncated += 1
+            cost = self.count(content) + self.message_overhead
+            if packed and used + cost > budget:
+                break
+            packed.append(msg)
+            used += cost
+
+        self.last_stats.update({
+            "history": used,
+            "history_messages": len(packed),
+            "history_dropped": len(messages) - len(packed),
+            "history_truncated": truncated,
+        })
+        packed.reverse()
+        return packed
@@ -1,18 +1,46 @@
-from typing import List
+import os
+from typing import Callable, List
 
 from logging_config import logger, timeit_logger
 from ChatStateSystem.ChatStateSystem import ChatStateSystem
+from ContextAssembler.AnalyzePromptCache import AnalyzePromptCache
+from ContextAssembler.ContextPacker import ContextPacker
 from ContextAssembler.GlobalContextAssembler import GlobalContextAssembler
 from DataClass.ChatMessage import ChatMessage
 from typing import Any
 
+from DataClass.QuerySchema import QuerySchema
 from DataClass.TagType import TagType
 from MemorySystem.MemorySystem import MemorySystem
+from MemorySystem.RetrievalPipeline import RetrievalPipeline
 from SystemPrompt import SystemPrompt
 from tools.PromptBuilder import PromptBuilder
 
 
 class DefaultGlobalContextAssembler(GlobalContextAssembler):
+    """
+    layout:
+    - classic: 原有顺序，分析结果与对话状态夹在协议块之间
+    - prefix_stable: 静态片段在前（按变化频率从低到高），每轮都变的检索记忆 / 分析结果放最后，
+      让 system prompt 的前缀在轮与轮之间保持字节级一致，便于 Ollama 复用 KV cache
+
+    retrieval_pipeline: 按 QuerySchema 召回记忆（<MEMORY_RECALL> 块）；本轮有召回内容时，
+    原始对话只带最近 retrieval_history_window 条，更早的内容交给检索按需补回
+
+    packer: 按 token 预算裁剪各片段与原始对话（见 ContextPacker）；history_window 只是取历史的条数上限，
+    实际带多少条由剩余预算决定
+
+    analyze_mode: 分析结果块的渲染方式，full 或 compact（见 AnalyzePromptCache），单条消息的渲染按 turn id 缓存
+    """
+
+    LAYOUTS: dict[str, list[str]] = {
+        "classic": [
+            "world_core", "memory", "retrieval", "user_protocol", "analyze", "chat_state", "response_protocol",
+        ],
+        "prefix_stable": [
+            "world_core", "user_protocol", "response_protocol", "memory", "chat_state", "retrieval", "analyze",
+        ],
+    }
 
     def __init__(
         self,
@@ -21,82 +49,176 @@ class DefaultGlobalContextAssembler(GlobalContextAssembler):
         system_prompt: SystemPrompt,
         history_window: int,
         analysis_window: int = 3,
-       
+        layout: str = "classic",
+        retrieval_pipeline: RetrievalPipeline | None = None,
+        retrieval_history_window: int | None = None,
+        packer: ContextPacker | None = None,
+        analyze_mode: str = "compact",
     ):
         self.memory_system = memory_system
         self.chat_state_system = chat_state_system
         self.history_window = history_window
         self.system_prompt = system_prompt
         self.analysis_window = analysis_window
+        self.retrieval_pipeline = retrieval_pipeline
+        self.retrieval_history_window = retrieval_history_window or history_window
+        self.packer = packer or ContextPacker()
+        self.analyze_cache = AnalyzePromptCache(analyze_mode)
 
-    @timeit_logger(name="DefaultGlobalContextAssembler.build_messages", level="DEBUG")
-    def build_messages(
-        self
-    ) -> list[dict[str, Any]]:
-        
-        # query context from memory system / chat state system /other modules
- 
-        # 总体 system prompt 构建流程：
-        system_prompt = PromptBuilder()
+        if layout not in self.LAYOUTS:
+            logger.warning(f"Unknown prompt layout '{layout}', falling back to 'classic'")
+            layout = "classic"
+        self.layout = layout
+        # 上一轮的 system prompt，用于统计可复用前缀
+        self._last_system_prompt = ""
 
+        # 分段渲染缓存：section name -> (version key, 预渲染字符串)
+        self._section_cache: dict[str, tuple[Any, str]] = {}
 
-        
-        world_core_prompt = self.memory_system.assembleWorldCore()
-        system_prompt.include(world_core_prompt)
+    @staticmethod
+    def _render_section(section: PromptBuilder) -> str:
+        """
+        按最终 system prompt 中的层级渲染单个片段（与直接 include 进根容器的输出一致）
+        """
+        return PromptBuilder().include(section, clone=False).build()
+
+    def _cached_section(self, name: str, version: Any, build: Callable[[], PromptBuilder]) -> str:
+        """
+        version 不变时直接复用预渲染字符串；version 为 None 表示不可缓存，每次重建
+        """
+        if version is not None:
+            hit = self._section_cache.get(name)
+            if hit is not None and hit[0] == version:
+                return hit[1]
 
+        rendered = self._render_section(build())
+        if version is not None:
+            self._section_cache[name] = (version, rendered)
+        logger.debug(f"Context section rebuilt: {name}")
+        return rendered
+
+    def _build_memory_section(self) -> PromptBuilder:
         # 记忆系统部分
         memory_prompt = PromptBuilder(TagType.MEMORY_SYSTEM_TAG)
         identity_prompt = self.memory_system.assembleIdentity()
         short_memory_prompt = self.memory_system.assembleShortMemory()
-        # query info 
-
         memory_prompt.include(identity_prompt)
         memory_prompt.include(short_memory_prompt)
-        system_prompt.include(memory_prompt)
+        return memory_prompt
 
+    def _build_protocol_section(self, tag: TagType) -> PromptBuilder:
+        protocol = PromptBuilder(tag)
+        for line in self.system_prompt.getPrompt(tag).lines:
+            protocol.add(line)
+        return protocol
 
+    @timeit_logger(name="DefaultGlobalContextAssembler.prepare_static_sections", level="DEBUG")
+    def prepare_static_sections(self) -> dict[str, str]:
+        """
+        与当前用户消息无关的部分：世界核心 / 记忆（身份 + 短期摘要）/ 用户协议 / 对话状态 / 响应协议
+        可以在感知系统分析当前消息时并行构建；各片段按版本号缓存为预渲染字符串
+        """
+        prompt_version = self.system_prompt.version
+        memory_version = (
+            self.memory_system.getIdentityVersion(),
+            self.memory_system.getShortMemoryVersion(),
+        )
+        chat_state_version = self.chat_state_system.getVersion()
 
+        return {
+            "world_core": self._cached_section(
+                "world_core", 0, self.memory_system.assembleWorldCore
+            ),
+            "memory": self._cached_section(
+                "memory", memory_version, self._build_memory_section
+            ),
+            "user_protocol": self._cached_section(
+                "user_protocol", prompt_version,
+                lambda: self._build_protocol_section(TagType.IDENTITY_PROTOCOL_TAG),
+            ),
+            "chat_state": self._cached_section(
+                "chat_state", chat_state_version, self.chat_state_system.assemble
+            ),
+            "response_protocol": self._cached_section(
+                "response_protocol", prompt_version,
+                lambda: self._build_protocol_section(TagType.RESPONSE_PROTOCOL_TAG),
+            ),
+        }
 
-        
+    def build_analyze_section(self) -> str:
+        """
+        分析结果部分：依赖当前消息的感知结果，必须在当前消息入库后构建
+        以最近 N 条用户消息的 turn id 及分析结果的内容摘要（AnalyzeResult.prompt_fingerprint）为版本号，
+        延后的深层分析回填后版本随之变化；只有这 N 条需要完整分析结果
+        超出 analyze 片段预算时先丢弃较早的消息，只剩一条仍超出的交给 ContextPacker 截断
+        """
+        msgs = self.memory_system.storage.get_history_by_role(
+            "user", self.analysis_window, sender_id=1, projection="full"
+        )
+        version = tuple(
+            (m.chat_turn_id, m.analyze_result.prompt_fingerprint() if m.analyze_result is not None else None)
+            for m in msgs
+        )
+        if any(turn_id is None for turn_id, _ in version):
+            version = None
 
-        # 用户协议部分
-        user_protocol = PromptBuilder(TagType.IDENTITY_PROTOCOL_TAG)
-        iden_prompt = self.system_prompt.getPrompt(TagType.IDENTITY_PROTOCOL_TAG)
-        for line in iden_prompt.lines:
-            user_protocol.add(line)
+        budget = self.packer.section_budget("analyze")
 
-        system_prompt.include(user_protocol)
+        def wrap(blocks: List[str]) -> PromptBuilder:
+            analyze_prompt = PromptBuilder(TagType.ANALYZE_TAG)
+            for b in blocks:
+                analyze_prompt.add(b)
+            return analyze_prompt
 
-        
-        # 分析结果部分
-        analyze_prompt = PromptBuilder(TagType.ANALYZE_TAG)
-
-        for msg in self.memory_system.storage.get_history_by_role("user", self.analysis_window, sender_id=1):
-            b = PromptBuilder(f"User Message ID {msg.chat_turn_id}")
-            b.add(msg.buildContent())
-            b.add(f"TimeDate: {msg.timedate}")
-            anl = msg.analyze_result
-            if anl is not None:
-                b.include(anl.analyze_result_to_prompt())
-            analyze_prompt.include(b)
+        def build() -> PromptBuilder:
+            blocks = [self.analyze_cache.render(msg) for msg in msgs]
+            if budget is not None:
+                while len(blocks) > 1 and self.packer.count(self._render_section(wrap(blocks))) > budget:
+                    blocks.pop(0)
+            return wrap(blocks)
 
-        system_prompt.include(analyze_prompt)
+        return self._cached_section("analyze", version, build)
 
-        # 对话状态分析部分
-        chat_state_prompt = self.chat_state_system.assemble()
-        system_prompt.include(chat_state_prompt) 
-
-        
+    async def abuild_retrieval_section(self, schema: QuerySchema | None) -> str:
+        """
+        检索记忆部分：依赖当前消息的 QuerySchema，必须在查询构建之后构建；没有召回内容时返回空串
+        只检索 retrieval_history_window 之前的消息，避免与随后附带的原始对话重复
+        """
+        if self.retrieval_pipeline is None or schema is None or not schema.retrieve:
+            return ""
+        window = self.memory_system.storage.get_history(self.retrieval_history_window, projection="text")
+        before_turn_id = window[0].chat_turn_id if window else None
+        hits = await self.retrieval_pipeline.aretrieve(schema, before_turn_id=before_turn_id)
+        return self.retrieval_pipeline.render_text(hits) if hits else ""
 
-        # 响应协议部分
-        response_protocol = PromptBuilder(TagType.RESPONSE_PROTOCOL_TAG)
-        resp_prompt = self.system_prompt.getPrompt(TagType.RESPONSE_PROTOCOL_TAG)
-        for line in resp_prompt.lines:
-            response_protocol.add(line)
+    def _log_prefix_reuse(self, content: str) -> None:
+        """
+        与上一轮 system prompt 的公共前缀长度：这部分在 Ollama 侧可以直接命中 KV cache
+        """
+        prefix = len(os.path.commonprefix([self._last_system_prompt, content]))
+        self._last_system_prompt = content
+        ratio = prefix / len(content) if content else 0.0
+        logger.info(
+            f"[prompt] layout={self.layout} system={len(content)} chars, "
+            f"stable prefix={prefix} chars ({ratio:.0%})"
+        )
 
+    @timeit_logger(name="DefaultGlobalContextAssembler.build_messages", level="DEBUG")
+    def build_messages(
+        self,
+        prepared: dict[str, str] | None = None,
+        retrieved: str = "",
+    ) -> list[dict[str, Any]]:
         
-        system_prompt.include(response_protocol)
-
+        # query context from memory system / chat state system /other modules
+        if prepared is None:
+            prepared = self.prepare_static_sections()
+ 
+        # 总体 system prompt 构建流程：按 layout 排列各片段
+        sections = {**prepared, "retrieval": retrieved, "analyze": self.build_analyze_section()}
+        sections = self.packer.fit_sections(sections)
+        content = "\n".join(sections[name] for name in self.LAYOUTS[self.layout] if sections[name])
+        self._log_prefix_reuse(content)
 
         logger.debug("Final system prompt build completed.")
 
@@ -105,12 +227,43 @@ class DefaultGlobalContextAssembler(GlobalContextAssembler):
 
         messages.append({
             "role": "system",
-            "content": system_prompt.build()
+            "content": content
         })
 
-        # 原始对话放最后
-        buffer = self.memory_system.storage.get_history(self.history_window)
-        for msg in buffer:
-            messages.append(msg.buildMessage())
+        # 原始对话放最后：只需要 role / sender / content，走 text 投影
+        window = self.retrieval_history_window if retrieved else self.history_window
+        buffer = self.memory_system.storage.get_history(window, projection="text")
+        history = [msg.buildMessage() for msg in buffer]
+        messages.extend(self.packer.fit_history(history, self.packer.history_budget(content)))
+        self._log_packing()
+
+        return messages
+
+    def _log_packing(self) -> None:
+        stats = self.packer.last_stats
+        logger.debug(
+            f"[prompt] tokens system={sum(stats.get('sections', {}).values())} history={stats.get('history', 0)} "
+            f"({stats.get('history_messages', 0)} msgs, dropped={stats.get('history_dropped', 0)}, "
+            f"truncated={stats.get('history_truncated', 0)}) trimmed={stats.get('trimmed', [])} "
+            f"budget={self.packer.token_budget}"
+        )
+
+    @timeit_logger(name="DefaultGlobalContextAssembler.build_slim_messages", level="DEBUG")
+    def build_slim_messages(self, history_window: int | None = None) -> list[dict[str, Any]]:
+        """
+        低信号消息（在吗/？/ok）的精简上下文：
+        - 只用静态片段（走缓存），不构建检索记忆与分析结果块
+        - 只带最近 history_window 条原始对话
+        """
+        prepared = self.packer.fit_sections(self.prepare_static_sections())
+        content = "\n".join(
+            prepared[name] for name in self.LAYOUTS[self.layout]
+            if name in prepared and prepared[name]
+        )
 
-        return messages
\ No newline at end of file
+        messages = [{"role": "system", "content": content}]
+        buffer = self.memory_system.storage.get_history(history_window or self.history_window, projection="text")
+        history = [msg.buildMessage() for msg in buffer]
+        messages.extend(self.packer.fit_history(history, self.packer.history_budget(content)))
+        self._log_packing()
+        return messages
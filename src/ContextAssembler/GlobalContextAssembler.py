@@ -8,11 +8,22 @@ class GlobalContextAssembler(ABC):
     负责构建 LLM 调用所需的完整上下文
     """
 
+    def prepare_static_sections(self) -> dict[str, Any] | None:
+        """
+        预先构建与当前消息无关的 system prompt 片段（可在感知阶段并行执行）
+        返回值原样传给 build_messages(prepared=...)；默认不做预构建
+        """
+        return None
+
     @abstractmethod
     def build_messages(
-        self
+        self,
+        prepared: dict[str, Any] | None = None,
     ) -> list[dict[str, Any]]:
         """
+        prepared:
+            prepare_static_sections() 的结果；为 None 时在本次调用内现场构建
+
         recent_messages:
             最近 N 条原始对话消息（user / assistant）
 
@@ -25,4 +36,9 @@ class GlobalContextAssembler(ABC):
             ]
         """
         pass
-    
+
+    def build_slim_messages(self, history_window: int | None = None) -> list[dict[str, Any]]:
+        """
+        低信号消息使用的精简上下文；默认退化为完整上下文
+        """
+        return self.build_messages()
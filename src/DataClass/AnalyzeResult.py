@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 from uuid import uuid4
+import hashlib
 import re
 from DataClass.TagType import TagType
 from tools.PromptBuilder import PromptBuilder
@@ -111,6 +112,39 @@ class AnalyzeResult:
 
 
 
+    def to_dict(self) -> Dict[str, Any]:
+        """完整序列化为纯 dict / list（可直接 json.dumps），与 from_dict 互逆"""
+        return asdict(self)
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "AnalyzeResult":
+        return AnalyzeResult(
+            turn_id=data.get("turn_id"),
+            timestamp=data.get("timestamp"),
+            media_type=data.get("media_type", "text"),
+            schema_version=data.get("schema_version", "analyze_v1"),
+            entities=[Entity(**e) for e in data.get("entities", []) or []],
+            frames=[
+                Frame(
+                    predicate=f["predicate"],
+                    predicate_span=f.get("predicate_span"),
+                    arguments=[Argument(**a) for a in f.get("arguments", []) or []],
+                )
+                for f in data.get("frames", []) or []
+            ],
+            tokens=[
+                (str(t[0]), str(t[1])) if isinstance(t, (list, tuple)) and len(t) >= 2 else (str(t), "")
+                for t in data.get("tokens", []) or []
+            ],
+            keywords=list(data.get("keywords", []) or []),
+            relations=[Relation(**r) for r in data.get("relations", []) or []],
+            normalized_text=data.get("normalized_text"),
+            is_question=data.get("is_question"),
+            is_self_reference=data.get("is_self_reference"),
+            emotion_cues=list(data.get("emotion_cues", []) or []),
+            raw=dict(data.get("raw", {}) or {}),
+        )
+
     # 假设这些类已按你之前的定义存在：
     # Entity, Argument, Frame, Relation, AnalyzeResult
 
@@ -306,6 +340,30 @@ class AnalyzeResult:
         return s.replace("\n", "\\n").replace("\r", "").strip()
 
 
+    def _flat_tokens(self) -> List[List[str]]:
+        # 兼容 [[tok,pos], ...]  或  [[[tok,pos],...], [...]]
+        flat_tokens = []
+        if self.tokens and isinstance(self.tokens[0], list):
+            if len(self.tokens[0]) == 2 and isinstance(self.tokens[0][0], str):
+                flat_tokens = self.tokens
+            else:
+                for sent in self.tokens:
+                    for p in sent:
+                        if isinstance(p, list) and len(p) == 2:
+                            flat_tokens.append(p)
+        return flat_tokens
+
+    def prompt_fingerprint(self) -> str:
+        """
+        渲染缓存的校验键：对 full / compact 两种渲染用到的全部字段内容做摘要，
+        分析结果被回填 / 覆盖（如延后的深层分析）后，只要渲染内容有任何变化就会不同
+        """
+        payload = (
+            self.schema_version, self.is_question, self.is_self_reference, self.normalized_text,
+            self.emotion_cues, self._flat_tokens(), self.keywords, self.entities, self.frames, self.relations,
+        )
+        return hashlib.blake2b(repr(payload).encode("utf-8"), digest_size=16).hexdigest()
+
     def analyze_result_to_prompt(self,
         tag: str = "USER_ANALYZE_RESULT_BLOCK",
         max_tokens_pos: int = 120,
@@ -329,17 +387,7 @@ class AnalyzeResult:
                 builder.add(f"  - {self._safe(cue)}")
         
         # ========= tokens + pos =========
-        flat_tokens = []
-
-        # 兼容 [[tok,pos], ...]  或  [[[tok,pos],...], [...]]
-        if self.tokens and isinstance(self.tokens[0], list):
-            if len(self.tokens[0]) == 2 and isinstance(self.tokens[0][0], str):
-                flat_tokens = self.tokens
-            else:
-                for sent in self.tokens:
-                    for p in sent:
-                        if isinstance(p, list) and len(p) == 2:
-                            flat_tokens.append(p)
+        flat_tokens = self._flat_tokens()
 
         if len(flat_tokens) > max_tokens_pos:
             flat_tokens = flat_tokens[:max_tokens_pos] + [["…", "…"]]
@@ -410,3 +458,52 @@ class AnalyzeResult:
         # builder.add(f"</{tag}>")
         return builder
 
+    def analyze_result_to_compact_prompt(self,
+        tag: str = "USER_ANALYZE_RESULT_BLOCK",
+        max_tokens_pos: int = 0,
+        max_keywords: int = 12,
+        max_entities: int = 8,
+        max_frames: int = 3,
+        max_args: int = 4,
+        max_relations: int = 5,
+    ) -> PromptBuilder:
+        """
+        AnalyzeResult -> 紧凑 Prompt 结构块（给主模型看的旧消息用）
+        - 每个字段压成一行，空字段不输出
+        - tokens_pos 默认不输出（max_tokens_pos=0），frames / relations 只保留前几条
+        """
+        builder = PromptBuilder(tag)
+
+        builder.add(f"is_question: {self.is_question}, is_self_reference: {self.is_self_reference}")
+        if self.emotion_cues:
+            builder.add("emotion_cues: " + ", ".join(self._safe(c) for c in self.emotion_cues))
+
+        flat_tokens = self._flat_tokens()[:max_tokens_pos]
+        if flat_tokens:
+            builder.add("tokens_pos: " + " ".join(f"{self._safe(t)}/{self._safe(p)}" for t, p in flat_tokens))
+
+        kws = list(self.keywords or [])[:max_keywords]
+        if kws:
+            builder.add("keywords: " + ", ".join(self._safe(k) for k in kws))
+
+        ents = list(self.entities or [])[:max_entities]
+        if ents:
+            builder.add("entities: " + ", ".join(f"{self._safe(e.text)}/{self._safe(e.typ)}" for e in ents))
+
+        frames = list(self.frames or [])[:max_frames]
+        if frames:
+            builder.add("frames:")
+            for f in frames:
+                args = ", ".join(
+                    f"{self._norm_role(a.role)}: {self._safe(a.text)}" for a in list(f.arguments or [])[:max_args]
+                )
+                builder.add(f"  - {self._safe(f.predicate)}({args})")
+
+        relations = list(self.relations or [])[:max_relations]
+        if relations:
+            builder.add("relations:")
+            for r in relations:
+                builder.add(f"  - ({self._safe(r.subject)}, {self._safe(r.relation)}, {self._safe(r.obj)})")
+
+        return builder
+
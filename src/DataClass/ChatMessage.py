@@ -1,4 +1,4 @@
-from typing import Optional, Literal
+from typing import Callable, Optional, Literal
 from dataclasses import dataclass
 import json
 from typing import Any
@@ -13,6 +13,7 @@ class ChatMessage:
 	content: 消息内容
 	timestamp: 消息时间戳（毫秒）
 	extra: 可选扩展字段
+	analyze_result: 可以是已加载的结果，也可以通过 setAnalyzeLoader 挂一个加载函数，首次访问时才加载
 	"""
 	role: Literal["user", "assistant", "system"]
 	content: str
@@ -30,6 +31,14 @@ class ChatMessage:
 	query_schema: Optional[QuerySchema] = None
 
 
+	def setAnalyzeLoader(self, loader: Callable[[], Optional[AnalyzeResult]]) -> None:
+		"""投影读取时不加载分析结果，只挂加载函数；首次访问 analyze_result 时调用一次并缓存"""
+		self._analyze_result = None
+		self._analyze_loader = loader
+
+	def isAnalyzeLoaded(self) -> bool:
+		return getattr(self, "_analyze_loader", None) is None
+
 	def getExtra(self):
 		return self.extra if self.extra else {}
 
@@ -86,3 +95,21 @@ class ChatMessage:
 			extra=data.get("extra", None),
 			chat_turn_id=data.get("chat_turn_id", None)
 		)
+
+
+def _get_analyze_result(self: ChatMessage) -> Optional[AnalyzeResult]:
+	loader = getattr(self, "_analyze_loader", None)
+	if loader is not None:
+		self._analyze_loader = None
+		self._analyze_result = loader()
+	return getattr(self, "_analyze_result", None)
+
+
+def _set_analyze_result(self: ChatMessage, value: Optional[AnalyzeResult]) -> None:
+	# 显式赋值覆盖尚未触发的懒加载
+	self._analyze_loader = None
+	self._analyze_result = value
+
+
+# dataclass 生成 __init__ 后再替换为 property：构造参数与字段列表不变，读写走懒加载逻辑
+ChatMessage.analyze_result = property(_get_analyze_result, _set_analyze_result)  # type: ignore[assignment]
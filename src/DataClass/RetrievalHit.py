@@ -0,0 +1,26 @@
+from typing import Any, Literal, Optional
+from dataclasses import dataclass, field
+
+
+@dataclass
+class RetrievalHit:
+	"""
+	一条检索结果
+	source: QuerySchema 中的来源名（long_term / mid_term / ...）
+	kind: 命中对象类型，message 为 chat_messages，dialogue 为 dialogue_messages 摘要
+	ref_id: chat_turn_id 或 dialogue_id
+	score: 同一来源内归一化到 0~1 的相关度，越大越相关
+	tokens: text 的 token 估算值（打包预算用）
+	"""
+	source: str
+	kind: Literal["message", "dialogue"]
+	ref_id: int
+	text: str
+	score: float = 0.0
+	timestamp: Optional[int] = None
+	tokens: int = 0
+	meta: dict[str, Any] = field(default_factory=dict)
+
+	def key(self) -> tuple[str, int]:
+		"""去重键：同一条消息 / 摘要从不同来源命中只保留一份"""
+		return (self.kind, self.ref_id)
@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC, abstractmethod
 
 class LLM(ABC):
@@ -9,4 +10,10 @@ class LLM(ABC):
         pass
     @abstractmethod
     def supportModel(self) -> list[str]:
-        pass
\ No newline at end of file
+        pass
+
+    async def agenerate(self, prompt: str, model: str, options: dict | None = None) -> dict:
+        """
+        异步入口：默认放到线程池执行同步 generate，支持原生异步的实现应覆盖
+        """
+        return await asyncio.to_thread(self.generate, prompt, model, options)
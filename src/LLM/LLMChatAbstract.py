@@ -1,5 +1,6 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List
+from typing import AsyncIterator, List
 
 
 class Chat(ABC):
@@ -12,4 +13,24 @@ class Chat(ABC):
     
     @abstractmethod
     def supportModel(self) -> list[str]:
-        pass
\ No newline at end of file
+        pass
+
+    async def arespond(self, messages) -> dict:
+        """
+        异步版 respond：默认放到线程池执行
+        """
+        return await asyncio.to_thread(self.respond, messages)
+
+    async def achat(self, messages: list[dict], model: str, options: dict | None = None) -> dict:
+        """
+        异步入口：默认放到线程池执行同步 chat，支持原生异步的实现应覆盖
+        """
+        return await asyncio.to_thread(self.chat, messages, model, options)
+
+    async def astream(self, messages: list[dict], model: str, options: dict | None = None) -> AsyncIterator[str]:
+        """
+        流式入口：产出增量文本。默认退化为一次性产出完整结果
+        """
+        output = await self.achat(messages, model, options)
+        if isinstance(output, str) and output:
+            yield output
@@ -1,30 +1,81 @@
+import asyncio
 from LLM.OllamaChat import OllamaChat
+from LLM.OllamaClient import OllamaClient
 from LLM.OllamaFormated import OllamaFormated
 from LLM.QwenFormated import QwenFormated
+from LLM.LLMResponseCache import LLMResponseCache
 from logging_config import logger, timeit_logger
 from DataClass.PromptTemplate import PromptTemplate
 from SystemPrompt import SystemPrompt
 from tools.tools import tools
 import yaml
+from typing import AsyncIterator
 from pathlib import Path
 class LLMManagement():
-    def __init__(self,system_prompt: SystemPrompt):
-        self.model_map = self.load_config("config/system_prompt.yaml")
-        self.llm_map = self.build_llm_map()
+    """
+    **kwargs 参数说明**（透传给共享的 OllamaClient）:
+    - ollama_base_url / ollama_pool_size / ollama_connect_timeout / ollama_read_timeout
+    - model_concurrency: {model_name: 并发上限}
+    - default_model_concurrency: 默认单模型并发上限
+    - ollama_keep_alive / pinned_models: 透传给 OllamaChat，控制模型常驻与 KV cache 复用
+    - prompt_token_counter / token_counter / context_message_overhead: 透传给 OllamaChat，统计每轮复用 KV cache 的 token 数
+    - llm_cache: 是否缓存 temperature=0 的 generate 结果（默认开启）
+    - llm_cache_max_entries / llm_cache_ttl / llm_cache_db_path / llm_cache_db_max_rows: 透传给 LLMResponseCache
+    """
+    def __init__(self,system_prompt: SystemPrompt, **kwargs):
+        self.config_path = "config/system_prompt.yaml"
+        self.model_map = self.load_config(self.config_path)
+        # 所有 Ollama 实现共享同一个连接池
+        self.ollama_client = OllamaClient(**kwargs)
+        self.llm_map = self.build_llm_map(**kwargs)
         self.system_prompt = system_prompt
-    def build_llm_map(self):
-        inits = [OllamaChat(), OllamaFormated(), QwenFormated()]
+        self.response_cache: LLMResponseCache | None = (
+            LLMResponseCache(**kwargs) if kwargs.get("llm_cache", True) else None
+        )
+    def build_llm_map(self, **kwargs):
+        inits = [OllamaChat(self.ollama_client, **kwargs), OllamaFormated(self.ollama_client), QwenFormated()]
         llm_map = {}
         for llm in inits:
             for model in llm.supportModel():
                 llm_map[model] = llm
         return llm_map
-    def load_config(self, path: str) -> dict:
+    # 构造时配置文件不可用 / 解析失败的兜底映射；热更新不会用到
+    DEFAULT_MODEL_MAP: dict[str, str] = {
+        "split_buffer_by_topic_continuation": "qwen3:1.7b",
+        "text_analysis": "qwen3:1.7b",
+        "judge_dialogue_summary": "qwen3:1.7b",
+        "summarize_dialogue": "qwen3:4b",
+        "judge_chat_state": "qwen3:1.7b",
+        "motion_intent": "qwen3:1.7b",
+        "qw8": "qwen3:8b",
+        "query_router": "qwen3:1.7b",
+        "intent_classifier": "qwen3:1.7b"
+    }
+
+    def reload_config(self) -> None:
+        """
+        热更新 prompt->model 映射：严格解析出完整的新 dict 后一次赋值替换；
+        解析失败（如编辑器保存到一半）或结果为空时视为配置有误，保留旧映射，不会退回内置默认值
+        """
+        try:
+            model_map = self.load_config(self.config_path, strict=True)
+        except Exception as e:
+            logger.warning(f"LLMManagement reload_config failed, keeping previous model map: {e}")
+            return
+        if not model_map:
+            logger.warning("LLMManagement reload_config got empty model map, keeping previous")
+            return
+        self.model_map = model_map
+
+    def load_config(self, path: str, strict: bool = False) -> dict:
         """Load prompt->model mapping from a YAML file.
 
         If `path` is falsy or the file does not exist, attempt to load
         from the repository config/system_prompt.yaml. Returns a dict
         mapping prompt_name -> model_name.
+
+        strict=False（构造时）：读取 / 解析出错时返回 DEFAULT_MODEL_MAP 的副本；
+        strict=True（热更新）：出错直接抛出，由调用方决定保留旧映射
         """
         model_map: dict[str, str] = {}
         # determine path
@@ -45,18 +96,10 @@ class LLMManagement():
                     if model:
                         model_map[name] = model
         except Exception:
+            if strict:
+                raise
             # on error, return
-            return {
-            "split_buffer_by_topic_continuation": "qwen3:1.7b",
-            "text_analysis": "qwen3:1.7b",
-            "judge_dialogue_summary": "qwen3:1.7b",
-            "summarize_dialogue": "qwen3:4b",
-            "judge_chat_state": "qwen3:1.7b",
-            "motion_intent": "qwen3:1.7b",
-            "qw8": "qwen3:8b",
-            "query_router": "qwen3:1.7b",
-            "intent_classifier": "qwen3:1.7b"
-        }
+            return dict(self.DEFAULT_MODEL_MAP)
         return model_map
 
     def render_prompt(self, template: PromptTemplate, **kwargs) -> str:
@@ -86,27 +129,78 @@ class LLMManagement():
         except Exception as exc:
             logger.exception(f"Failed to render prompt '{template.name}': {exc}")
             return ""
-    @timeit_logger(name="LLMManagement.chat", level="DEBUG")
-    def chat(self, messages: list[dict], name: str, options: dict | None = None) -> str:
-
+    def _resolve_chat(self, name: str):
         if name is None:
             logger.error(f"Model for prompt '{name}' not found in model_map.")
-            return ""
+            return None, None
         
         model_name = self.model_map.get(name)
         if model_name is None:
             logger.error(f"Model for prompt '{model_name}' not found in model_map.")
-            return ""
+            return None, None
         
         llm = self.llm_map.get(model_name)
         if llm is None:
             logger.error(f"Model '{model_name}' not found in LLMManagement.")
+            return None, None
+        return model_name, llm
+
+    def _resolve_generate(self, prompt_name: str, **kwargs):
+        """
+        返回 (model_name, llm, prompt)；llm 为 None 表示无法调用（调用方直接返回 fallback）
+        """
+        prompt_template = self.system_prompt.getPrompt(prompt_name)
+        prompt = self.render_prompt(prompt_template, **kwargs)
+        model_name = self.model_map.get(prompt_name)
+        if model_name is None:
+            logger.error(f"Model for prompt '{prompt_name}' not found in model_map.")
+            return None, None, prompt
+        llm = self.llm_map.get(model_name)
+        if llm is None:
+            logger.error(f"Model '{model_name}' not found in LLMManagement.")
+            return model_name, None, prompt
+        return model_name, llm, prompt
+
+    @timeit_logger(name="LLMManagement.chat", level="DEBUG")
+    def chat(self, messages: list[dict], name: str, options: dict | None = None) -> str:
+        model_name, llm = self._resolve_chat(name)
+        if llm is None:
             return ""
         
         if options:
             return llm.chat(messages, model_name, options)
         else:
             return llm.respond(messages)
+
+    @timeit_logger(name="LLMManagement.achat", level="DEBUG")
+    async def achat(self, messages: list[dict], name: str, options: dict | None = None) -> str:
+        """
+        异步 chat：走共享连接池，不阻塞事件循环
+        """
+        model_name, llm = self._resolve_chat(name)
+        if llm is None:
+            return ""
+
+        if options:
+            return await llm.achat(messages, model_name, options)
+        else:
+            return await llm.arespond(messages)
+
+    @timeit_logger(name="LLMManagement.astream_chat", level="DEBUG")
+    async def astream_chat(self, messages: list[dict], name: str, options: dict | None = None) -> AsyncIterator[str]:
+        """
+        流式 chat：逐段产出增量文本；options 为空时使用实现类的默认参数
+        """
+        model_name, llm = self._resolve_chat(name)
+        if llm is None:
+            return
+
+        if not options:
+            model_name = getattr(llm, "model", model_name)
+            options = getattr(llm, "options", None)
+        async for delta in llm.astream(messages, model_name, options):
+            yield delta
+
     @timeit_logger(name="LLMManagement.generate", level="DEBUG")
     def generate(
             self, 
@@ -114,17 +208,67 @@ class LLMManagement():
             options: dict | None = None,
             **kwargs
             ) -> dict:
-        prompt_template = self.system_prompt.getPrompt(prompt_name)
-        prompt = self.render_prompt(prompt_template, **kwargs)
-        model_name = self.model_map.get(prompt_name)
+        model_name, llm, prompt = self._resolve_generate(prompt_name, **kwargs)
         if model_name is None:
-            logger.error(f"Model for prompt '{prompt_name}' not found in model_map.")
+            return {}
+        if llm is None:
             return {}
         if prompt == "":
-            return self.llm_map[model_name].failuredResponse()
-        llm = self.llm_map.get(model_name)
+            return llm.failuredResponse()
+        key = self._cache_key(model_name, prompt, options)
+        if key is not None:
+            cached = self.response_cache.get(key)  # type: ignore[union-attr]
+            if cached is not None:
+                return cached
+        data = llm.generate(prompt, model_name, options)
+        if key is not None and isinstance(data, dict):
+            self.response_cache.put(key, model_name, data)  # type: ignore[union-attr]
+        return data
+
+    @timeit_logger(name="LLMManagement.agenerate", level="DEBUG")
+    async def agenerate(
+            self,
+            prompt_name: str,
+            options: dict | None = None,
+            **kwargs
+            ) -> dict:
+        """
+        异步 generate：参数与 generate() 一致
+        """
+        model_name, llm, prompt = self._resolve_generate(prompt_name, **kwargs)
+        if model_name is None:
+            return {}
         if llm is None:
-            logger.error(f"Model '{model_name}' not found in LLMManagement.")
             return {}
-        return llm.generate(prompt, model_name, options)
-        
+        if prompt == "":
+            return llm.failuredResponse()
+        key = self._cache_key(model_name, prompt, options)
+        if key is not None:
+            # 内存 LRU 在事件循环里直接查，SQLite 读写都不在事件循环上做
+            cached = await self.response_cache.aget(key)  # type: ignore[union-attr]
+            if cached is not None:
+                return cached
+        data = await llm.agenerate(prompt, model_name, options)
+        if key is not None and isinstance(data, dict):
+            self.response_cache.put_background(key, model_name, data)  # type: ignore[union-attr]
+        return data
+
+    def _cache_key(self, model_name: str, prompt: str, options: dict | None) -> str | None:
+        """
+        只有 temperature=0 的调用才是确定性的：同一 (model, prompt, options) 必然得到同一输出，
+        返回缓存 key；其余情况返回 None（不走缓存）
+        """
+        if self.response_cache is None or not options:
+            return None
+        if options.get("temperature") != 0:
+            return None
+        return LLMResponseCache.make_key(model_name, prompt, options)
+
+    def getCacheStats(self) -> dict:
+        return self.response_cache.getStats() if self.response_cache is not None else {}
+
+    async def aclose(self) -> None:
+        await self.ollama_client.aclose()
+        if self.response_cache is not None:
+            # 等后台写入落盘后再关闭连接
+            await asyncio.to_thread(self.response_cache.close)
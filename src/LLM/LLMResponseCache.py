@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from loguru import logger
+
+
+class LLMResponseCache:
+    """
+    确定性 generate 的结构化输出缓存（内容寻址）：
+    - key = sha256(model + 渲染后的 prompt + options)，同一输入必然命中同一条
+    - 一级：进程内 LRU（OrderedDict），受 max_entries 与 ttl 限制
+    - 二级（可选）：SQLite 表，进程重启后仍可命中，受 db_max_rows 与 ttl 限制
+    - 值以 JSON 字符串保存，每次命中都返回新的 dict，调用方修改结果不会污染缓存
+
+    只应缓存 temperature=0 的调用，是否可缓存由调用方（LLMManagement）判断。
+
+    异步调用方用 aget / put_background：只有内存 LRU 在事件循环里同步访问，
+    SQLite 读走 asyncio.to_thread，写交给单线程后台写入器（不等待提交），磁盘 IO 不阻塞事件循环。
+    内存与 SQLite 分别加锁，后台写入进行中不影响内存命中。
+
+    **kwargs 参数说明**:
+    - llm_cache_max_entries: 内存 LRU 最大条数
+    - llm_cache_ttl: 过期时间（秒），<=0 表示不过期
+    - llm_cache_db_path: SQLite 文件路径，为空则只用内存
+    - llm_cache_db_max_rows: SQLite 表最大行数，超出时删除最旧的记录
+    """
+
+    TABLE = "llm_response_cache"
+
+    def __init__(self, **kwargs):
+        self.max_entries = max(1, int(kwargs.get("llm_cache_max_entries", 1024)))
+        self.ttl = float(kwargs.get("llm_cache_ttl", 24 * 3600))
+        self.db_path: Optional[str] = kwargs.get("llm_cache_db_path") or None
+        self.db_max_rows = max(1, int(kwargs.get("llm_cache_db_max_rows", 20000)))
+
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._puts_since_prune = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if self.db_path:
+            try:
+                self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._db.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.TABLE} ("
+                    "key TEXT PRIMARY KEY, model TEXT, value TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+                self._db.execute(
+                    f"CREATE INDEX IF NOT EXISTS ix_{self.TABLE}_created_at ON {self.TABLE}(created_at)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"LLMResponseCache sqlite disabled ({self.db_path}): {e}")
+                self._db = None
+
+    @staticmethod
+    def make_key(model: str, prompt: str, options: dict | None) -> str:
+        payload = json.dumps(
+            {"model": model, "prompt": prompt, "options": options or {}},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        hit = self._get_memory(key, now)
+        if hit is not None:
+            return hit
+        return self._get_disk(key, now)
+
+    async def aget(self, key: str) -> Optional[dict]:
+        """get 的异步版本：内存命中直接返回，未命中时 SQLite 查询放到线程里"""
+        now = time.time()
+        hit = self._get_memory(key, now)
+        if hit is not None:
+            return hit
+        if self._db is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        return await asyncio.to_thread(self._get_disk, key, now)
+
+    def put(self, key: str, model: str, value: dict) -> None:
+        encoded = self._encode(value)
+        if encoded is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, encoded, now)
+        self._db_put(key, model, encoded, now)
+
+    def put_background(self, key: str, model: str, value: dict) -> None:
+        """put 的非阻塞版本：内存 LRU 立即更新，SQLite 写入交给后台写线程"""
+        encoded = self._encode(value)
+        if encoded is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, encoded, now)
+        if self._db is None:
+            return
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache-writer")
+        self._writer.submit(self._db_put, key, model, encoded, now)
+
+    def flush(self) -> None:
+        """等待后台写入全部完成"""
+        if self._writer is not None:
+            self._writer.submit(lambda: None).result()
+
+    def clear(self) -> None:
+        self.flush()
+        with self._lock:
+            self._memory.clear()
+        with self._db_lock:
+            if self._db is not None:
+                try:
+                    self._db.execute(f"DELETE FROM {self.TABLE}")
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"LLMResponseCache clear failed: {e}")
+
+    def getStats(self) -> dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "entries": len(self._memory),
+            }
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ---------------- internal ----------------
+
+    @staticmethod
+    def _encode(value: dict) -> Optional[str]:
+        # 空结果通常是失败兜底（failuredResponse），不缓存
+        if not value:
+            return None
+        try:
+            return json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return None
+
+    def _get_memory(self, key: str, now: float) -> Optional[dict]:
+        """只查内存 LRU；未命中不计数（由磁盘层或调用方计）"""
+        with self._lock:
+            item = self._memory.get(key)
+            if item is None:
+                return None
+            value, created_at = item
+            if self._expired(created_at, now):
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return json.loads(value)
+
+    def _get_disk(self, key: str, now: float) -> Optional[dict]:
+        row = self._db_get(key)
+        with self._lock:
+            if row is not None and not self._expired(row[1], now):
+                self._remember(key, row[0], row[1])
+                self.hits += 1
+                self.disk_hits += 1
+                return json.loads(row[0])
+            self.misses += 1
+            return None
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - created_at > self.ttl
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _db_get(self, key: str) -> Optional[tuple[str, float]]:
+        with self._db_lock:
+            if self._db is None:
+                return None
+            try:
+                return self._db.execute(
+                    f"SELECT value, created_at FROM {self.TABLE} WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"LLMResponseCache read failed: {e}")
+                return None
+
+    def _db_put(self, key: str, model: str, value: str, created_at: float) -> None:
+        with self._db_lock:
+            if self._db is None:
+                return
+            self._db_write(key, model, value, created_at)
+
+    def _db_write(self, key: str, model: str, value: str, created_at: float) -> None:
+        try:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.TABLE} (key, model, value, created_at) VALUES (?, ?, ?, ?)",
+                (key, model, value, created_at),
+            )
+            # 行数上限不必每次都检查，攒一批再裁剪
+            self._puts_since_prune += 1
+            if self._puts_since_prune >= 100:
+                self._puts_since_prune = 0
+                self._db.execute(
+                    f"DELETE FROM {self.TABLE} WHERE key NOT IN "
+                    f"(SELECT key FROM {self.TABLE} ORDER BY created_at DESC LIMIT ?)",
+                    (self.db_max_rows,),
+                )
+                if self.ttl > 0:
+                    self._db.execute(
+                        f"DELETE FROM {self.TABLE} WHERE created_at < ?", (created_at - self.ttl,)
+                    )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"LLMResponseCache write failed: {e}")
@@ -1,25 +1,136 @@
 from loguru import logger
 from logging_config import timeit_logger
-import requests
-from typing import Any
+from typing import Any, AsyncIterator
 
 from LLM.LLMChatAbstract import Chat
+from LLM.OllamaClient import OllamaClient
+from tools.TokenCounter import TokenCounter
 
 class OllamaChat(Chat):
-    def __init__(self):
+    """
+    **kwargs 参数说明**:
+    - ollama_keep_alive: 请求携带的 keep_alive（如 "30m"），None 时使用 Ollama 服务端默认值（5m）
+    - pinned_models: 常驻模型列表，这些模型请求时 keep_alive=-1，模型与 KV cache 不会被卸载
+    - prompt_token_counter: 估算完整 prompt token 数用的 TokenCounter 实例（与 ContextPacker 共用），
+      未传入时按 token_counter / tokenizer_model 自建；只在 DEBUG 日志输出时才会用到
+    - context_message_overhead: 每条消息的模板开销，与 ContextPacker 一致
+    """
+    def __init__(self, client: OllamaClient | None = None, **kwargs):
         self.model = "qwen3:8b"  # 默认模型名称，可根据需要修改
         self.options = {
             "temperature": 0.7,
             "top_p": 0.9
         }
+        # 共享连接池；未注入时自建一个（单独使用 OllamaChat 的场景）
+        self.client = client or OllamaClient(**kwargs)
+        self.keep_alive = kwargs.get("ollama_keep_alive")
+        self.pinned_models: set[str] = set(kwargs.get("pinned_models", []) or [])
+        self.token_counter: TokenCounter = kwargs.get("prompt_token_counter") or TokenCounter.create(**kwargs)
+        self.message_overhead = int(kwargs.get("context_message_overhead", 4))
     def supportModel(self) -> list[str]:
         return ["qwen3:8b", "qwen3:1.7b", "qwen3:4b"]
     def respond(self, messages):
         return self.chat(messages, self.model, self.options)
+    async def arespond(self, messages):
+        return await self.achat(messages, self.model, self.options)
 
     @timeit_logger(name="OllamaChat.chat", level="DEBUG")
     def chat(self, messages: list[dict], model: str, options: dict | None = None) -> dict:
         return self._call_ollama_api(messages, model, options)
+
+    @timeit_logger(name="OllamaChat.achat", level="DEBUG")
+    async def achat(self, messages: list[dict], model: str, options: dict | None = None) -> Any:
+        try:
+            data = await self.client.apost("api/chat", self._build_payload(messages, model, options))
+            self._log_stats(data, messages)
+            return self._parse_output(data)
+        except Exception as e:
+            logger.error(f"[Ollama API Error] {e}")
+            return self.failuredResponse()
+
+    async def astream(self, messages: list[dict], model: str, options: dict | None = None) -> AsyncIterator[str]:
+        """
+        流式 chat：按 Ollama 输出的顺序逐段产出 message.content
+        连接/HTTP 错误直接抛出，由调用方决定如何回退
+        """
+        payload = self._build_payload(messages, model, options)
+        async for chunk in self.client.astream("api/chat", payload):
+            if chunk.get("error"):
+                raise RuntimeError(f"Ollama stream error: {chunk['error']}")
+            delta = self._parse_output(chunk)
+            if delta:
+                yield delta
+            if chunk.get("done"):
+                self._log_stats(chunk, messages)
+                break
+
+    def _build_payload(self, messages: list[dict], model: str, options: dict[str, Any] | None) -> dict[str, Any]:
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": False,
+            "think": False,
+            "options": options or {}
+        }
+        keep_alive = self._keep_alive_for(model)
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        return payload
+
+    def _keep_alive_for(self, model: str) -> Any:
+        if model in self.pinned_models:
+            return -1
+        return self.keep_alive
+
+    def estimate_prompt_tokens(self, messages: list[dict]) -> int:
+        """完整 prompt 的 token 估算：各条 content 计数 + 每条的模板开销（不含 chat template 的其余部分）"""
+        return sum(self.token_counter.count(m.get("content") or "") + self.message_overhead for m in messages)
+
+    def _cache_estimate(self, messages: list[dict], prompt_eval_count: int) -> str:
+        prompt_tokens = self.estimate_prompt_tokens(messages)
+        return (
+            f"prompt≈{prompt_tokens} tok, cached≈{max(0, prompt_tokens - prompt_eval_count)} tok "
+            f"(estimate, {self.token_counter.name})"
+        )
+
+    def _log_stats(self, data: dict[str, Any], messages: list[dict] | None = None) -> dict[str, Any] | None:
+        """
+        记录 Ollama 返回的评估统计（非流式响应 / 流式最后一个 done 块），返回本次调用的统计 dict
+        - prompt_eval_count 只统计本次真正评估的 token，命中 KV cache 的前缀不计入
+        - 复用 KV cache 的 token 数没有直接来源，只能用 完整 prompt 估算 - prompt_eval_count 近似：
+          需要对整段 prompt 重新计数，放在 DEBUG 日志里惰性计算，INFO 级别下不会触发
+        """
+        if "prompt_eval_count" not in data and "eval_count" not in data:
+            return None
+        ns = 1_000_000
+        stats = {
+            "model": data.get("model"),
+            "prompt_eval_count": data.get("prompt_eval_count", 0),
+            "prompt_eval_ms": data.get("prompt_eval_duration", 0) / ns,
+            "eval_count": data.get("eval_count", 0),
+            "eval_ms": data.get("eval_duration", 0) / ns,
+            "load_ms": data.get("load_duration", 0) / ns,
+            "total_ms": data.get("total_duration", 0) / ns,
+        }
+        logger.info(
+            f"[ollama] model={stats['model']} prompt_eval={stats['prompt_eval_count']} tok "
+            f"in {stats['prompt_eval_ms']:.0f} ms, eval={stats['eval_count']} tok "
+            f"in {stats['eval_ms']:.0f} ms, load={stats['load_ms']:.0f} ms"
+        )
+        if messages:
+            logger.opt(lazy=True).debug(
+                "[ollama] model={} {}", lambda: stats["model"],
+                lambda: self._cache_estimate(messages, stats["prompt_eval_count"]),
+            )
+        return stats
+
+    @staticmethod
+    def _parse_output(data: dict[str, Any]) -> Any:
+        output = data.get("response") or data.get("message") or ""
+        if isinstance(output, dict):
+            output = output.get("content", "")
+        # 去除思考内
+        return output
     
     def _call_ollama_api(self, messages: list[dict], model: str, options: dict[str, Any] | None = None) -> Any:
         """
@@ -33,26 +144,12 @@ class OllamaChat(Chat):
         返回：
             dict，包含 response/message 字段内容
         """
-        url = "http://localhost:11434/api/chat"
-        payload = {
-            "model": model,
-            "messages": messages,
-            "stream": False,
-            "think": False,
-            "options": options or {}
-        }
         try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-
-            data = response.json()
-            output = data.get("response") or data.get("message") or ""
-            if isinstance(output, dict):
-                output = output.get("content", "")
-            # 去除思考内
-            return output
+            data = self.client.post("api/chat", self._build_payload(messages, model, options))
+            self._log_stats(data, messages)
+            return self._parse_output(data)
         except Exception as e:
             logger.error(f"[Ollama API Error] {e}")
             return self.failuredResponse()
     def failuredResponse(self) -> dict:
-        return {}
\ No newline at end of file
+        return {}
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, AsyncIterator
+
+import httpx
+import requests
+from loguru import logger
+from requests.adapters import HTTPAdapter
+
+
+class OllamaClient:
+    """
+    Ollama HTTP 传输层（所有 Ollama 实现共享一个实例）：
+    - 同步：requests.Session + 连接池，keep-alive 复用 TCP 连接
+    - 异步：httpx.AsyncClient + 连接池，按事件循环惰性创建
+    - 每个模型一个 asyncio.Semaphore，限制同一模型的并发请求数
+    - 统一超时（connect / read 分开配置）
+
+    **kwargs 参数说明**:
+    - ollama_base_url: Ollama 服务地址，默认 http://localhost:11434
+    - ollama_pool_size: 连接池大小（最大 keep-alive 连接数）
+    - ollama_connect_timeout: 建立连接超时（秒）
+    - ollama_read_timeout: 读取响应超时（秒），8B 生成较慢，默认 300
+    - model_concurrency: {model_name: 并发上限}，未配置的模型使用 default_model_concurrency
+    - default_model_concurrency: 默认单模型并发上限
+    """
+
+    def __init__(self, **kwargs):
+        self.base_url = str(kwargs.get("ollama_base_url", "http://localhost:11434")).rstrip("/")
+        self.pool_size = int(kwargs.get("ollama_pool_size", 8))
+        self.connect_timeout = float(kwargs.get("ollama_connect_timeout", 5.0))
+        self.read_timeout = float(kwargs.get("ollama_read_timeout", 300.0))
+        self.model_concurrency: dict[str, int] = dict(kwargs.get("model_concurrency", {}) or {})
+        self.default_model_concurrency = int(kwargs.get("default_model_concurrency", 2))
+
+        # 同步连接池
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        # 异步连接池与信号量都绑定事件循环，换循环时重建
+        self._async_client: httpx.AsyncClient | None = None
+        self._async_loop: asyncio.AbstractEventLoop | None = None
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    # ---------------- sync ----------------
+
+    def post(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
+        response = self._session.post(
+            self.url(path),
+            json=payload,
+            timeout=(self.connect_timeout, self.read_timeout),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    # ---------------- async ----------------
+
+    def _ensure_async(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            # 旧循环上的 client 无法在新循环里复用，直接丢弃（旧循环通常已关闭）
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+            )
+            self._async_loop = loop
+            self._semaphores = {}
+        return self._async_client
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        sem = self._semaphores.get(model)
+        if sem is None:
+            limit = int(self.model_concurrency.get(model, self.default_model_concurrency))
+            sem = asyncio.Semaphore(max(1, limit))
+            self._semaphores[model] = sem
+        return sem
+
+    async def apost(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
+        client = self._ensure_async()
+        model = str(payload.get("model", ""))
+        async with self._semaphore(model):
+            response = await client.post(self.url(path), json=payload)
+            response.raise_for_status()
+            return response.json()
+
+    async def astream(self, path: str, payload: dict[str, Any]) -> AsyncIterator[dict[str, Any]]:
+        """
+        流式请求：Ollama 以 NDJSON 逐行返回，每行解析为一个 dict 产出
+        """
+        client = self._ensure_async()
+        model = str(payload.get("model", ""))
+        async with self._semaphore(model):
+            async with client.stream("POST", self.url(path), json={**payload, "stream": True}) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"OllamaClient dropped malformed stream line: {line[:80]}")
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            try:
+                await self._async_client.aclose()
+            except Exception as exc:
+                logger.warning(f"OllamaClient async close failed: {exc}")
+            self._async_client = None
+            self._async_loop = None
+        self._session.close()
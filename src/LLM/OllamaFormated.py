@@ -1,14 +1,51 @@
 from LLM.LLMAbstract import LLM
+from LLM.OllamaClient import OllamaClient
 from typing import Any
-import requests
 from loguru import logger
 import json
 
 class OllamaFormated(LLM):
+    def __init__(self, client: OllamaClient | None = None):
+        # 共享连接池；未注入时自建一个
+        self.client = client or OllamaClient()
     def generate(self, prompt: str, model: str, options: dict | None = None) -> dict:
         return self._call_ollama_api(prompt, model, options)
+    async def agenerate(self, prompt: str, model: str, options: dict | None = None) -> dict:
+        try:
+            data = await self.client.apost("api/generate", self._build_payload(prompt, model, options))
+            return self._parse_output(data)
+        except Exception as e:
+            logger.error(f"[Ollama API Error] {e}")
+            return self.failuredResponse()
     def supportModel(self) -> list[str]:
         return ["qwen3:1.7b", "qwen3:4b"]
+
+    def _build_payload(self, prompt: str, model: str, options: dict[str, Any] | None) -> dict[str, Any]:
+        return {
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+            "think": False,
+            "options": options or {}
+        }
+
+    @staticmethod
+    def _parse_output(data: dict[str, Any]) -> dict:
+        output = data.get("response") or data.get("message") or "" 
+        # 尝试提取 JSON
+        if '</think>' in output:
+            output = output.split('</think>')[-1]
+            output = output.strip()
+        start = output.find('{')
+        end = output.rfind('}')
+        if start != -1 and end != -1:
+            output = output[start:end+1]
+        try:
+            decision = json.loads(output)
+            return decision
+        except Exception:
+            return {}
+
     def _call_ollama_api(self, prompt: str, model: str, options: dict[str, Any] | None = None) -> dict:
         """
         通用Ollama本地模型API调用函数。
@@ -21,34 +58,11 @@ class OllamaFormated(LLM):
         返回：
             dict，包含 response/message 字段内容
         """
-        url = "http://localhost:11434/api/generate"
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "stream": False,
-            "think": False,
-            "options": options or {}
-        }
         try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            output = data.get("response") or data.get("message") or "" 
-            # 尝试提取 JSON
-            if '</think>' in output:
-                output = output.split('</think>')[-1]
-                output = output.strip()
-            start = output.find('{')
-            end = output.rfind('}')
-            if start != -1 and end != -1:
-                output = output[start:end+1]
-            try:
-                decision = json.loads(output)
-                return decision
-            except Exception:
-                return {}
+            data = self.client.post("api/generate", self._build_payload(prompt, model, options))
+            return self._parse_output(data)
         except Exception as e:
             logger.error(f"[Ollama API Error] {e}")
             return self.failuredResponse()
     def failuredResponse(self) -> dict:
-        return {}
\ No newline at end of file
+        return {}
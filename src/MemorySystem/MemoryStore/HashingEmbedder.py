@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import re
+import zlib
+from typing import Sequence
+
+import numpy as np
+
+from MemorySystem.MemoryStore.TextEmbedder import TextEmbedder
+
+
+class HashingEmbedder(TextEmbedder):
+    """
+    字符 n-gram 特征哈希（无模型、无额外依赖，CPU 上每条几十微秒）：
+    - 汉字取 1~2 元组，英文 / 数字按小写整词，crc32 哈希到 dim 维，带符号累加后 L2 归一化
+    - 本质是词面相似度，召回同义改写的能力有限；有条件时用 TransformersEmbedder
+
+    **kwargs 参数说明**:
+    - vector_dim: 向量维度
+    """
+
+    _RUN_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[0-9a-z]+")
+
+    def __init__(self, **kwargs):
+        self.dim = int(kwargs.get("vector_dim", 256))
+        self.name = f"hashing-{self.dim}"
+
+    def _features(self, text: str) -> list[str]:
+        feats: list[str] = []
+        for run in self._RUN_RE.findall((text or "").lower()):
+            if run[0].isascii():
+                feats.append(run)
+                continue
+            feats.extend(run)
+            feats.extend(run[i:i + 2] for i in range(len(run) - 1))
+        return feats
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feat in self._features(text):
+                h = zlib.crc32(feat.encode("utf-8"))
+                out[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        return self.normalize(out)
@@ -1,16 +1,37 @@
+import os
+
 from DataClass.TagType import TagType
 from tools.PromptBuilder import PromptBuilder
 
 
 class IdentitiyMemory:
+    PERSONALITY_PATH = 'Alice_personality.txt'
+
     def __init__(self):
+        self.mtime: float | None = None
         self.loadSelfAwareness()
         pass
     def updateSelfAwareness(self, new_awareness: str):
         pass
     def loadSelfAwareness(self):
-        with open('Alice_personality.txt', 'r', encoding='utf-8') as f:
+        with open(self.PERSONALITY_PATH, 'r', encoding='utf-8') as f:
             self.self_awareness = f.readlines()
+        self.mtime = self._stat_mtime()
+
+    def _stat_mtime(self) -> float | None:
+        try:
+            return os.path.getmtime(self.PERSONALITY_PATH)
+        except OSError:
+            return None
+
+    def getVersion(self) -> float | None:
+        """
+        身份文件的 mtime 作为版本号；文件被修改时顺便重新加载
+        """
+        mtime = self._stat_mtime()
+        if mtime is not None and mtime != self.mtime:
+            self.loadSelfAwareness()
+        return self.mtime
 
     def getSelfAwareness(self) -> str:
         return ''.join(self.self_awareness)
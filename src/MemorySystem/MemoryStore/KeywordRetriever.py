@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from DataClass.QuerySchema import QuerySchema
+from DataClass.RetrievalHit import RetrievalHit
+from RawChatHistory.RawChatHistory import RawChatHistory
+from tools.TokenCounter import TokenCounter
+
+
+class KeywordRetriever:
+    """
+    QuerySchema(mode="keyword") 的检索实现：SQLite FTS5 + BM25（见 RawChatHistory/sqlit/FtsIndex）
+    - 查询词 = schema.keywords + schema.query_text，切分成二元组后 OR 匹配
+    - 来源映射：MESSAGE_SOURCES -> chat_messages，DIALOGUE_SOURCES -> dialogue_messages 摘要；
+      其他来源（user_profile / kb / env ...）不由本检索器处理
+    - 每个来源内把 BM25 分数归一化到 0~1 再合并排序，取前 top_k 条，累计 token 不超过 token_budget
+      （放不下的单条跳过，继续尝试后面更短的）
+
+    before_turn_id：只检索该 turn 之前的消息，避免重复召回已经在最近对话窗口里的内容
+    """
+
+    MESSAGE_SOURCES = ("short_term", "long_term")
+    DIALOGUE_SOURCES = ("mid_term",)
+
+    def __init__(self, raw_history: RawChatHistory, token_counter: Optional[TokenCounter] = None):
+        self.raw_history = raw_history
+        self.token_counter = token_counter or TokenCounter()
+
+    def retrieve(self, schema: QuerySchema, *, before_turn_id: Optional[int] = None) -> List[RetrievalHit]:
+        if not schema.retrieve or schema.top_k <= 0 or schema.token_budget <= 0:
+            return []
+        # 多取一些候选，给 token 预算裁剪留余量
+        hits = self.search(schema, limit=schema.top_k * 2, before_turn_id=before_turn_id)
+        packed = self.pack(hits, top_k=schema.top_k, token_budget=schema.token_budget)
+        logger.debug(
+            f"KeywordRetriever: {len(hits)} candidates -> {len(packed)} hits, "
+            f"{sum(h.tokens for h in packed)}/{schema.token_budget} tokens"
+        )
+        return packed
+
+    def search(self, schema: QuerySchema, *, limit: int, before_turn_id: Optional[int] = None) -> List[RetrievalHit]:
+        """不做预算裁剪的候选列表（每个来源最多 limit 条），按归一化分数降序；hybrid 粗筛也用它"""
+        texts = self.query_texts(schema)
+        if not texts:
+            return []
+
+        hits: List[RetrievalHit] = []
+        message_source = next((s for s in schema.sources if s in self.MESSAGE_SOURCES), None)
+        if message_source is not None:
+            hits += self.search_messages(texts, source=message_source, limit=limit, before_turn_id=before_turn_id)
+
+        dialogue_source = next((s for s in schema.sources if s in self.DIALOGUE_SOURCES), None)
+        if dialogue_source is not None:
+            hits += self.search_dialogues(texts, source=dialogue_source, limit=limit)
+
+        hits.sort(key=lambda h: h.score, reverse=True)
+        return hits
+
+    @staticmethod
+    def query_texts(schema: QuerySchema) -> List[str]:
+        return [k for k in (schema.keywords or []) if k] + ([schema.query_text] if schema.query_text else [])
+
+    def search_messages(
+        self,
+        texts: List[str],
+        *,
+        source: str,
+        limit: int,
+        before_turn_id: Optional[int] = None,
+        role: Optional[str] = None,
+    ) -> List[RetrievalHit]:
+        """检索 chat_messages，命中标注为 source；role 限定说话方（如 user_profile 只看用户自己说过的话）"""
+        rows = self.raw_history.sql_manager.searchMessages(
+            texts, limit=limit, before_turn_id=before_turn_id, role=role
+        )
+        return self._normalize([
+            RetrievalHit(
+                source=source,
+                kind="message",
+                ref_id=r["chat_turn_id"],
+                text=r["content"],
+                score=float(r["score"]),
+                timestamp=r["timestamp"],
+                meta={"role": r["role"], "sender_name": r["sender_name"],
+                      "sender_id": r["sender_id"], "timedate": r["timedate"]},
+            )
+            for r in rows
+        ])
+
+    def search_dialogues(self, texts: List[str], *, source: str, limit: int) -> List[RetrievalHit]:
+        rows = self.raw_history.sql_manager.searchDialogues(texts, limit=limit)
+        return self._normalize([
+            RetrievalHit(
+                source=source,
+                kind="dialogue",
+                ref_id=r["dialogue_id"],
+                text=r["summary"],
+                score=float(r["score"]),
+                meta={"start_turn_id": r["start_turn_id"], "end_turn_id": r["end_turn_id"]},
+            )
+            for r in rows
+        ])
+
+    @staticmethod
+    def _normalize(hits: List[RetrievalHit]) -> List[RetrievalHit]:
+        top = max((h.score for h in hits), default=0.0)
+        if top > 0:
+            for h in hits:
+                h.score = h.score / top
+        return hits
+
+    def pack(self, hits: List[RetrievalHit], *, top_k: int, token_budget: int) -> List[RetrievalHit]:
+        """按顺序去重装箱：最多 top_k 条，累计 token 不超过 token_budget，放不下的单条跳过"""
+        packed: List[RetrievalHit] = []
+        seen: Dict[tuple, None] = {}
+        used = 0
+        for h in hits:
+            if len(packed) >= top_k:
+                break
+            if h.key() in seen:
+                continue
+            h.tokens = self.token_counter.count(h.text)
+            if used + h.tokens > token_budget:
+                continue
+            seen[h.key()] = None
+            used += h.tokens
+            packed.append(h)
+        return packed
@@ -10,9 +10,16 @@ from MemorySystem.MemoryPolicy import MemoryPolicy
 from DataClass.DialogueMessage import DialogueMessage
 from tools.PromptBuilder import PromptBuilder
 from MemorySystem.MemoryStore.BaseStore import BaseStore
+from MemorySystem.MemoryStore.KeywordRetriever import KeywordRetriever
+from MemorySystem.MemoryStore.VectorMemoryStore import VectorMemoryStore
 
 
 class MemoryStorage(BaseStore):
+    """
+    **kwargs 参数说明**:
+    - vector_memory: 是否启用向量记忆（QuerySchema.mode 为 vector / hybrid 时使用），默认关闭
+    - vector_*: 透传给 VectorMemoryStore
+    """
     def __init__(self,
                 # 近期消息窗口（消息轮数）
                 history_window: int,
@@ -21,7 +28,8 @@ class MemoryStorage(BaseStore):
                 min_raw_for_summary: int,
                 raw_history: RawChatHistory, 
                 llm_management: LLMManagement, 
-                policy: MemoryPolicy):
+                policy: MemoryPolicy,
+                **kwargs):
         
         self.raw_history = raw_history
         self.identity_memory = IdentitiyMemory()
@@ -32,10 +40,20 @@ class MemoryStorage(BaseStore):
             llm_management, 
             policy)
         self.world_core_storage = WordCoreStorage()
+        self.keyword_retriever = KeywordRetriever(raw_history)
+        self.vector_store: VectorMemoryStore | None = None
+        if kwargs.get("vector_memory", False):
+            self.vector_store = VectorMemoryStore(raw_history, self.keyword_retriever, **kwargs)
         
 
     def getIdentity(self) -> PromptBuilder:
         return self.identity_memory.getIdentity()
+
+    def getIdentityVersion(self) -> float | None:
+        return self.identity_memory.getVersion()
+
+    def getDialogueVersion(self) -> int:
+        return self.raw_history.dialogue_version
     
     def maybeUpdateDialogueSummary(self) ->None:
         return self.dialogue_storage.maybeUpdateDialogueSummary()
@@ -43,6 +61,22 @@ class MemoryStorage(BaseStore):
 
     def getWorldCore(self) -> PromptBuilder:
         return self.world_core_storage.getWorldCore()
+
+    def retrieve_keyword(self, schema, before_turn_id: int | None = None) -> list:
+        """按 QuerySchema 做 FTS5 / BM25 检索，返回 RetrievalHit 列表（见 KeywordRetriever）"""
+        return self.keyword_retriever.retrieve(schema, before_turn_id=before_turn_id)
+
+    def retrieve(self, schema, before_turn_id: int | None = None) -> list:
+        """按 schema.mode 分派：vector / hybrid 走向量记忆（未启用时退回关键词检索），其余走关键词检索"""
+        if schema.mode in ("vector", "hybrid") and self.vector_store is not None:
+            return self.vector_store.retrieve(schema, before_turn_id=before_turn_id)
+        return self.keyword_retriever.retrieve(schema, before_turn_id=before_turn_id)
+
+    def sync_vector_memory(self) -> int:
+        """把新消息 / 更新过的摘要增量写入向量记忆（CPU 密集，应在后台线程调用）"""
+        if self.vector_store is None:
+            return 0
+        return self.vector_store.sync()
     
     
     # ---- DB / history wrappers (统一通过 MemoryStorage 访问 RawChatHistory) ----
@@ -52,15 +86,24 @@ class MemoryStorage(BaseStore):
         """Add a ChatMessage to history via RawChatHistory and return turn_id."""
         return self.raw_history.addMessage(history)
 
-    def get_history(self, length: int = -1):
-        return self.raw_history.getHistory(length)
+    async def aadd_history(self, history) -> int:
+        """add_history 的异步版本：等待后台写线程提交，不阻塞事件循环"""
+        return await self.raw_history.aaddMessage(history)
+
+    def get_history(self, length: int = -1, projection: str | None = None):
+        return self.raw_history.getHistory(length, projection=projection)
     def get_history_by_id(self, id: int) -> Any | None:
         return None
 
-    def get_history_by_role(self, role: str, length: int = -1, sender_id: int | None = None):
-        return self.raw_history.getHistoryByRole(role, length, sender_id=sender_id)
+    def get_history_by_role(self, role: str, length: int = -1, sender_id: int | None = None, projection: str | None = None):
+        return self.raw_history.getHistoryByRole(role, length, sender_id=sender_id, projection=projection)
+
+    def attach_analyze(self, chat_turn_id: int, analyze_result) -> bool:
+        return self.raw_history.attachAnalyze(chat_turn_id, analyze_result)
 
     def delete_history_by_id(self, chat_turn_id: int):
+        if self.vector_store is not None:
+            self.vector_store.remove_message(chat_turn_id)
         return self.raw_history.deleteMessageById(chat_turn_id)
 
     def update_history(self, obj):
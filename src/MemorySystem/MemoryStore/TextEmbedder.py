@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Sequence
+
+import numpy as np
+
+
+class TextEmbedder(ABC):
+    """
+    文本 -> 向量（VectorMemoryStore 使用）
+    - embed 返回 (n, dim) float32，逐行 L2 归一化，内积即余弦相似度
+    - name 会写进向量索引的 meta，换模型后旧索引会被丢弃重建，避免混用不同空间的向量
+
+    **kwargs 参数说明**:
+    - vector_embedder: hashing（默认，无依赖的字符 n-gram 哈希）或 transformers（本地句向量模型）
+    - 其余参数见 HashingEmbedder / TransformersEmbedder
+    """
+
+    name: str = ""
+    dim: int = 0
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    @staticmethod
+    def normalize(vecs: np.ndarray) -> np.ndarray:
+        vecs = np.asarray(vecs, dtype=np.float32)
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vecs / norms
+
+    @staticmethod
+    def create(**kwargs) -> "TextEmbedder":
+        kind = kwargs.get("vector_embedder", "hashing")
+        if kind == "transformers":
+            from MemorySystem.MemoryStore.TransformersEmbedder import TransformersEmbedder
+            return TransformersEmbedder(**kwargs)
+        if kind == "hashing":
+            from MemorySystem.MemoryStore.HashingEmbedder import HashingEmbedder
+            return HashingEmbedder(**kwargs)
+        raise ValueError(f"Unsupported vector_embedder: {kind}")
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+from loguru import logger
+
+from MemorySystem.MemoryStore.TextEmbedder import TextEmbedder
+
+
+class TransformersEmbedder(TextEmbedder):
+    """
+    本地句向量模型（transformers + torch，CPU 推理）：
+    - mean pooling + L2 归一化，适用于 bge-small-zh / text2vec 等 BERT 类句向量模型
+    - 模型在首次 embed 时才加载，不拖慢启动
+    - 按 batch 推理，torch.inference_mode 下运行
+
+    **kwargs 参数说明**:
+    - vector_model: 模型名或本地路径
+    - vector_batch_size: 推理批大小
+    - vector_max_length: 截断长度（token）
+    - vector_threads: torch CPU 线程数，None 使用默认值
+    """
+
+    def __init__(self, **kwargs):
+        self.model_name = kwargs.get("vector_model", "BAAI/bge-small-zh-v1.5")
+        self.batch_size = int(kwargs.get("vector_batch_size", 32))
+        self.max_length = int(kwargs.get("vector_max_length", 256))
+        self.threads = kwargs.get("vector_threads", None)
+        self.name = f"transformers-{self.model_name}"
+        self._tokenizer = None
+        self._model = None
+        self._torch = None
+        self.dim = int(kwargs.get("vector_dim", 0)) or self._load().config.hidden_size
+
+    def _load(self):
+        if self._model is None:
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+
+            if self.threads:
+                torch.set_num_threads(int(self.threads))
+            self._torch = torch
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            self._model = AutoModel.from_pretrained(self.model_name).eval()
+            logger.info(f"TransformersEmbedder loaded {self.model_name}")
+        return self._model
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        model = self._load()
+        torch = self._torch
+        out: list[np.ndarray] = []
+        with torch.inference_mode():
+            for i in range(0, len(texts), self.batch_size):
+                batch = [t or "" for t in texts[i:i + self.batch_size]]
+                enc = self._tokenizer(
+                    batch, padding=True, truncation=True, max_length=self.max_length, return_tensors="pt"
+                )
+                hidden = model(**enc).last_hidden_state
+                mask = enc["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                out.append(pooled.float().cpu().numpy())
+        if not out:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return self.normalize(np.concatenate(out, axis=0))
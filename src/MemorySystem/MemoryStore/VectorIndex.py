@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+
+KeyFilter = Callable[[np.ndarray], np.ndarray]
+
+
+class VectorIndex:
+    """
+    内存映射向量存储 + IVF 近似最近邻（纯 numpy，不依赖 faiss / hnswlib）：
+    - 列式存储：vectors（int8 量化或 float32）/ scales / keys / alive / assign 各一个定长文件，np.memmap 打开，
+      容量不够时成倍扩展文件；进程重启后直接映射，不需要重新 embed
+    - int8 量化：每行按 max|v| / 127 缩放，体积是 float32 的 1/4，余弦误差在 1e-2 量级
+    - 删除只打墓碑（alive=0），死行超过 30% 时 flush 触发 compact
+    - 行数少于 train_threshold 时精确暴力检索（分块矩阵乘）；超过后训练球面 k-means 质心，
+      每行归属一个倒排桶，检索只扫描与查询最接近的 nprobe 个桶；行数翻倍后重新训练
+    - key 为 int64，由上层编码（见 VectorMemoryStore）
+
+    **kwargs 参数说明**:
+    - vector_dtype: int8（默认）或 float32
+    - vector_nprobe: 检索时扫描的倒排桶数
+    - vector_train_threshold: 行数达到多少后启用 IVF
+    """
+
+    META_FILE = "meta.json"
+    CENTROIDS_FILE = "centroids.npy"
+    INITIAL_CAPACITY = 1024
+    SCAN_CHUNK = 65536
+
+    def __init__(self, path: Optional[str], dim: int, name: str = "", **kwargs):
+        self.path = path
+        self.dim = int(dim)
+        self.name = name
+        self.dtype_name = kwargs.get("vector_dtype", "int8")
+        if self.dtype_name not in ("int8", "float32"):
+            raise ValueError(f"Unsupported vector_dtype: {self.dtype_name}")
+        self.dtype = np.int8 if self.dtype_name == "int8" else np.float32
+        self.nprobe = max(1, int(kwargs.get("vector_nprobe", 8)))
+        self.train_threshold = max(1, int(kwargs.get("vector_train_threshold", 4096)))
+
+        self._lock = threading.RLock()
+        self._cols: Dict[str, np.ndarray] = {}
+        self.count = 0  # 已用行数（含墓碑）
+        self.capacity = 0
+        self.centroids: Optional[np.ndarray] = None
+        self._trained_at = 0
+        self._row_of: Dict[int, int] = {}
+        self._lists: Dict[int, List[int]] = {}
+        # 上层的同步水位等少量状态，随 meta 一起持久化
+        self.extra: Dict[str, Any] = {}
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+        else:
+            self._resize(self.INITIAL_CAPACITY)
+
+    # ---------------- 存储 ----------------
+
+    def _spec(self) -> Dict[str, Tuple[Any, Tuple[int, ...]]]:
+        return {
+            "vectors": (self.dtype, (self.dim,)),
+            "scales": (np.float32, ()),
+            "keys": (np.int64, ()),
+            "alive": (np.uint8, ()),
+            "assign": (np.int32, ()),
+        }
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path or "", f"{name}.bin")
+
+    def _resize(self, capacity: int) -> None:
+        for name, (dt, shape) in self._spec().items():
+            old = self._cols.get(name)
+            if self.path:
+                if isinstance(old, np.memmap):
+                    old.flush()
+                self._cols.pop(name, None)
+                del old
+                fn = self._file(name)
+                nbytes = capacity * np.dtype(dt).itemsize * int(np.prod(shape, dtype=np.int64))
+                with open(fn, "r+b" if os.path.exists(fn) else "w+b") as f:
+                    f.truncate(nbytes)
+                self._cols[name] = np.memmap(fn, dtype=dt, mode="r+", shape=(capacity,) + shape)
+            else:
+                arr = np.zeros((capacity,) + shape, dtype=dt)
+                if old is not None:
+                    arr[: self.count] = old[: self.count]
+                self._cols[name] = arr
+        self.capacity = capacity
+
+    def _ensure_capacity(self, n: int) -> None:
+        need = self.count + n
+        if need > self.capacity:
+            capacity = max(self.INITIAL_CAPACITY, self.capacity)
+            while capacity < need:
+                capacity *= 2
+            self._resize(capacity)
+
+    def _load(self) -> None:
+        meta_path = os.path.join(self.path, self.META_FILE)
+        meta: Dict[str, Any] = {}
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        if meta and (meta.get("dim"), meta.get("dtype"), meta.get("name")) != (self.dim, self.dtype_name, self.name):
+            logger.warning(
+                f"VectorIndex at {self.path} was built with {meta.get('name')}/{meta.get('dim')}/{meta.get('dtype')}, "
+                f"rebuilding for {self.name}/{self.dim}/{self.dtype_name}"
+            )
+            meta = {}
+            for name in self._spec():
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+            centroids_path = os.path.join(self.path, self.CENTROIDS_FILE)
+            if os.path.exists(centroids_path):
+                os.remove(centroids_path)
+
+        self.count = int(meta.get("count", 0))
+        self._trained_at = int(meta.get("trained_at", 0))
+        self.extra = dict(meta.get("extra", {}))
+        self._resize(max(self.INITIAL_CAPACITY, int(meta.get("capacity", 0))))
+
+        centroids_path = os.path.join(self.path, self.CENTROIDS_FILE)
+        if meta and os.path.exists(centroids_path):
+            self.centroids = np.load(centroids_path).astype(np.float32)
+        self._rebuild_maps()
+
+    def _rebuild_maps(self) -> None:
+        keys = self._cols["keys"][: self.count]
+        alive = np.flatnonzero(self._cols["alive"][: self.count])
+        self._row_of = {int(keys[r]): int(r) for r in alive}
+        self._lists = {}
+        if self.centroids is not None:
+            assign = self._cols["assign"]
+            for r in alive:
+                self._lists.setdefault(int(assign[r]), []).append(int(r))
+
+    def flush(self) -> None:
+        with self._lock:
+            if self.count and self.count - len(self._row_of) > 0.3 * self.count:
+                self.compact()
+            if not self.path:
+                return
+            for arr in self._cols.values():
+                if isinstance(arr, np.memmap):
+                    arr.flush()
+            if self.centroids is not None:
+                np.save(os.path.join(self.path, self.CENTROIDS_FILE), self.centroids)
+            meta = {
+                "dim": self.dim,
+                "dtype": self.dtype_name,
+                "name": self.name,
+                "count": self.count,
+                "capacity": self.capacity,
+                "trained_at": self._trained_at,
+                "extra": self.extra,
+            }
+            tmp = os.path.join(self.path, self.META_FILE + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(tmp, os.path.join(self.path, self.META_FILE))
+
+    def compact(self) -> None:
+        """丢弃墓碑行，行号重排（倒排桶随之重建）"""
+        with self._lock:
+            rows = np.flatnonzero(self._cols["alive"][: self.count])
+            m = len(rows)
+            for arr in self._cols.values():
+                arr[:m] = arr[rows]
+                arr[m: self.count] = 0
+            self.count = m
+            self._rebuild_maps()
+
+    # ---------------- 写 ----------------
+
+    def add(self, keys: Iterable[int], vecs: np.ndarray) -> None:
+        """插入或覆盖；vecs 需已 L2 归一化，(n, dim)"""
+        keys = [int(k) for k in keys]
+        vecs = np.asarray(vecs, dtype=np.float32).reshape(len(keys), self.dim)
+        if not keys:
+            return
+        with self._lock:
+            for k in keys:
+                self._discard(k)
+            self._ensure_capacity(len(keys))
+            rows = np.arange(self.count, self.count + len(keys))
+
+            if self.dtype == np.int8:
+                scales = np.abs(vecs).max(axis=1) / 127.0
+                scales[scales == 0] = 1.0
+                stored = np.clip(np.rint(vecs / scales[:, None]), -127, 127).astype(np.int8)
+            else:
+                scales = np.ones(len(keys), dtype=np.float32)
+                stored = vecs
+            self._cols["vectors"][rows] = stored
+            self._cols["scales"][rows] = scales
+            self._cols["keys"][rows] = keys
+            self._cols["alive"][rows] = 1
+            if self.centroids is not None:
+                assign = np.argmax(vecs @ self.centroids.T, axis=1).astype(np.int32)
+                self._cols["assign"][rows] = assign
+                for r, a in zip(rows, assign):
+                    self._lists.setdefault(int(a), []).append(int(r))
+            else:
+                self._cols["assign"][rows] = -1
+            for k, r in zip(keys, rows):
+                self._row_of[k] = int(r)
+            self.count += len(keys)
+
+            alive = len(self._row_of)
+            if alive >= self.train_threshold and alive >= 2 * self._trained_at:
+                self.train()
+
+    def remove(self, key: int) -> bool:
+        with self._lock:
+            return self._discard(int(key))
+
+    def _discard(self, key: int) -> bool:
+        row = self._row_of.pop(key, None)
+        if row is None:
+            return False
+        self._cols["alive"][row] = 0
+        if self.centroids is not None:
+            bucket = self._lists.get(int(self._cols["assign"][row]))
+            if bucket is not None:
+                try:
+                    bucket.remove(row)
+                except ValueError:
+                    pass
+        return True
+
+    # ---------------- IVF ----------------
+
+    def train(self, iterations: int = 10, sample_size: int = 20000) -> None:
+        """球面 k-means 训练质心，并把全部存活行重新分桶"""
+        with self._lock:
+            rows = np.flatnonzero(self._cols["alive"][: self.count])
+            if len(rows) == 0:
+                return
+            rng = np.random.default_rng(0)
+            sample = rows if len(rows) <= sample_size else rng.choice(rows, sample_size, replace=False)
+            x = self._decode(sample)
+            nlist = int(min(len(sample), max(8, min(1024, round(math.sqrt(len(rows)))))))
+
+            centroids = x[rng.choice(len(x), nlist, replace=False)].copy()
+            for _ in range(iterations):
+                assign = np.argmax(x @ centroids.T, axis=1)
+                for c in range(nlist):
+                    members = x[assign == c]
+                    centroids[c] = members.sum(axis=0) if len(members) else x[rng.integers(len(x))]
+                norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                centroids /= norms
+
+            self.centroids = centroids.astype(np.float32)
+            for start in range(0, len(rows), self.SCAN_CHUNK):
+                chunk = rows[start:start + self.SCAN_CHUNK]
+                self._cols["assign"][chunk] = np.argmax(self._decode(chunk) @ self.centroids.T, axis=1)
+            self._trained_at = len(rows)
+            self._rebuild_maps()
+            logger.info(f"VectorIndex trained {nlist} lists over {len(rows)} vectors")
+
+    # ---------------- 读 ----------------
+
+    def _decode(self, rows: np.ndarray) -> np.ndarray:
+        return self._cols["vectors"][rows].astype(np.float32) * self._cols["scales"][rows][:, None]
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        *,
+        candidates: Optional[Iterable[int]] = None,
+        key_filter: Optional[KeyFilter] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        返回 [(key, cosine)]，按相似度降序
+        candidates: 只在这些 key 中精确打分（hybrid 重排用）
+        key_filter: keys(np.int64 数组) -> bool 掩码，过滤不需要的 key
+        """
+        q = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            if candidates is not None:
+                rows = np.array([self._row_of[c] for c in candidates if c in self._row_of], dtype=np.int64)
+            elif self.centroids is not None:
+                probe = np.argsort(-(self.centroids @ q))[: self.nprobe]
+                rows = np.array([r for p in probe for r in self._lists.get(int(p), [])], dtype=np.int64)
+            else:
+                rows = np.flatnonzero(self._cols["alive"][: self.count])
+            if key_filter is not None and len(rows):
+                rows = rows[key_filter(self._cols["keys"][rows])]
+            if len(rows) == 0 or k <= 0:
+                return []
+
+            scores = np.empty(len(rows), dtype=np.float32)
+            for start in range(0, len(rows), self.SCAN_CHUNK):
+                chunk = rows[start:start + self.SCAN_CHUNK]
+                scores[start:start + len(chunk)] = (
+                    self._cols["vectors"][chunk].astype(np.float32) @ q
+                ) * self._cols["scales"][chunk]
+            keys = self._cols["keys"][rows]
+
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(keys[i]), float(scores[i])) for i in top]
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def __contains__(self, key: int) -> bool:
+        return int(key) in self._row_of
+
+    def getStats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "vectors": len(self._row_of),
+                "rows": self.count,
+                "capacity": self.capacity,
+                "dtype": self.dtype_name,
+                "dim": self.dim,
+                "lists": 0 if self.centroids is None else len(self.centroids),
+            }
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import threading
+import zlib
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from DataClass.QuerySchema import QuerySchema
+from DataClass.RetrievalHit import RetrievalHit
+from MemorySystem.MemoryStore.KeywordRetriever import KeywordRetriever
+from MemorySystem.MemoryStore.TextEmbedder import TextEmbedder
+from MemorySystem.MemoryStore.VectorIndex import VectorIndex
+from RawChatHistory.RawChatHistory import RawChatHistory
+
+
+class VectorMemoryStore:
+    """
+    QuerySchema(mode="vector" / "hybrid") 的检索实现：消息与对话摘要的向量记忆
+    - 向量存放在 VectorIndex（内存映射文件 + IVF），key = ref_id * 2 + kind（0 消息 / 1 摘要）
+    - sync() 增量同步：消息按 chat_turn_id 水位只 embed 新增部分；摘要会被原地更新，
+      对最近 dialogue_sync_window 条按内容哈希比较，变了才重新 embed；由回合结束后在后台线程调用
+    - vector：直接 ANN 检索；hybrid：KeywordRetriever 先粗筛 hybrid_candidates 条，
+      再按 alpha * 向量相似度 + (1 - alpha) * BM25 归一化分数 重排；粗筛为空时退化为 vector
+    - 结果与 KeywordRetriever 一样按 top_k / token_budget 装箱
+
+    **kwargs 参数说明**（其余透传给 TextEmbedder.create / VectorIndex）:
+    - vector_memory_path: 向量文件目录，为空则只在内存中（重启后重新 embed）
+    - vector_sync_batch: 每批 embed 的消息数
+    - vector_dialogue_sync_window: 每次同步检查的最近摘要条数
+    - vector_hybrid_candidates: hybrid 粗筛候选数
+    - vector_hybrid_alpha: hybrid 重排时向量分数的权重
+    """
+
+    KIND_BITS = {"message": 0, "dialogue": 1}
+
+    def __init__(
+        self,
+        raw_history: RawChatHistory,
+        keyword_retriever: KeywordRetriever,
+        embedder: Optional[TextEmbedder] = None,
+        **kwargs,
+    ):
+        self.raw_history = raw_history
+        self.keyword_retriever = keyword_retriever
+        self.embedder = embedder or TextEmbedder.create(**kwargs)
+        self.index = VectorIndex(
+            kwargs.get("vector_memory_path") or None, self.embedder.dim, name=self.embedder.name, **kwargs
+        )
+        self.sync_batch = max(1, int(kwargs.get("vector_sync_batch", 256)))
+        self.dialogue_sync_window = max(1, int(kwargs.get("vector_dialogue_sync_window", 20)))
+        self.hybrid_candidates = max(1, int(kwargs.get("vector_hybrid_candidates", 50)))
+        self.hybrid_alpha = float(kwargs.get("vector_hybrid_alpha", 0.7))
+        self._sync_lock = threading.Lock()
+
+    # ---------------- key ----------------
+
+    @classmethod
+    def make_key(cls, kind: str, ref_id: int) -> int:
+        return int(ref_id) * 2 + cls.KIND_BITS[kind]
+
+    @staticmethod
+    def split_key(key: int) -> tuple[str, int]:
+        return ("dialogue" if key & 1 else "message", key >> 1)
+
+    # ---------------- 同步 ----------------
+
+    def sync(self) -> int:
+        """增量同步，返回本次 embed 的条数；已有同步在跑时直接返回 0"""
+        if not self._sync_lock.acquire(blocking=False):
+            return 0
+        try:
+            n = self._sync_messages() + self._sync_dialogues()
+            if n:
+                self.index.flush()
+                logger.debug(f"VectorMemoryStore synced {n} items, {len(self.index)} vectors total")
+            return n
+        finally:
+            self._sync_lock.release()
+
+    def _sync_messages(self) -> int:
+        sql = self.raw_history.sql_manager
+        watermark = int(self.index.extra.get("message_watermark", 0))
+        total = 0
+        while True:
+            batch = sql.getMessagesAfter(watermark, limit=self.sync_batch)
+            if not batch:
+                break
+            items = [(m.chat_turn_id, m.content) for m in batch if (m.content or "").strip()]
+            if items:
+                vecs = self.embedder.embed([t for _, t in items])
+                self.index.add([self.make_key("message", i) for i, _ in items], vecs)
+                total += len(items)
+            watermark = batch[-1].chat_turn_id
+            self.index.extra["message_watermark"] = watermark
+        return total
+
+    def _sync_dialogues(self) -> int:
+        hashes: Dict[str, int] = self.index.extra.setdefault("dialogue_hashes", {})
+        changed = []
+        for d in self.raw_history.getDialogues(self.dialogue_sync_window):
+            if d.dialogue_id is None or not (d.summary or "").strip():
+                continue
+            h = zlib.crc32(d.summary.encode("utf-8"))
+            if hashes.get(str(d.dialogue_id)) != h:
+                changed.append((d.dialogue_id, d.summary, h))
+        if not changed:
+            return 0
+        vecs = self.embedder.embed([s for _, s, _ in changed])
+        self.index.add([self.make_key("dialogue", i) for i, _, _ in changed], vecs)
+        for i, _, h in changed:
+            hashes[str(i)] = h
+        return len(changed)
+
+    def remove_message(self, chat_turn_id: int) -> bool:
+        return self.index.remove(self.make_key("message", chat_turn_id))
+
+    def remove_dialogue(self, dialogue_id: int) -> bool:
+        self.index.extra.get("dialogue_hashes", {}).pop(str(dialogue_id), None)
+        return self.index.remove(self.make_key("dialogue", dialogue_id))
+
+    # ---------------- 检索 ----------------
+
+    def retrieve(self, schema: QuerySchema, *, before_turn_id: Optional[int] = None) -> List[RetrievalHit]:
+        if not schema.retrieve or schema.top_k <= 0 or schema.token_budget <= 0:
+            return []
+        query = schema.query_text or " ".join(schema.keywords or [])
+        sources = self._sources(schema)
+        if not query.strip() or not sources:
+            return []
+        q = self.embedder.embed([query])[0]
+
+        hits: List[RetrievalHit] = []
+        if schema.mode == "hybrid":
+            hits = self._rerank(q, self.keyword_retriever.search(
+                schema, limit=self.hybrid_candidates, before_turn_id=before_turn_id
+            ))
+        if not hits:
+            hits = self.search(q, schema.top_k * 2, sources=sources, before_turn_id=before_turn_id)
+        return self.keyword_retriever.pack(hits, top_k=schema.top_k, token_budget=schema.token_budget)
+
+    def _sources(self, schema: QuerySchema) -> Dict[str, str]:
+        """kind -> 命中时标注的来源名（取 schema.sources 中第一个对应来源）"""
+        out: Dict[str, str] = {}
+        for s in schema.sources:
+            if s in KeywordRetriever.MESSAGE_SOURCES:
+                out.setdefault("message", s)
+            elif s in KeywordRetriever.DIALOGUE_SOURCES:
+                out.setdefault("dialogue", s)
+        return out
+
+    def _rerank(self, q: np.ndarray, candidates: List[RetrievalHit]) -> List[RetrievalHit]:
+        if not candidates:
+            return []
+        keys = [self.make_key(h.kind, h.ref_id) for h in candidates]
+        vec_scores = dict(self.index.search(q, len(keys), candidates=keys))
+        for h, key in zip(candidates, keys):
+            # 还没同步进向量索引的候选只按关键词分数参与排序
+            h.meta["bm25"] = h.score
+            h.meta["cosine"] = vec_scores.get(key)
+            h.score = self.hybrid_alpha * vec_scores.get(key, 0.0) + (1 - self.hybrid_alpha) * h.score
+        return sorted(candidates, key=lambda h: h.score, reverse=True)
+
+    def search(
+        self,
+        q: np.ndarray,
+        k: int,
+        *,
+        sources: Dict[str, str],
+        before_turn_id: Optional[int] = None,
+    ) -> List[RetrievalHit]:
+        """纯向量检索：按 sources 限定的类型取最相近的 k 条，并从数据库补全文本"""
+        want_messages = "message" in sources
+        want_dialogues = "dialogue" in sources
+
+        def key_filter(keys: np.ndarray) -> np.ndarray:
+            is_dialogue = (keys & 1) == 1
+            ok = np.where(is_dialogue, want_dialogues, want_messages)
+            if before_turn_id is not None:
+                ok &= is_dialogue | ((keys >> 1) < before_turn_id)
+            return ok
+
+        scored = self.index.search(q, k, key_filter=key_filter)
+        return self._materialize(scored, sources)
+
+    def _materialize(self, scored: Sequence[tuple[int, float]], sources: Dict[str, str]) -> List[RetrievalHit]:
+        sql = self.raw_history.sql_manager
+        message_ids = [ref for kind, ref in (self.split_key(k) for k, _ in scored) if kind == "message"]
+        messages = {m.chat_turn_id: m for m in sql.getMessagesByIds(message_ids)}
+
+        hits: List[RetrievalHit] = []
+        for key, score in scored:
+            kind, ref = self.split_key(key)
+            if kind == "message":
+                m = messages.get(ref)
+                if m is None:
+                    continue
+                hits.append(RetrievalHit(
+                    source=sources["message"], kind="message", ref_id=ref, text=m.content, score=score,
+                    timestamp=m.timestamp,
+                    meta={"role": m.role, "sender_name": m.sender_name,
+                          "sender_id": m.sender_id, "timedate": m.timedate, "cosine": score},
+                ))
+            else:
+                d = self.raw_history.getDialogueById(ref)
+                if d is None:
+                    continue
+                hits.append(RetrievalHit(
+                    source=sources["dialogue"], kind="dialogue", ref_id=ref, text=d.summary, score=score,
+                    meta={"start_turn_id": d.start_turn_id, "end_turn_id": d.end_turn_id, "cosine": score},
+                ))
+        return hits
+
+    def getStats(self) -> dict:
+        stats = self.index.getStats()
+        stats["embedder"] = self.embedder.name
+        stats["message_watermark"] = self.index.extra.get("message_watermark", 0)
+        return stats
@@ -15,7 +15,8 @@ class MemorySystem:
                 summary_window: int,
                 min_raw_for_summary: int,
                 raw_history: RawChatHistory, 
-                llm_management: LLMManagement
+                llm_management: LLMManagement,
+                **kwargs
                 ):
         self.raw_history = raw_history
         self.llm_management = llm_management
@@ -24,7 +25,7 @@ class MemorySystem:
 
         self.storage = MemoryStorage(
             history_window, summary_window, min_raw_for_summary,
-            raw_history, self.llm_management,self.memory_policy)
+            raw_history, self.llm_management,self.memory_policy, **kwargs)
         
         self.assembler = MemoryAssembler(self.storage)
     def assembleWorldCore(self) -> PromptBuilder:
@@ -34,6 +35,12 @@ class MemorySystem:
         return self.assembler.assembleIdentity()
     def assembleShortMemory(self) -> PromptBuilder:
         return self.assembler.assembleShortMemory()
+
+    def getIdentityVersion(self) -> float | None:
+        return self.storage.getIdentityVersion()
+
+    def getShortMemoryVersion(self) -> int:
+        return self.storage.getDialogueVersion()
     
     def assemble(self) -> PromptBuilder:
         return self.assembler.assemble()
\ No newline at end of file
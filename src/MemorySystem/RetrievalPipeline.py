@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+from DataClass.QuerySchema import QuerySchema
+from DataClass.RetrievalHit import RetrievalHit
+from DataClass.TagType import TagType
+from MemorySystem.MemoryStore.KeywordRetriever import KeywordRetriever
+from MemorySystem.MemoryStore.MemoryStorage import MemoryStorage
+from tools.PromptBuilder import PromptBuilder
+from tools.TokenCounter import TokenCounter
+
+Retriever = Callable[[QuerySchema, Optional[int]], List[RetrievalHit]]
+
+
+class RetrievalPipeline:
+    """
+    查询构建与上下文组装之间的检索阶段：按 QuerySchema 召回记忆，打包成 <MEMORY_RECALL> 块
+    - 扇出：schema.sources 按检索器分组，每组放到线程里并行检索（SQLite 读不阻塞事件循环）
+      short_term / long_term -> 历史消息，mid_term -> 对话摘要，两者走 MemoryStorage.retrieve（随 mode 切换关键词 / 向量）；
+      user_profile -> 只检索用户自己说过的话；kb 等没有检索器的来源跳过，可用 register_source 接入
+    - 合并：score * 来源权重 降序，同分时新的优先；同一条消息 / 摘要只保留一份
+    - 装箱：最多 top_k 条，渲染后的整个块（含标签）token 数不超过 schema.token_budget
+    - 单个来源超时或出错只记日志，不影响其他来源
+
+    **kwargs 参数说明**:
+    - retrieval_timeout: 单个来源的检索超时（秒）
+    - retrieval_candidate_factor: 每个来源取 top_k * factor 条候选
+    - retrieval_max_hit_tokens: 单条命中渲染前截断到的 token 数
+    - retrieval_source_weights: 来源权重 dict，未列出的来源沿用默认值
+    """
+
+    DEFAULT_WEIGHTS: Dict[str, float] = {
+        "user_profile": 1.2,
+        "mid_term": 1.0,
+        "short_term": 1.0,
+        "long_term": 0.9,
+        "kb": 1.0,
+    }
+
+    def __init__(self, storage: MemoryStorage, token_counter: Optional[TokenCounter] = None, **kwargs):
+        self.storage = storage
+        self.token_counter = token_counter or storage.keyword_retriever.token_counter
+        self.timeout = float(kwargs.get("retrieval_timeout", 2.0))
+        self.candidate_factor = max(1, int(kwargs.get("retrieval_candidate_factor", 2)))
+        self.max_hit_tokens = max(1, int(kwargs.get("retrieval_max_hit_tokens", 160)))
+        self.source_weights = {**self.DEFAULT_WEIGHTS, **(kwargs.get("retrieval_source_weights") or {})}
+
+        self.retrievers: Dict[str, Retriever] = {}
+        for source in KeywordRetriever.MESSAGE_SOURCES:
+            self.register_source(source, self._retrieve_messages)
+        for source in KeywordRetriever.DIALOGUE_SOURCES:
+            self.register_source(source, self._retrieve_dialogues)
+        self.register_source("user_profile", self._retrieve_user_profile)
+        self._skipped: set[str] = set()
+
+    def register_source(self, source: str, retriever: Retriever) -> None:
+        """接入一个来源；同一个 retriever 注册到多个来源时，一轮里只调用一次"""
+        self.retrievers[source] = retriever
+
+    # ---------------- 各来源检索器 ----------------
+
+    def _retrieve_messages(self, schema: QuerySchema, before_turn_id: Optional[int]) -> List[RetrievalHit]:
+        return self.storage.retrieve(schema, before_turn_id=before_turn_id)
+
+    def _retrieve_dialogues(self, schema: QuerySchema, before_turn_id: Optional[int]) -> List[RetrievalHit]:
+        # 摘要覆盖的是整段对话，不按 turn 过滤
+        return self.storage.retrieve(schema)
+
+    def _retrieve_user_profile(self, schema: QuerySchema, before_turn_id: Optional[int]) -> List[RetrievalHit]:
+        retriever = self.storage.keyword_retriever
+        texts = retriever.query_texts(schema)
+        if not texts:
+            return []
+        hits = retriever.search_messages(
+            texts, source="user_profile", limit=schema.top_k, before_turn_id=before_turn_id, role="user"
+        )
+        return retriever.pack(hits, top_k=schema.top_k, token_budget=schema.token_budget)
+
+    # ---------------- 扇出 ----------------
+
+    @staticmethod
+    def _enabled(schema: Optional[QuerySchema]) -> bool:
+        return bool(schema is not None and schema.retrieve and schema.sources
+                    and schema.top_k > 0 and schema.token_budget > 0)
+
+    def _plan(self, schema: QuerySchema) -> List[tuple[Retriever, QuerySchema]]:
+        """按检索器把来源分组，每组一个只含这些来源、候选数放大的子 schema"""
+        groups: Dict[Retriever, List[str]] = {}
+        for source in schema.sources:
+            retriever = self.retrievers.get(source)
+            if retriever is None:
+                if source not in self._skipped:
+                    self._skipped.add(source)
+                    logger.debug(f"RetrievalPipeline: no retriever for source '{source}', skipped")
+                continue
+            sources = groups.setdefault(retriever, [])
+            if source not in sources:
+                sources.append(source)
+        top_k = schema.top_k * self.candidate_factor
+        return [(r, replace(schema, sources=list(s), top_k=top_k)) for r, s in groups.items()]
+
+    def retrieve(self, schema: Optional[QuerySchema], *, before_turn_id: Optional[int] = None) -> List[RetrievalHit]:
+        """同步版本：各来源依次检索"""
+        if not self._enabled(schema):
+            return []
+        results = [self._run(r, sub, before_turn_id) for r, sub in self._plan(schema)]
+        return self.pack(self.rank([h for hits in results for h in hits]), schema)
+
+    async def aretrieve(self, schema: Optional[QuerySchema], *, before_turn_id: Optional[int] = None) -> List[RetrievalHit]:
+        """各来源在线程里并行检索，合并排序后按 schema 的 top_k / token_budget 装箱"""
+        if not self._enabled(schema):
+            return []
+        results = await asyncio.gather(*(self._arun(r, sub, before_turn_id) for r, sub in self._plan(schema)))
+        hits = self.pack(self.rank([h for hits in results for h in hits]), schema)
+        logger.debug(
+            f"RetrievalPipeline: sources={schema.sources} -> {len(hits)} hits, "
+            f"{sum(h.tokens for h in hits)}/{schema.token_budget} tokens"
+        )
+        return hits
+
+    def _run(self, retriever: Retriever, schema: QuerySchema, before_turn_id: Optional[int]) -> List[RetrievalHit]:
+        try:
+            return retriever(schema, before_turn_id)
+        except Exception as e:
+            logger.warning(f"RetrievalPipeline: retrieval for {schema.sources} failed: {e}")
+            return []
+
+    async def _arun(self, retriever: Retriever, schema: QuerySchema, before_turn_id: Optional[int]) -> List[RetrievalHit]:
+        try:
+            return await asyncio.wait_for(
+                asyncio.to_thread(self._run, retriever, schema, before_turn_id), self.timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"RetrievalPipeline: retrieval for {schema.sources} timed out after {self.timeout}s")
+            return []
+
+    # ---------------- 合并 / 装箱 / 渲染 ----------------
+
+    def rank(self, hits: List[RetrievalHit]) -> List[RetrievalHit]:
+        """按 score * 来源权重 降序（同分新的优先）并去重，排名分记在 meta["rank_score"]"""
+        for h in hits:
+            h.meta["rank_score"] = h.score * self.source_weights.get(h.source, 1.0)
+        hits = sorted(hits, key=lambda h: (h.meta["rank_score"], h.timestamp or 0, h.ref_id), reverse=True)
+        seen: Dict[tuple, None] = {}
+        out: List[RetrievalHit] = []
+        for h in hits:
+            if h.key() not in seen:
+                seen[h.key()] = None
+                out.append(h)
+        return out
+
+    def pack(self, hits: List[RetrievalHit], schema: QuerySchema) -> List[RetrievalHit]:
+        """
+        按顺序装箱：单条先截断到 max_hit_tokens，再按渲染后的行累计，整个块不超过 token_budget；
+        放不下的单条跳过。最后按实际渲染结果复核一次（计数器对拼接不可加时从末尾剔除）
+        """
+        budget = schema.token_budget
+        used = self.token_counter.count(self.render_text([]))
+        packed: List[RetrievalHit] = []
+        for h in hits:
+            if len(packed) >= schema.top_k:
+                break
+            h.text = self.token_counter.truncate(h.text or "", self.max_hit_tokens)
+            if not h.text:
+                continue
+            line_tokens = self.token_counter.count(self.render_line(len(packed) + 1, h))
+            if used + line_tokens > budget:
+                continue
+            h.tokens = line_tokens
+            used += line_tokens
+            packed.append(h)
+        while packed and self.token_counter.count(self.render_text(packed)) > budget:
+            packed.pop()
+        return packed
+
+    @staticmethod
+    def render_line(index: int, hit: RetrievalHit) -> str:
+        if hit.kind == "dialogue":
+            start, end = hit.meta.get("start_turn_id"), hit.meta.get("end_turn_id")
+            return f"[{index}] ({hit.source}) 对话摘要 #{start}-{end if end is not None else '?'}: {hit.text}"
+        speaker = hit.meta.get("sender_name") or hit.meta.get("role") or ""
+        timedate = hit.meta.get("timedate") or ""
+        return f"[{index}] ({hit.source}) {timedate} {speaker}: {hit.text}"
+
+    def render(self, hits: List[RetrievalHit]) -> PromptBuilder:
+        b = PromptBuilder(TagType.MEMORY_RECALL_TAG)
+        for i, h in enumerate(hits, 1):
+            b.add(self.render_line(i, h))
+        return b
+
+    def render_text(self, hits: List[RetrievalHit]) -> str:
+        """按最终 system prompt 中的层级渲染（与 DefaultGlobalContextAssembler 的片段渲染一致）"""
+        return PromptBuilder().include(self.render(hits), clone=False).build()
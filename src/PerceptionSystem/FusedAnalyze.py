@@ -0,0 +1,58 @@
+from typing import Callable
+
+from loguru import logger
+from DataClass.AnalyzeResult import AnalyzeResult
+from LLM.LLMManagement import LLMManagement
+from PerceptionSystem.Analyzeabstract import Analyze
+from logging_config import timeit_logger
+
+
+class FusedAnalyze(Analyze):
+    """
+    融合感知：一次 fused_perception 调用同时得到
+    - text_analysis 的轻量信号（is_question / is_self_reference / emotional_cues）
+    - intent_classifier 的意图与置信度
+
+    意图部分原样放进 raw["fused_intent"]，由 IntentJudgeL 在构建 QuerySchema 时直接采用，
+    不再单独调用 intent_classifier；轻量信号部分与 OllamaAnalyze 写入相同的字段
+
+    router_input_builder: text -> router_input JSON（由 IntentJudgeL.build_router_input 提供，
+    与 intent_classifier 使用同一份候选意图）
+    """
+
+    RAW_KEY = "fused_intent"
+    LLM_OPTIONS = {"temperature": 0, "top_p": 1}
+
+    def __init__(self, llm_management: LLMManagement, router_input_builder: Callable[[str], str]):
+        self.llm_management = llm_management
+        self.router_input_builder = router_input_builder
+
+    def analyze(self, input_data: str) -> AnalyzeResult:
+        return self.fused_analysis(input_data)
+
+    @timeit_logger(name="FusedAnalyze.fused_analysis", level="DEBUG")
+    def fused_analysis(self, text: str) -> AnalyzeResult:
+        data = self.llm_management.generate(
+            prompt_name="fused_perception",
+            options=self.LLM_OPTIONS,
+            router_input=self.router_input_builder(text),
+        )
+        logger.debug(f"Fused Perception Response: {data}")
+        res = AnalyzeResult()
+        if not isinstance(data, dict) or not data:
+            return res
+
+        res.raw["ollama_text_analysis"] = {
+            k: data[k]
+            for k in ("is_question", "is_self_reference", "mentioned_entities", "emotional_cues")
+            if k in data
+        }
+        res.is_question = data.get("is_question", None)
+        res.is_self_reference = data.get("is_self_reference", None)
+        res.emotion_cues = data.get("emotional_cues", []) or []
+        if "intent" in data:
+            res.raw[self.RAW_KEY] = {
+                "intent": data.get("intent"),
+                "confidence": data.get("confidence", 0.0),
+            }
+        return res
@@ -1,10 +1,12 @@
 from __future__ import annotations
+import dataclasses
 import time
 from DataClass.AnalyzeResult import AnalyzeResult, Argument, Entity, Frame, Relation
 from ltp import LTP # type: ignore
 import torch
 from loguru import logger
 from PerceptionSystem.AnalyzeAbstract import Analyze
+from PerceptionSystem.LtpBatcher import LtpBatcher
 import re
 from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 from functools import lru_cache
@@ -12,6 +14,26 @@ from functools import lru_cache
 from logging_config import timeit_logger
 
 class LtpAnalyze(Analyze):
+    """
+    **kwargs 参数说明**:
+    - ltp / ltp_model_path: 已加载的 LTP 实例或模型路径
+    - ltp_stopwords / ltp_stopwords_path: 停用词集合或停用词文件路径
+    - ltp_batching: 是否通过 LtpBatcher 合批（默认开启），并发请求在一个窗口内合成一次 pipeline 调用
+    - ltp_max_batch_size / ltp_max_wait_ms: 透传给 LtpBatcher
+    - ltp_profile: 默认任务档位 fast / standard / full（默认 full，与原行为一致）
+    - ltp_fast_max_chars: 规范化后不超过该长度的短文本（如“在吗”）自动降为 fast 档
+    - ltp_lazy_deep: 为 True 时 dep/sdp/sdpg 不在主链路计算，结果标记 raw["ltp_deferred"]，
+      由 PerceptionSystem.schedule_deferred 在后台补算并回填数据库
+    """
+    # 分词 cws、词性 pos、命名实体标注 ner、语义角色标注 srl、依存句法分析 dep、语义依存分析树 sdp、语义依存分析图 sdpg
+    PROFILES: dict[str, list[str]] = {
+        "fast": ["cws", "pos", "ner"],
+        "standard": ["cws", "pos", "ner", "srl"],
+        "full": ["cws", "pos", "ner", "srl", "dep", "sdp", "sdpg"],
+    }
+    # 下游只有 _relations 读 sdpg，dep/sdp 仅存入 raw，可以延后计算
+    DEEP_TASKS = ("dep", "sdp", "sdpg")
+
     def __init__(self,**kwargs):
         if kwargs.get('ltp', None):
             self.ltp = kwargs['ltp']
@@ -30,6 +52,17 @@ class LtpAnalyze(Analyze):
         else:
             self.STOPWORDS = self.load_stopwords(kwargs.get("ltp_stopwords_path", r"src\PerceptionSystem\ltp\base\stopwords_full.txt"))
 
+        self.profile = kwargs.get("ltp_profile", "full")
+        if self.profile not in self.PROFILES:
+            logger.warning(f"Unknown LTP profile '{self.profile}', falling back to 'full'")
+            self.profile = "full"
+        self.fast_max_chars = int(kwargs.get("ltp_fast_max_chars", 4))
+        self.lazy_deep = bool(kwargs.get("ltp_lazy_deep", False))
+
+        self.batcher: LtpBatcher | None = None
+        if kwargs.get("ltp_batching", True):
+            self.batcher = LtpBatcher(self.ltp, **kwargs)
+
 
 
     @lru_cache(maxsize=1)
@@ -50,28 +83,71 @@ class LtpAnalyze(Analyze):
     def analyze(self, input_data: str) -> AnalyzeResult:
         analysis_results = self.text_analysis(input_data)
         return analysis_results
+
+    def select_profile(self, text: str) -> str:
+        """短文本没有可分析的结构，直接走 fast 档"""
+        if len(self._normalized(text)) <= self.fast_max_chars:
+            return "fast"
+        return self.profile
     
     @timeit_logger(name="LtpAnalyze.text_analysis", level="DEBUG")
-    def text_analysis(self, text: str) -> AnalyzeResult:
-        #  分词 cws、词性 pos、命名实体标注 ner、语义角色标注 srl、依存句法分析 dep、语义依存分析树 sdp、语义依存分析图 sdpg
-        output = self.ltp.pipeline(
-            [text], 
-            tasks=["cws", "pos", "ner", "srl", "dep", "sdp", "sdpg"])
+    def text_analysis(self, text: str, profile: str | None = None) -> AnalyzeResult:
+        profile = profile or self.select_profile(text)
+        tasks = list(self.PROFILES.get(profile, self.PROFILES["full"]))
+        deferred: list[str] = []
+        if self.lazy_deep:
+            deferred = [t for t in tasks if t in self.DEEP_TASKS]
+            tasks = [t for t in tasks if t not in self.DEEP_TASKS]
+
+        output = self._pipeline(text, tasks)
 
         if output == {} or output is None:
             return AnalyzeResult()
         # 使用字典格式作为返回结果
         res = AnalyzeResult()
         res.raw["ltp"] = dict(output)
+        res.raw["ltp_profile"] = profile
+        if deferred:
+            res.raw["ltp_deferred"] = deferred
         res.keywords = self._keywords(output)
         res.tokens = self._tokens(output)
         res.frames = self._frames(output, res.tokens)
         res.entities = self._entities(output)
-        res.relations = self._relations(output, res.tokens)
+        if "sdpg" in tasks:
+            res.relations = self._relations(output, res.tokens)
         res.normalized_text = self._normalized(text)
         
 
         return res
+
+    @timeit_logger(name="LtpAnalyze.backfill_deferred", level="DEBUG")
+    def backfill_deferred(self, text: str, ar: AnalyzeResult) -> AnalyzeResult | None:
+        """
+        补算 text_analysis 延后的深层任务，返回补全后的新 AnalyzeResult（不修改传入对象）
+        没有延后任务时返回 None
+        """
+        deferred = list(ar.raw.get("ltp_deferred") or [])
+        if not deferred:
+            return None
+
+        # 关系三元组按 token 下标取词，需要同一次切分的 cws/pos
+        output = self._pipeline(text, ["cws", "pos", *deferred])
+        if output == {} or output is None:
+            return None
+
+        raw = dict(ar.raw)
+        raw["ltp"] = {**dict(raw.get("ltp") or {}), **{t: output[t] for t in deferred if t in output}}
+        raw.pop("ltp_deferred", None)
+
+        filled = dataclasses.replace(ar, raw=raw)
+        if "sdpg" in deferred:
+            filled.relations = self._relations(output, self._tokens(output))
+        return filled
+    def _pipeline(self, text: str, tasks: list[str]):
+        if self.batcher is not None:
+            return self.batcher.pipeline(text, tasks)
+        return self.ltp.pipeline([text], tasks=tasks)
+
     def _normalized(self, text: str) -> str:
         """文本规范化处理"""
         # 去除多余空白
@@ -156,7 +232,7 @@ class LtpAnalyze(Analyze):
         srl_events = []
         try:
             srl_list = ltp_output.srl[0]
-        except (KeyError, IndexError):
+        except (KeyError, IndexError, AttributeError, TypeError):
             logger.debug("No SRL data found in LTP output")
             return srl_events
 
@@ -203,7 +279,7 @@ class LtpAnalyze(Analyze):
         entities = []
         try:
             ner_list = ltp_output.ner[0]
-        except (KeyError, IndexError):
+        except (KeyError, IndexError, AttributeError, TypeError):
             logger.debug("No NER data found in LTP output")
             return entities
 
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Sequence
+
+from loguru import logger
+
+
+class LtpItemOutput(dict):
+    """
+    单句的 LTP 输出：与 ltp.pipeline([text]) 的返回结构一致（每个字段是长度为 1 的列表），
+    同时支持 output.cws / output["cws"] 两种访问方式
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name]
+        except KeyError as e:
+            raise AttributeError(name) from e
+
+
+@dataclass
+class _LtpRequest:
+    text: str
+    tasks: tuple[str, ...]
+    future: Future = field(default_factory=Future)
+
+
+class LtpBatcher:
+    """
+    LTP 微批处理服务：
+    - 所有句子由一个工作线程串行送入模型，避免多个线程同时跑 torch 前向
+    - 在 max_wait_ms 窗口内收集并发请求，凑成一批调用一次 pipeline(batch)
+    - 同一批内按 tasks 分组（不同 tasks 不能合并），结果按原顺序拆回各请求
+
+    **kwargs 参数说明**:
+    - ltp_max_batch_size: 单批最大句子数
+    - ltp_max_wait_ms: 收到第一条请求后最多等待多久再开跑（毫秒）
+    """
+
+    def __init__(self, ltp: Any, **kwargs):
+        self.ltp = ltp
+        self.max_batch_size = max(1, int(kwargs.get("ltp_max_batch_size", 16)))
+        self.max_wait = max(0.0, float(kwargs.get("ltp_max_wait_ms", 10))) / 1000.0
+
+        self._queue: queue.Queue[_LtpRequest | None] = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="LtpBatcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str, tasks: Sequence[str]) -> Future:
+        if self._closed:
+            raise RuntimeError("LtpBatcher is closed")
+        req = _LtpRequest(text=text, tasks=tuple(tasks))
+        self._queue.put(req)
+        return req.future
+
+    def pipeline(self, text: str, tasks: Sequence[str], timeout: float | None = None) -> LtpItemOutput:
+        """
+        阻塞调用：等价于 ltp.pipeline([text], tasks=tasks)，但会与其他并发请求合批
+        """
+        return self.submit(text, tasks).result(timeout=timeout)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join(timeout=5)
+
+    # ---------------- worker ----------------
+
+    def _collect(self, first: _LtpRequest) -> tuple[list[_LtpRequest], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                req = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if req is None:
+                return batch, True
+            batch.append(req)
+        return batch, False
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stop = self._collect(first)
+
+            groups: dict[tuple[str, ...], list[_LtpRequest]] = {}
+            for req in batch:
+                groups.setdefault(req.tasks, []).append(req)
+            for tasks, reqs in groups.items():
+                self._run_group(tasks, reqs)
+
+        # 关闭后仍在队列里的请求直接失败，避免调用方永久阻塞
+        while True:
+            try:
+                req = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if req is not None:
+                req.future.set_exception(RuntimeError("LtpBatcher is closed"))
+
+    def _run_group(self, tasks: tuple[str, ...], reqs: list[_LtpRequest]) -> None:
+        start = time.perf_counter()
+        try:
+            output = self.ltp.pipeline([r.text for r in reqs], tasks=list(tasks))
+            items = self.split_output(output, len(reqs))
+        except Exception as e:
+            logger.exception(f"LtpBatcher pipeline failed for batch of {len(reqs)}: {e}")
+            for r in reqs:
+                r.future.set_exception(e)
+            return
+
+        logger.debug(
+            f"LtpBatcher ran batch size={len(reqs)} tasks={len(tasks)} "
+            f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+        for r, item in zip(reqs, items):
+            r.future.set_result(item)
+
+    @staticmethod
+    def split_output(output: Any, size: int) -> list[LtpItemOutput]:
+        """
+        把批量输出（每个字段是长度为 size 的列表）拆成 size 个单句输出
+        """
+        if not output:
+            return [LtpItemOutput() for _ in range(size)]
+        fields = dict(output)
+        return [
+            LtpItemOutput({k: [v[i]] for k, v in fields.items()})
+            for i in range(size)
+        ]
@@ -1,10 +1,12 @@
 import time
-from typing import Any
+from typing import Any, Callable
 from DataClass.AnalyzeResult import AnalyzeResult
 from LLM.LLMManagement import LLMManagement
 from DataClass.ChatMessage import ChatMessage
+from PerceptionSystem.Analyzeabstract import Analyze
 from PerceptionSystem.LtpAnalyze import LtpAnalyze
 from PerceptionSystem.OllamaAnalyze import OllamaAnalyze
+from PerceptionSystem.FusedAnalyze import FusedAnalyze
 import asyncio
 from loguru import logger
 
@@ -12,29 +14,45 @@ from logging_config import timeit_logger
 
 
 class PerceptionSystem:
-    def __init__(self, llm_management: LLMManagement, **kwargs):
+    """
+    **kwargs 参数说明**（其余参数透传给 LtpAnalyze）:
+    - perception_mode: "separate"（默认，text_analysis 与 intent_classifier 各调用一次）
+      或 "fused"（一次 fused_perception 同时产出分析信号与意图，需要 router_input_builder）
+
+    router_input_builder: text -> router_input JSON，fused 模式下由 IntentJudgeL.build_router_input 提供
+    """
+    def __init__(
+        self,
+        llm_management: LLMManagement,
+        router_input_builder: Callable[[str], str] | None = None,
+        **kwargs,
+    ):
         self.llm_management = llm_management
 
+        self.perception_mode = kwargs.get("perception_mode", "separate")
+        if self.perception_mode not in ("separate", "fused"):
+            raise ValueError(f"Unsupported perception_mode: {self.perception_mode}")
+        if self.perception_mode == "fused" and router_input_builder is None:
+            logger.warning("perception_mode=fused requires router_input_builder, falling back to separate")
+            self.perception_mode = "separate"
+
+        llm_analyzer: Analyze = (
+            FusedAnalyze(self.llm_management, router_input_builder)  # type: ignore[arg-type]
+            if self.perception_mode == "fused"
+            else OllamaAnalyze(self.llm_management)
+        )
         self.analyzers = {
             "text": [
-                OllamaAnalyze(self.llm_management), 
+                llm_analyzer,
                 LtpAnalyze(**kwargs)
                 ]
         }
-    @timeit_logger(name="PerceptionSystem.analyze", level="DEBUG")
-    async def analyze(
-        self,
-        input_data: dict[str, Any],
-        timeout: float = 5.0
-    ) -> ChatMessage:
+        # 后台补算任务的引用，防止未完成的 task 被回收
+        self._deferred_tasks: set[asyncio.Future] = set()
+    def build_message(self, input_data: dict[str, Any]) -> ChatMessage:
         """
-        并发分析多种媒体类型，整体受 timeout 限制。
-        input_data 示例: {"text": "hello", "image": "base64_or_path", "audio": "..."}
+        只根据原始输入构建 ChatMessage（不做任何分析），低信号快速链路直接使用
         """
-        logger.debug(f"PerceptionSystem.analyze input_data: {input_data}")
-        tasks = []
-        loop = asyncio.get_running_loop()
-
         sender_name = input_data.get("sender_name", None) or "aki"
         sender_id_raw = input_data.get("sender_id", None)
         try:
@@ -55,6 +73,23 @@ class PerceptionSystem:
         message.voice = input_data.get("audio", None)
         message.image = input_data.get("image", None)
         message.content = input_data.get("text", "")
+        return message
+
+    @timeit_logger(name="PerceptionSystem.analyze", level="DEBUG")
+    async def analyze(
+        self,
+        input_data: dict[str, Any],
+        timeout: float = 5.0
+    ) -> ChatMessage:
+        """
+        并发分析多种媒体类型，整体受 timeout 限制。
+        input_data 示例: {"text": "hello", "image": "base64_or_path", "audio": "..."}
+        """
+        logger.debug(f"PerceptionSystem.analyze input_data: {input_data}")
+        tasks = []
+        loop = asyncio.get_running_loop()
+
+        message = self.build_message(input_data)
 
         # 为每个媒体类型启动对应的分析器 多线程同时执行 控制启动数量 important
         for media_type, content in input_data.items():
@@ -94,4 +129,49 @@ class PerceptionSystem:
         logger.debug(f"PerceptionSystem.analyze merged_result: {merged_result}")
         message.analyze_result = merged_result
         
-        return message
\ No newline at end of file
+        return message
+
+    def schedule_deferred(
+        self,
+        message: ChatMessage,
+        persist: Callable[[int, AnalyzeResult], Any],
+    ) -> bool:
+        """
+        消息入库后调用：若感知阶段有延后的深层分析（raw["ltp_deferred"]），在线程池中补算，
+        完成后替换 message.analyze_result 并通过 persist(turn_id, analyze_result) 回填数据库
+        返回是否安排了补算任务
+        """
+        ar = message.analyze_result
+        if ar is None or not ar.raw.get("ltp_deferred") or message.chat_turn_id is None:
+            return False
+
+        backfillers = [
+            a for a in self.analyzers.get("text", []) if hasattr(a, "backfill_deferred")
+        ]
+        if not backfillers:
+            return False
+
+        turn_id = message.chat_turn_id
+
+        def _job() -> None:
+            filled = ar
+            for analyzer in backfillers:
+                filled = analyzer.backfill_deferred(message.content, filled) or filled
+            if filled is ar:
+                return
+            filled.turn_id = turn_id
+            message.analyze_result = filled
+            persist(turn_id, filled)
+            logger.debug(f"PerceptionSystem backfilled deferred analysis for turn {turn_id}")
+
+        loop = asyncio.get_running_loop()
+        task = loop.run_in_executor(None, _job)
+        self._deferred_tasks.add(task)
+
+        def _done(fut: asyncio.Future) -> None:
+            self._deferred_tasks.discard(fut)
+            if not fut.cancelled() and fut.exception() is not None:
+                logger.error(f"Deferred analysis backfill failed for turn {turn_id}: {fut.exception()}")
+
+        task.add_done_callback(_done)
+        return True
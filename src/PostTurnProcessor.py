@@ -57,6 +57,10 @@ class PostTurnProcessor:
             if self.chat_state_system:
                 self.chat_state_system.checkAndUpdateState(event.turn_id)
 
+            # 向量记忆增量同步（embed 是 CPU 密集型，放到线程里，不阻塞事件循环）
+            if getattr(self.memory_system.storage, "vector_store", None) is not None:
+                asyncio.create_task(asyncio.to_thread(self.memory_system.storage.sync_vector_memory))
+
             # TODO:这个是AI自己瞎写的吗？
             # if self.memory_long:
             #     handler = getattr(self.memory_long, "process_event", None)
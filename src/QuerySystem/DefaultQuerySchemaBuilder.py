@@ -1,36 +1,58 @@
 from __future__ import annotations
 
-from typing import Any, List, Optional
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
 
 from DataClass.ChatMessage import ChatMessage
 from DataClass.QuerySchema import QuerySchema
 from QuerySystem.QuerySchemaBuilderAbstract import QuerySchemaBuilderAbstract
 from QuerySystem.QueryPropertyBuilderAbstract import QueryPropertyBuilderAbstract
+from logging_config import timeit_logger
 
 # 直接 import 你要用的 builders
 from QuerySystem.SignalDensityJudge import SignalDensityJudge
 from QuerySystem.IntentJudge import IntentJudgeL
+from QuerySystem.QueryTextBuilder import QueryTextBuilder
 
 
 class DefaultQuerySchemaBuilder(QuerySchemaBuilderAbstract):
+    """
+    **kwargs 参数说明**（其余参数透传给各 builder）:
+    - builder_timeout: 异步构建时单个 builder 的默认超时（秒），builder.getTimeout() 可覆盖
+    """
     def __init__(
         self,
         **kwargs
     ):
+        self.builder_timeout = float(kwargs.get("builder_timeout", 8.0))
 
         # 1) 直接 new：你想用哪些就写哪些
         builders: List[QueryPropertyBuilderAbstract] = [
             SignalDensityJudge(**kwargs),
             IntentJudgeL(**kwargs),
+            QueryTextBuilder(**kwargs),
             # 以后你加别的：直接在这儿 append
             # ModeJudge(...),
-            # QueryTextBuilder(...),
         ]
 
         # 2) 按 priority 排序（越小越先）
         builders.sort(key=lambda b: b.getPriority())
         self.property_builders = builders
 
+    def getBuilder(self, name: str) -> Optional[QueryPropertyBuilderAbstract]:
+        """按类名取 builder，未注册时返回 None"""
+        return next((b for b in self.property_builders if type(b).__name__ == name), None)
+
+    def reload(self) -> None:
+        """配置热更新：逐个通知 builder 重新加载，单个失败不影响其他"""
+        for b in self.property_builders:
+            try:
+                b.reload()
+            except Exception as e:
+                logger.exception(f"QuerySchema builder {type(b).__name__} reload failed: {e}")
+
     def build_query_schema(self, msg: ChatMessage) -> QuerySchema:
         schema = QuerySchema()
 
@@ -40,21 +62,78 @@ class DefaultQuerySchemaBuilder(QuerySchemaBuilderAbstract):
             try:
                 props = b.buildProperty(msg)
             except Exception as e:
-  
+
                 continue
 
-            for item in props:
-                # item: ("k", v) 或 ("k", v, reason)
-                if not isinstance(item, tuple) or len(item) not in (2, 3):
-                    continue
+            self._apply_props(schema, props)
+
+        return schema
+
+    @timeit_logger(name="DefaultQuerySchemaBuilder.abuild_query_schema", level="DEBUG")
+    async def abuild_query_schema(self, msg: ChatMessage) -> QuerySchema:
+        """
+        并发构建：
+        - 没有依赖关系的 builder 同一批并发执行（CPU 型在本协程内跑，IO 型走各自的 abuildProperty）
+        - 声明了 getDependencies() 的 builder 等依赖完成后再执行，可读取 msg.query_schema 中已完成的部分
+        - 每个 builder 受超时限制，超时/异常时使用 getFallback()
+        - 同一批结果按 priority 顺序写入 schema，保证覆盖顺序稳定
+        """
+        schema = QuerySchema()
+        known = {type(b).__name__ for b in self.property_builders}
+        finished: set[str] = set()
+        pending = list(self.property_builders)
+
+        while pending:
+            ready = [
+                b for b in pending
+                if all(dep in finished or dep not in known for dep in b.getDependencies())
+            ]
+            if not ready:
+                # 循环依赖：不再等待，剩余的一起跑
+                logger.warning(
+                    f"QuerySchema builders have circular dependencies: {[type(b).__name__ for b in pending]}"
+                )
+                ready = pending
 
-                key, val = item[0], item[1]
-                reason = item[2] if len(item) == 3 else None
+            outs = await asyncio.gather(*(self._arun_builder(b, msg) for b in ready))
+            for b, props in zip(ready, outs):
+                self._apply_props(schema, props)
+                finished.add(type(b).__name__)
 
-                if hasattr(schema, key):
-                    setattr(schema, key, val)
-                else:
-                    # 不存在的属性，跳过
-                    continue
+            pending = [b for b in pending if b not in ready]
+            # 依赖方可以看到已完成部分
+            msg.query_schema = schema
 
         return schema
+
+    async def _arun_builder(self, b: QueryPropertyBuilderAbstract, msg: ChatMessage) -> List[tuple]:
+        timeout = b.getTimeout()
+        if timeout is None:
+            timeout = self.builder_timeout
+        name = type(b).__name__
+        try:
+            return list(await asyncio.wait_for(b.abuildProperty(msg), timeout=timeout))
+        except asyncio.TimeoutError:
+            logger.warning(f"QuerySchema builder {name} timed out after {timeout}s, using fallback")
+        except Exception as e:
+            logger.exception(f"QuerySchema builder {name} failed: {e}")
+        try:
+            return list(b.getFallback(msg))
+        except Exception:
+            return []
+
+    @staticmethod
+    def _apply_props(schema: QuerySchema, props: Any) -> None:
+        for item in props or []:
+            # item: ("k", v) 或 ("k", v, reason)
+            if not isinstance(item, tuple) or len(item) not in (2, 3):
+                continue
+
+            key, val = item[0], item[1]
+            reason = item[2] if len(item) == 3 else None
+
+            if hasattr(schema, key):
+                setattr(schema, key, val)
+            else:
+                # 不存在的属性，跳过
+                continue
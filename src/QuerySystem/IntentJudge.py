@@ -1,14 +1,19 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
 import json
 import os
+import time
 
 import yaml
 
+from loguru import logger
+
 from DataClass.ChatMessage import ChatMessage
 from QuerySystem.QueryPropertyBuilderAbstract import QueryPropertyBuilderAbstract  # :contentReference[oaicite:1]{index=1}
 from LLM.LLMManagement import LLMManagement
+from QuerySystem.SignalDensity.PrototypeCosineRouter import PrototypeCosineRouter
 
 
 _ALLOWED_SOURCES = ["short_term", "mid_term", "long_term", "user_profile", "world_bg", "env", "kb"]
@@ -22,6 +27,17 @@ def _clamp_int(x: Any, lo: int, hi: int, default: int) -> int:
     return max(lo, min(hi, v))
 
 
+@dataclass(frozen=True)
+class IntentConfigSnapshot:
+    """
+    从 template_input.yaml 派生出的只读配置快照；热更新时整体替换，读者拿到的永远是完整的一份
+    """
+    intent_map: Dict[str, Dict[str, Any]]
+    allowed_intents: List[str]
+    candidates_json: str
+    label_to_intent: Dict[str, str]
+
+
 class IntentJudgeL(QueryPropertyBuilderAbstract):
     """
     YAML 驱动意图分类：
@@ -30,11 +46,30 @@ class IntentJudgeL(QueryPropertyBuilderAbstract):
     - LLM 只负责从 candidates 中选一个 intent name
     - 系统侧用 YAML 映射 retrieve/sources/limits
 
+    级联：
+    - 先用 PrototypeCosineRouter（char_bigram）本地打分，label 经 prototype_intent_map 映射为 intent
+    - 最高分 >= router_min_score 且与次高分差距 >= router_margin 时直接采用，不调用 LLM
+    - 其余（模糊）输入才走 intent_classifier
+    - 融合感知模式下 analyze_result.raw["fused_intent"] 已有 LLM 意图结果，直接采用，不再单独调用
+    - getMetrics() 返回本地命中率与估算节省的 LLM 耗时
+
     依赖：
       - SystemPrompt 注册 prompt "intent_classifier"（严格 JSON）
       - LLMManagement 映射 "intent_classifier" -> 小模型
+
+    **kwargs 参数说明**（节选）:
+    - intent_router: 是否启用本地路由（默认开启）
+    - router_min_score / router_margin: 本地判定的最低分与最小领先差距
+
+    配置热更新：reload() 重新读取 YAML，构建新的 IntentConfigSnapshot 后一次赋值替换；
+    每次分类开始时取一次快照引用，整个分类过程都基于同一份配置
     """
 
+    FUSED_RAW_KEY = "fused_intent"
+
+    # 分类要求确定性输出：temperature=0 时 LLMManagement 会缓存同一输入的结果
+    LLM_OPTIONS = {"temperature": 0, "top_p": 1}
+
     def __init__(
         self,        
         **kwargs
@@ -47,35 +82,187 @@ class IntentJudgeL(QueryPropertyBuilderAbstract):
         self.max_keywords_per_intent = kwargs.get("max_keywords_per_intent", 24)
         self.max_examples_per_intent = kwargs.get("max_examples_per_intent", 6)
         self.min_confidence = float(kwargs.get("min_confidence", 0.35))
+        # 异步构建时 intent_classifier 的超时（秒），None 使用 QuerySchemaBuilder 默认值
+        self.timeout = kwargs.get("intent_timeout", None)
 
         self.top_k_lo, self.top_k_hi = kwargs.get("top_k_range", (1, 50))
         self.tb_lo, self.tb_hi = kwargs.get("token_budget_range", (64, 8192))
 
-        self._cfg = self._load_yaml(self.template_path)
-        self._intents_cfg: List[Dict[str, Any]] = list(self._cfg.get("intents", []) or [])
-        self._enabled_intents_cfg = [it for it in self._intents_cfg if it.get("enabled", True)]
+        self._snapshot = self._build_snapshot(self._load_yaml(self.template_path))
+
+        # 本地 cosine 路由（级联第一层）
+        self.router_min_score = float(kwargs.get("router_min_score", 0.45))
+        self.router_margin = float(kwargs.get("router_margin", 0.2))
+        self.router: Optional[PrototypeCosineRouter] = None
+        if kwargs.get("intent_router", True):
+            self.router = PrototypeCosineRouter(config_path=self.template_path, analyzer="char_bigram")
+
+        # metrics
+        self._n_total = 0
+        self._n_router_hits = 0
+        self._n_fused_hits = 0
+        self._n_llm_calls = 0
+        self._llm_ms_total = 0.0
+
+    @property
+    def allowed_intents(self) -> List[str]:
+        return self._snapshot.allowed_intents
+
+    def reload(self) -> bool:
+        """
+        重新读取 template_input.yaml；新配置校验失败时保留旧快照
+        """
+        try:
+            snapshot = self._build_snapshot(self._load_yaml(self.template_path))
+            if self.router is not None:
+                self.router.reload()
+        except Exception as e:
+            logger.error(f"IntentJudgeL reload failed, keeping previous config: {e}")
+            return False
+        self._snapshot = snapshot
+        logger.info(f"IntentJudgeL reloaded {len(snapshot.allowed_intents)} intents from {self.template_path}")
+        return True
+
+    def _build_snapshot(self, cfg: Dict[str, Any]) -> IntentConfigSnapshot:
+        intents_cfg: List[Dict[str, Any]] = list(cfg.get("intents", []) or [])
+        enabled_intents_cfg = [it for it in intents_cfg if it.get("enabled", True)]
 
         # name -> cfg
-        self._intent_map: Dict[str, Dict[str, Any]] = {}
-        for it in self._enabled_intents_cfg:
+        intent_map: Dict[str, Dict[str, Any]] = {}
+        for it in enabled_intents_cfg:
             name = str(it.get("name", "")).strip()
             if not name:
                 continue
-            self._intent_map[name] = it
+            intent_map[name] = it
 
-        self.allowed_intents = list(self._intent_map.keys())
+        allowed_intents = list(intent_map.keys())
 
         # 强约束：unknown 必须在 YAML（否则你后续兜底会很尴尬）
-        if "unknown" not in self.allowed_intents:
+        if "unknown" not in allowed_intents:
             raise ValueError("template_input.yaml must include an intent named 'unknown'")
 
         # 强约束：每个 intent 必有 limits
-        for name, it in self._intent_map.items():
+        for name, it in intent_map.items():
             if not isinstance(it.get("limits"), dict):
                 raise ValueError(f"intent '{name}' must have limits: {{top_k, token_budget}}")
+
+        return IntentConfigSnapshot(
+            intent_map=intent_map,
+            allowed_intents=allowed_intents,
+            # candidates 只依赖 YAML，预先序列化，每次只拼 text
+            candidates_json=self._build_candidates_json(enabled_intents_cfg, allowed_intents),
+            label_to_intent={
+                str(k): str(v)
+                for k, v in (cfg.get("prototype_intent_map", {}) or {}).items()
+                if str(v) in intent_map
+            },
+        )
+
     def getPriority(self) -> int:
         return 2
+
+    def getTimeout(self) -> float | None:
+        return self.timeout
+
+    def getFallback(self, msg: ChatMessage) -> List[tuple[str, Any, Any]] | List[tuple[str, Any]]:
+        # 超时/异常：等同于低置信，走 YAML 中 unknown 的配置
+        return self._bundle_to_props(self._map_from_yaml(self._snapshot, "unknown"))
+
     def buildProperty(self, msg: ChatMessage) -> List[tuple[str, Any, Any]] | List[tuple[str, Any]]:
+        snap = self._snapshot
+        self._n_total += 1
+        local = self._route_locally(snap, msg)
+        if local is not None:
+            return self._bundle_to_props(self._map_from_yaml(snap, local))
+        fused = self._fused_output(msg)
+        if fused is not None:
+            return self._props_from_output(snap, fused)
+        if self.llm is None:
+            return self._no_llm_props()
+        router_input = self._build_router_input(snap, msg)
+        start = time.perf_counter()
+        out = self.llm.generate("intent_classifier", options=self.LLM_OPTIONS, router_input=router_input)
+        self._record_llm_call(start)
+        return self._props_from_output(snap, out)
+
+    async def abuildProperty(self, msg: ChatMessage) -> List[tuple[str, Any, Any]] | List[tuple[str, Any]]:
+        """
+        异步版本：intent_classifier 走 LLMManagement.agenerate，不占用线程也不阻塞事件循环
+        """
+        snap = self._snapshot
+        self._n_total += 1
+        local = self._route_locally(snap, msg)
+        if local is not None:
+            return self._bundle_to_props(self._map_from_yaml(snap, local))
+        fused = self._fused_output(msg)
+        if fused is not None:
+            return self._props_from_output(snap, fused)
+        if self.llm is None:
+            return self._no_llm_props()
+        router_input = self._build_router_input(snap, msg)
+        start = time.perf_counter()
+        out = await self.llm.agenerate("intent_classifier", options=self.LLM_OPTIONS, router_input=router_input)
+        self._record_llm_call(start)
+        return self._props_from_output(snap, out)
+
+    def getMetrics(self) -> Dict[str, Any]:
+        """
+        级联分类统计：
+        - hit_rate: 本地路由直接判定的比例
+        - saved_ms_est: 命中次数 * LLM 平均耗时（尚无 LLM 样本时为 0）
+        """
+        avg_llm_ms = self._llm_ms_total / self._n_llm_calls if self._n_llm_calls else 0.0
+        return {
+            "total": self._n_total,
+            "router_hits": self._n_router_hits,
+            "fused_hits": self._n_fused_hits,
+            "llm_calls": self._n_llm_calls,
+            "hit_rate": self._n_router_hits / self._n_total if self._n_total else 0.0,
+            "avg_llm_ms": avg_llm_ms,
+            "saved_ms_est": self._n_router_hits * avg_llm_ms,
+        }
+
+    # -----------------------------
+    # Internal
+    # -----------------------------
+    def _route_locally(self, snap: IntentConfigSnapshot, msg: ChatMessage) -> Optional[str]:
+        if self.router is None:
+            return None
+        res = self.router.route(msg)
+        if res.best_label is None:
+            return None
+        scores = sorted(res.scores.values(), reverse=True)
+        second = scores[1] if len(scores) > 1 else 0.0
+        if res.best_score < self.router_min_score or res.best_score - second < self.router_margin:
+            return None
+        intent = snap.label_to_intent.get(res.best_label)
+        if intent is None:
+            return None
+        self._n_router_hits += 1
+        return intent
+
+    def _fused_output(self, msg: ChatMessage) -> Optional[Dict[str, Any]]:
+        ar = getattr(msg, "analyze_result", None)
+        fused = ar.raw.get(self.FUSED_RAW_KEY) if ar is not None else None
+        # 合并多个 analyzer 时同名 key 会聚合成 list，取第一个
+        if isinstance(fused, list):
+            fused = next((f for f in fused if isinstance(f, dict)), None)
+        if not isinstance(fused, dict):
+            return None
+        self._n_fused_hits += 1
+        return fused
+
+    def _record_llm_call(self, start: float) -> None:
+        self._n_llm_calls += 1
+        self._llm_ms_total += (time.perf_counter() - start) * 1000
+
+    def build_router_input(self, text: str) -> str:
+        """
+        intent_classifier / fused_perception 共用的 router_input（基于当前配置快照）
+        """
+        return self._router_input_for_text(self._snapshot, text)
+
+    def _build_router_input(self, snap: IntentConfigSnapshot, msg: ChatMessage) -> str:
         ar = getattr(msg, "analyze_result", None)
 
         text = ""
@@ -83,10 +270,17 @@ class IntentJudgeL(QueryPropertyBuilderAbstract):
             text = ar.normalized_text or ""
         else:
             text = getattr(msg, "content", "") or ""
+        return self._router_input_for_text(snap, text)
+
+    @staticmethod
+    def _router_input_for_text(snap: IntentConfigSnapshot, text: str) -> str:
+        # 与 json.dumps({"text", "allowed_intents", "intents"}) 的输出逐字节一致
+        return '{"text": ' + json.dumps(text, ensure_ascii=False) + ", " + snap.candidates_json[1:]
 
+    def _build_candidates_json(self, enabled_intents_cfg: List[Dict[str, Any]], allowed_intents: List[str]) -> str:
         # candidates：只给 LLM 必需字段
         candidates = []
-        for it in self._enabled_intents_cfg:
+        for it in enabled_intents_cfg:
             name = str(it.get("name", "")).strip()
             if not name:
                 continue
@@ -103,33 +297,22 @@ class IntentJudgeL(QueryPropertyBuilderAbstract):
                 }
             )
 
-        router_input_obj = {
-            "text": text,
-            "allowed_intents": self.allowed_intents,
-            "intents": candidates,
-        }
-        router_input = json.dumps(router_input_obj, ensure_ascii=False)
-        if self.llm is None:
-            return [
-                ("retrieve", False),
-                ("intent", "unknown"),
-                ("sources", []),
-                ("top_k", 5),
-                ("token_budget", 512),
-            ]
-        out = self.llm.generate("intent_classifier", router_input=router_input)
+        return json.dumps(
+            {"allowed_intents": allowed_intents, "intents": candidates},
+            ensure_ascii=False,
+        )
 
-        chosen_intent, confidence = self._parse_output(out)
+    def _props_from_output(self, snap: IntentConfigSnapshot, out: Any) -> List[tuple[str, Any]]:
+        chosen_intent, confidence = self._parse_output(snap, out)
 
         # 低置信兜底：直接 unknown（unknown 在 YAML 里，参数齐全）
         if chosen_intent != "unknown" and confidence < self.min_confidence:
             chosen_intent = "unknown"
 
-        bundle = self._map_from_yaml(chosen_intent)
-
-
-
+        return self._bundle_to_props(self._map_from_yaml(snap, chosen_intent))
 
+    @staticmethod
+    def _bundle_to_props(bundle: Dict[str, Any]) -> List[tuple[str, Any]]:
         return [
                 ("retrieve", bundle["retrieve"]),
                 ("intent", bundle["intent"]),
@@ -138,16 +321,23 @@ class IntentJudgeL(QueryPropertyBuilderAbstract):
                 ("token_budget", bundle["token_budget"]),
             ]
 
-    # -----------------------------
-    # Internal
-    # -----------------------------
+    @staticmethod
+    def _no_llm_props() -> List[tuple[str, Any]]:
+        return [
+                ("retrieve", False),
+                ("intent", "unknown"),
+                ("sources", []),
+                ("top_k", 5),
+                ("token_budget", 512),
+            ]
+
     def _load_yaml(self, path: str) -> Dict[str, Any]:
         if not os.path.exists(path):
             raise FileNotFoundError(f"template_input.yaml not found: {path}")
         with open(path, "r", encoding="utf-8") as f:
             return yaml.safe_load(f) or {}
 
-    def _parse_output(self, out: Any) -> tuple[str, float]:
+    def _parse_output(self, snap: IntentConfigSnapshot, out: Any) -> tuple[str, float]:
         """
         Expect:
           {"intent": str, "confidence": float}
@@ -170,13 +360,13 @@ class IntentJudgeL(QueryPropertyBuilderAbstract):
             confidence = 1.0
 
         # whitelist by YAML
-        if intent not in self.allowed_intents:
+        if intent not in snap.allowed_intents:
             intent = "unknown"
 
         return intent, confidence
 
-    def _map_from_yaml(self, intent: str) -> Dict[str, Any]:
-        it = self._intent_map[intent]  # intent 一定存在（unknown 兜底）
+    def _map_from_yaml(self, snap: IntentConfigSnapshot, intent: str) -> Dict[str, Any]:
+        it = snap.intent_map[intent]  # intent 一定存在（unknown 兜底）
         limits = it["limits"]          # 已校验必有
 
         retrieve = bool(it.get("retrieve", True))
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Any, Dict, Optional
+
+import yaml
+from loguru import logger
+
+from DataClass.QuerySchema import QuerySchema
+
+
+class LowSignalGate:
+    """
+    感知前的低信号闸门：在任何模型调用之前，仅凭原始文本判断是否是“在吗/？/ok”之类的低信号输入。
+    命中的消息跳过 OllamaAnalyze / LTP / intent_classifier，直接走轻量回复链路。
+
+    判定规则（任一命中即可）：
+    - 规范化后（小写、去空白与标点）与 low_signal_patterns 中某项完全一致
+    - 规范化后为空（纯标点 / 纯符号 / 纯表情）
+    - 规范化后是同一个字符重复 2 ~ low_signal_max_chars 次（如“嗯嗯”“哈哈哈”）；
+      单个字符（“不”“是”“1”）可能是对上一句提问的回答，只由 low_signal_patterns 显式列出的才算
+    - 信号密度近似为零：去掉 low_signal_patterns 中的词与 low_signal_fillers 语气字后，
+      剩余字符占比不超过 low_signal_min_density（如“嗯嗯好的呀”“ok在吗”）；只看 low_signal_max_density_chars 以内的短消息
+
+    **kwargs 参数说明**:
+    - template_path: 配置文件路径（读取 low_signal_patterns / low_signal_fillers 与 ping_presence 的 intent 配置）
+    - low_signal_max_chars: 单一重复字符判定的最大长度
+    - low_signal_min_density: 密度判定阈值（剩余字符占比），小于 0 关闭密度判定
+    - low_signal_max_density_chars: 参与密度判定的最大长度（规范化后字符数）
+    """
+
+    PING_INTENT = "ping_presence"
+
+    def __init__(self, **kwargs):
+        self.template_path = kwargs.get("template_path", "config/template_input.yaml")
+        self.max_repeat_chars = int(kwargs.get("low_signal_max_chars", 4))
+        self.min_density = float(kwargs.get("low_signal_min_density", 0.0))
+        self.max_density_chars = int(kwargs.get("low_signal_max_density_chars", 12))
+
+        # (patterns, ping_cfg, 密度判定用的词表) 作为一个整体快照，reload 时一次赋值替换
+        self._snapshot: tuple[frozenset[str], Dict[str, Any], tuple[tuple[str, ...], frozenset[str]]] = self._build_snapshot(
+            self._load_yaml(self.template_path)
+        )
+
+    @property
+    def patterns(self) -> frozenset[str]:
+        return self._snapshot[0]
+
+    def reload(self) -> None:
+        """重新读取配置；解析失败时保留旧配置"""
+        try:
+            self._snapshot = self._build_snapshot(self._load_yaml(self.template_path))
+        except Exception as e:
+            logger.error(f"LowSignalGate reload failed, keeping previous config: {e}")
+
+    def _build_snapshot(
+        self, cfg: dict
+    ) -> tuple[frozenset[str], Dict[str, Any], tuple[tuple[str, ...], frozenset[str]]]:
+        patterns: set[str] = set()
+        for p in cfg.get("low_signal_patterns", []) or []:
+            raw = str(p).strip().lower()
+            if raw:
+                patterns.add(raw)
+            norm = self.normalize(raw)
+            if norm:
+                patterns.add(norm)
+
+        ping_cfg: Dict[str, Any] = next(
+            (it for it in (cfg.get("intents", []) or []) if it.get("name") == self.PING_INTENT),
+            {},
+        )
+        # 密度判定：多字符的 pattern 按长度从长到短整体剔除，单字符 pattern 与语气字逐字剔除
+        norm_patterns = {self.normalize(p) for p in patterns} - {""}
+        words = tuple(sorted((p for p in norm_patterns if len(p) > 1), key=len, reverse=True))
+        fillers = frozenset(self.normalize(str(cfg.get("low_signal_fillers", "") or ""))) | frozenset(
+            p for p in norm_patterns if len(p) == 1
+        )
+        return frozenset(patterns), ping_cfg, (words, fillers)
+
+    @staticmethod
+    def _load_yaml(path: str) -> dict:
+        with open(path, "r", encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """小写 + 去掉空白、标点和符号（中英文标点、emoji 都属于 P*/S* 类别）"""
+        text = unicodedata.normalize("NFKC", text or "").lower()
+        return "".join(
+            ch for ch in text
+            if not ch.isspace() and unicodedata.category(ch)[0] not in ("P", "S")
+        )
+
+    def judge(self, text: str) -> Optional[str]:
+        """
+        命中返回原因字符串，未命中返回 None
+        """
+        raw = re.sub(r"\s+", "", (text or "").lower())
+        if raw in self.patterns:
+            return f"pattern:{raw}"
+
+        norm = self.normalize(text)
+        if not norm:
+            return "no_content"
+        if norm in self.patterns:
+            return f"pattern:{norm}"
+        if len(norm) >= 2 and len(set(norm)) == 1 and len(norm) <= self.max_repeat_chars:
+            return f"repeat:{norm}"
+        density = self.density(norm)
+        if density is not None and density <= self.min_density:
+            return f"density:{density:.2f}"
+        return None
+
+    def density(self, norm: str) -> Optional[float]:
+        """
+        规范化文本中去掉低信号词与语气字后剩余字符的占比；不参与密度判定时返回 None
+        单个字符不做密度判定，理由同重复规则
+        """
+        if self.min_density < 0 or not 2 <= len(norm) <= self.max_density_chars:
+            return None
+        words, fillers = self._snapshot[2]
+        rest = norm
+        for w in words:
+            rest = rest.replace(w, "")
+        rest = "".join(ch for ch in rest if ch not in fillers)
+        return len(rest) / len(norm)
+
+    def build_query_schema(self) -> QuerySchema:
+        """低信号消息的 QuerySchema：不检索，参数取 ping_presence 的配置"""
+        ping_cfg = self._snapshot[1]
+        limits = ping_cfg.get("limits", {}) or {}
+        return QuerySchema(
+            retrieve=bool(ping_cfg.get("retrieve", False)),
+            signal_density=0.0,  # type: ignore[arg-type]
+            intent=self.PING_INTENT,
+            sources=list(ping_cfg.get("sources", []) or []),
+            top_k=int(limits.get("top_k", 0)),
+            token_budget=int(limits.get("token_budget", 0)),
+            debug_tags=["route:low_signal"],
+        )
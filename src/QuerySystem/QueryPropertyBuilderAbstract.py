@@ -3,6 +3,7 @@ QuerySystem.QuerySchemaBuilderAbs 的 Docstring
 
 生成 QuerySchema 的抽象基类
 """
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Any, List
 from DataClass.AnalyzeResult import AnalyzeResult
@@ -25,4 +26,37 @@ class QueryPropertyBuilderAbstract(ABC):
         """
         可选：返回 builder 的优先级，数值越小优先级越高，默认 100
         """
-        return 100
\ No newline at end of file
+        return 100
+
+    async def abuildProperty(self, msg: ChatMessage) -> List[tuple[str, Any, Any]] | List[tuple[str, Any]]:
+        """
+        异步入口：默认把同步 buildProperty 放到线程池执行，避免阻塞事件循环
+        有原生异步 IO（如 LLM 调用）的 builder 应覆盖该方法
+        """
+        return await asyncio.to_thread(self.buildProperty, msg)
+
+    def getDependencies(self) -> List[str]:
+        """
+        可选：声明依赖的其他 builder（类名）。依赖的 builder 完成后才会执行本 builder，
+        执行时可通过 msg.query_schema 读取已完成部分。默认无依赖，可与其他 builder 并发
+        """
+        return []
+
+    def getTimeout(self) -> float | None:
+        """
+        可选：单个 builder 的超时（秒），None 表示使用 QuerySchemaBuilder 的默认值
+        """
+        return None
+
+    def getFallback(self, msg: ChatMessage) -> List[tuple[str, Any, Any]] | List[tuple[str, Any]]:
+        """
+        可选：超时或异常时使用的兜底属性，默认不写任何属性（保留 QuerySchema 默认值）
+        """
+        return []
+
+    def reload(self) -> None:
+        """
+        可选：配置文件变更后重新加载。实现方应先构建完整的新状态再一次赋值替换，
+        保证正在执行的 buildProperty 不会读到半更新的配置。默认无操作
+        """
+        return None
@@ -3,6 +3,7 @@ QuerySystem.QuerySchemaBuilderAbs 的 Docstring
 
 生成 QuerySchema 的抽象基类
 """
+import asyncio
 from abc import ABC, abstractmethod
 from DataClass.AnalyzeResult import AnalyzeResult
 from DataClass.ChatMessage import ChatMessage
@@ -24,4 +25,23 @@ class QuerySchemaBuilderAbstract(ABC):
         可选：向 builder 添加新的消息（如果需要增量更新）
         """
         msg.query_schema = self.build_query_schema(msg)
-        return msg
\ No newline at end of file
+        return msg
+
+    async def abuild_query_schema(self, msg: ChatMessage) -> QuerySchema:
+        """
+        异步入口：默认放到线程池执行同步 build_query_schema
+        """
+        return await asyncio.to_thread(self.build_query_schema, msg)
+
+    async def aaddMessage(self, msg: ChatMessage) -> ChatMessage:
+        """
+        addMessage 的异步版本
+        """
+        msg.query_schema = await self.abuild_query_schema(msg)
+        return msg
+
+    def reload(self) -> None:
+        """
+        可选：配置文件变更后重新加载（热更新），默认无操作
+        """
+        return None
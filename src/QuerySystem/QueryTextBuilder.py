@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from typing import Any, List
+
+from DataClass.ChatMessage import ChatMessage
+from QuerySystem.QueryPropertyBuilderAbstract import QueryPropertyBuilderAbstract
+
+
+class QueryTextBuilder(QueryPropertyBuilderAbstract):
+    """
+    填充检索用的 query_text 与 keywords：
+    - query_text：优先用感知结果的 normalized_text，没有时用原始消息
+    - keywords：AnalyzeResult.keywords + 实体文本，去重保序，最多 max_query_keywords 个
+
+    **kwargs 参数说明**:
+    - max_query_keywords: keywords 上限
+    """
+
+    def __init__(self, **kwargs):
+        self.max_query_keywords = int(kwargs.get("max_query_keywords", 12))
+
+    def getPriority(self) -> int:
+        return 2
+
+    async def abuildProperty(self, msg: ChatMessage) -> List[tuple[str, Any, Any]] | List[tuple[str, Any]]:
+        # 纯字符串处理，直接在当前协程里算
+        return self.buildProperty(msg)
+
+    def getFallback(self, msg: ChatMessage) -> List[tuple[str, Any, Any]] | List[tuple[str, Any]]:
+        return [("query_text", msg.content or "")]
+
+    def buildProperty(self, msg: ChatMessage) -> List[tuple[str, Any, Any]] | List[tuple[str, Any]]:
+        ar = msg.analyze_result
+        if ar is None:
+            return [("query_text", msg.content or ""), ("keywords", [])]
+
+        keywords: List[str] = []
+        for term in list(ar.keywords or []) + [e.text for e in (ar.entities or [])]:
+            term = (term or "").strip()
+            if term and term not in keywords:
+                keywords.append(term)
+            if len(keywords) >= self.max_query_keywords:
+                break
+
+        return [
+            ("query_text", ar.normalized_text or msg.content or ""),
+            ("keywords", keywords),
+        ]
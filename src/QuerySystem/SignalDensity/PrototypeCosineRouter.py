@@ -1,10 +1,12 @@
 # PrototypeCosineRouter.py
 from __future__ import annotations
 
+import dataclasses
 from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 import math
+import numpy as np
 import yaml  # PyYAML
 
 from DataClass.ChatMessage import ChatMessage
@@ -19,11 +21,35 @@ class CosineRouteResult:
     debug: Dict[str, Any]             # optional debug info
 
 
+@dataclass(frozen=True)
+class RouterModel:
+    """
+    reload() 的产物：配置 + TF-IDF 模型的只读快照，热更新时整体替换
+    - proto_matrix: (n_protos, n_terms)，行已归一化；同 label 的行连续存放
+    - seg_starts[i]: 第 i 段的起始行；seg_labels[i]: 该段对应的 labels 下标
+    """
+    low_signal_patterns: frozenset[str]
+    prototypes: Dict[str, List[str]]
+    vocab: Dict[str, int]
+    idf: Dict[str, float]
+    labels: List[str]
+    proto_matrix: np.ndarray
+    seg_starts: np.ndarray
+    seg_labels: np.ndarray
+
+
 class PrototypeCosineRouter:
     """
     使用 TF-IDF + cosine，将输入与各类 prototypes 做相似度比较。
     - 特征：优先用 AnalyzeResult.tokens（分词结果），否则退回简易切词（不推荐）
-    - 性能：原型向量预计算 + 查询向量即时计算
+    - 性能：原型预计算为归一化的 NumPy 矩阵，打分是一次矩阵乘法 + 按 label 分段取最大
+    - 热更新：reload() 在调用线程里构建新的 RouterModel，完成后一次赋值替换；
+      route_batch 开始时取一次 self._model，整个打分过程用同一份快照，无需加锁
+
+    analyzer:
+    - "word"：上述默认行为
+    - "char_bigram"：原型与查询都用 英文/数字词 + 中文字符二元组，不依赖 LTP 分词，
+      原型和查询的切分方式一致，短中文句子也能匹配上
     """
 
     def __init__(
@@ -34,6 +60,7 @@ class PrototypeCosineRouter:
         low_patterns_key: str = "low_signal_patterns",
         max_terms: int = 2000,
         token_pos_whitelist: Optional[set[str]] = None,
+        analyzer: str = "word",
     ):
         if yaml is None:
             raise RuntimeError("PyYAML not installed. Please install pyyaml to load config/template_input.yaml")
@@ -42,74 +69,91 @@ class PrototypeCosineRouter:
         self.prototypes_key = prototypes_key
         self.low_patterns_key = low_patterns_key
         self.max_terms = max_terms
+        if analyzer not in ("word", "char_bigram"):
+            raise ValueError(f"Unsupported analyzer: {analyzer}")
+        self.analyzer = analyzer
 
         # 可选：用 POS 过滤噪声（你 tokens=(word,pos)）
         # 不确定你的 POS 集合细节时先别开也行
         self.token_pos_whitelist = token_pos_whitelist
 
-        self.low_signal_patterns: set[str] = set()
-        self.prototypes: Dict[str, List[str]] = {}
-
-        # TF-IDF 模型缓存
-        self._idf: Dict[str, float] = {}
-        self._vocab: Dict[str, int] = {}
-        self._proto_vecs: Dict[str, List[Tuple[Dict[str, float], float]]] = {}
-        # label -> list of (sparse_vec, norm)
-
+        self._model: RouterModel
         self.reload()
 
     # ---------------- public ----------------
 
+    @property
+    def low_signal_patterns(self) -> frozenset[str]:
+        return self._model.low_signal_patterns
+
+    @property
+    def prototypes(self) -> Dict[str, List[str]]:
+        return self._model.prototypes
+
     def reload(self) -> None:
         cfg = self._load_yaml(self.config_path)
-        self.low_signal_patterns = set(map(str, cfg.get(self.low_patterns_key, []) or []))
-
         raw_protos = cfg.get(self.prototypes_key, {}) or {}
-        self.prototypes = {str(k): [str(x) for x in (v or [])] for k, v in raw_protos.items()}
+        prototypes = {str(k): [str(x) for x in (v or [])] for k, v in raw_protos.items()}
 
-        # build tf-idf from prototypes
-        self._build_tfidf_from_prototypes()
+        # build tf-idf from prototypes，然后原子替换
+        self._model = self._build_model(
+            prototypes,
+            frozenset(map(str, cfg.get(self.low_patterns_key, []) or [])),
+        )
 
     def route(self, msg: ChatMessage) -> CosineRouteResult:
-        tokens = self._extract_tokens(msg)
-        q_vec = self._tfidf_vector(tokens)
-        q_norm = self._norm(q_vec)
-
-        scores: Dict[str, float] = {}
-        best_label: Optional[str] = None
-        best_score = 0.0
-
-        if q_norm == 0.0:
-            return CosineRouteResult(
-                best_label=None,
-                best_score=0.0,
-                scores={label: 0.0 for label in self.prototypes.keys()},
-                debug={"reason": "empty_query_vector"},
-            )
-
-        for label, vec_list in self._proto_vecs.items():
-            # label score = max cosine over its prototypes
-            max_s = 0.0
-            for p_vec, p_norm in vec_list:
-                if p_norm == 0.0:
-                    continue
-                s = self._cosine_sparse(q_vec, q_norm, p_vec, p_norm)
-                if s > max_s:
-                    max_s = s
-            scores[label] = max_s
-            if max_s > best_score:
-                best_score = max_s
-                best_label = label
-
-        return CosineRouteResult(
-            best_label=best_label,
-            best_score=best_score,
-            scores=scores,
-            debug={
-                "query_terms": tokens[:30],
-                "query_term_count": len(tokens),
-            },
-        )
+        return self.route_batch([msg])[0]
+
+    def route_batch(self, msgs: Sequence[ChatMessage]) -> List[CosineRouteResult]:
+        """
+        批量路由：所有消息的查询向量组成矩阵，一次矩阵乘法得到与全部原型的 cosine，
+        再按 label 分段取最大值（np.maximum.reduceat）
+        """
+        if not msgs:
+            return []
+        model = self._model
+
+        token_lists = [self._extract_tokens(m) for m in msgs]
+        q = np.zeros((len(msgs), len(model.vocab)), dtype=np.float32)
+        for row, tokens in enumerate(token_lists):
+            for term, w in self._tfidf_vector(tokens, model).items():
+                q[row, model.vocab[term]] = w
+        q_norms = np.linalg.norm(q, axis=1)
+        nonzero = q_norms > 0.0
+        q[nonzero] /= q_norms[nonzero, None]
+
+        # (m, n_protos) -> (m, n_labels_with_protos)
+        label_scores = np.zeros((len(msgs), len(model.labels)), dtype=np.float32)
+        if model.proto_matrix.shape[0] and model.seg_labels.size:
+            sims = q @ model.proto_matrix.T
+            label_scores[:, model.seg_labels] = np.maximum.reduceat(sims, model.seg_starts, axis=1)
+        np.clip(label_scores, 0.0, None, out=label_scores)
+
+        results: List[CosineRouteResult] = []
+        for row, tokens in enumerate(token_lists):
+            if not nonzero[row]:
+                results.append(CosineRouteResult(
+                    best_label=None,
+                    best_score=0.0,
+                    scores={label: 0.0 for label in model.labels},
+                    debug={"reason": "empty_query_vector"},
+                ))
+                continue
+
+            scores = {label: float(label_scores[row, i]) for i, label in enumerate(model.labels)}
+            best_idx = int(np.argmax(label_scores[row])) if model.labels else -1
+            best_score = float(label_scores[row, best_idx]) if best_idx >= 0 else 0.0
+            results.append(CosineRouteResult(
+                # 全部为 0 时没有最佳 label
+                best_label=model.labels[best_idx] if best_score > 0.0 else None,
+                best_score=best_score,
+                scores=scores,
+                debug={
+                    "query_terms": tokens[:30],
+                    "query_term_count": len(tokens),
+                },
+            ))
+        return results
 
     # ---------------- internal: yaml ----------------
 
@@ -119,14 +163,14 @@ class PrototypeCosineRouter:
 
     # ---------------- internal: tf-idf ----------------
 
-    def _build_tfidf_from_prototypes(self) -> None:
+    def _build_model(self, prototypes: Dict[str, List[str]], low_signal_patterns: frozenset[str]) -> RouterModel:
         # 1) collect documents (each prototype sentence is a doc)
         docs: List[List[str]] = []
         doc_labels: List[str] = []
 
-        for label, texts in self.prototypes.items():
+        for label, texts in prototypes.items():
             for t in texts:
-                toks = self._tokenize_text_fallback(t)
+                toks = self._tokenize_text(t)
                 docs.append(toks)
                 doc_labels.append(label)
 
@@ -140,29 +184,66 @@ class PrototypeCosineRouter:
         # keep top max_terms by df (or you can keep all; cap helps memory)
         terms_sorted = sorted(df.items(), key=lambda x: x[1], reverse=True)
         terms_sorted = terms_sorted[: self.max_terms]
-        self._vocab = {term: i for i, (term, _) in enumerate(terms_sorted)}
+        vocab = {term: i for i, (term, _) in enumerate(terms_sorted)}
 
         # 4) idf
         N = max(1, len(docs))
-        self._idf = {}
+        idf: Dict[str, float] = {}
         for term, dfi in df.items():
-            if term not in self._vocab:
+            if term not in vocab:
                 continue
             # smooth idf
-            self._idf[term] = math.log((N + 1) / (dfi + 1)) + 1.0
+            idf[term] = math.log((N + 1) / (dfi + 1)) + 1.0
+
+        # 5) prototype matrix：每行一个原型（L2 归一化），同 label 的行连续存放
+        labels = list(prototypes.keys())
+        partial = RouterModel(
+            low_signal_patterns=low_signal_patterns,
+            prototypes=prototypes,
+            vocab=vocab,
+            idf=idf,
+            labels=labels,
+            proto_matrix=np.zeros((0, len(vocab)), dtype=np.float32),
+            seg_starts=np.zeros(0, dtype=np.intp),
+            seg_labels=np.zeros(0, dtype=np.intp),
+        )
 
-        # 5) precompute prototype vectors per label
-        self._proto_vecs = {label: [] for label in self.prototypes.keys()}
+        rows: List[np.ndarray] = []
+        seg_starts: List[int] = []
+        seg_labels: List[int] = []
+        docs_by_label: Dict[str, List[List[str]]] = {label: [] for label in labels}
         for toks, label in zip(docs, doc_labels):
-            vec = self._tfidf_vector(toks)
-            norm = self._norm(vec)
-            self._proto_vecs[label].append((vec, norm))
+            docs_by_label[label].append(toks)
+        for label_idx, label in enumerate(labels):
+            label_rows = []
+            for toks in docs_by_label[label]:
+                vec = np.zeros(len(vocab), dtype=np.float32)
+                for term, w in self._tfidf_vector(toks, partial).items():
+                    vec[vocab[term]] = w
+                norm = float(np.linalg.norm(vec))
+                if norm == 0.0:
+                    continue
+                label_rows.append(vec / norm)
+            if label_rows:
+                seg_starts.append(len(rows))
+                seg_labels.append(label_idx)
+                rows.extend(label_rows)
+
+        if not rows:
+            return partial
+        return dataclasses.replace(
+            partial,
+            proto_matrix=np.vstack(rows),
+            seg_starts=np.asarray(seg_starts, dtype=np.intp),
+            seg_labels=np.asarray(seg_labels, dtype=np.intp),
+        )
 
-    def _tfidf_vector(self, toks: List[str]) -> Dict[str, float]:
+    def _tfidf_vector(self, toks: List[str], model: Optional[RouterModel] = None) -> Dict[str, float]:
+        model = model or self._model
         # sparse dict: term -> weight
         tf: Dict[str, int] = {}
         for term in toks:
-            if term in self._vocab:
+            if term in model.vocab:
                 tf[term] = tf.get(term, 0) + 1
         if not tf:
             return {}
@@ -170,43 +251,21 @@ class PrototypeCosineRouter:
         # tf-idf (log-tf)
         vec: Dict[str, float] = {}
         for term, cnt in tf.items():
-            idf = self._idf.get(term, 0.0)
+            idf = model.idf.get(term, 0.0)
             if idf <= 0.0:
                 continue
             w = (1.0 + math.log(cnt)) * idf
             vec[term] = w
         return vec
 
-    @staticmethod
-    def _norm(vec: Dict[str, float]) -> float:
-        return math.sqrt(sum(v * v for v in vec.values()))
-
-    @staticmethod
-    def _cosine_sparse(
-        a: Dict[str, float],
-        a_norm: float,
-        b: Dict[str, float],
-        b_norm: float,
-    ) -> float:
-        if a_norm == 0.0 or b_norm == 0.0:
-            return 0.0
-        # iterate smaller dict
-        if len(a) > len(b):
-            a, b = b, a
-            a_norm, b_norm = b_norm, a_norm
-        dot = 0.0
-        for k, av in a.items():
-            bv = b.get(k)
-            if bv is not None:
-                dot += av * bv
-        return dot / (a_norm * b_norm)
-
     # ---------------- token extraction ----------------
 
     def _extract_tokens(self, msg: ChatMessage) -> List[str]:
         """
         取 tokens 的 word 部分（可选按 POS 过滤）
         """
+        if self.analyzer == "char_bigram":
+            return self._tokenize_char_bigram(msg.content or "")
         ar: Optional[AnalyzeResult] = msg.analyze_result
         if ar and ar.tokens:
             out: List[str] = []
@@ -220,6 +279,28 @@ class PrototypeCosineRouter:
         # fallback: simple tokenize the raw text
         return self._tokenize_text_fallback(msg.content or "")
 
+    def _tokenize_text(self, text: str) -> List[str]:
+        if self.analyzer == "char_bigram":
+            return self._tokenize_char_bigram(text)
+        return self._tokenize_text_fallback(text)
+
+    @staticmethod
+    def _tokenize_char_bigram(text: str) -> List[str]:
+        """
+        英文/数字按词，中文连续块拆成字符二元组（单字块保留单字）
+        """
+        import re
+        text = (text or "").strip().lower()
+        out: List[str] = []
+        for part in re.findall(r"[a-z0-9_]+|[\u4e00-\u9fff]+", text):
+            if not ("\u4e00" <= part[0] <= "\u9fff"):
+                out.append(part)
+            elif len(part) == 1:
+                out.append(part)
+            else:
+                out.extend(part[i:i + 2] for i in range(len(part) - 1))
+        return out
+
     @staticmethod
     def _tokenize_text_fallback(text: str) -> List[str]:
         """
@@ -73,6 +73,13 @@ class SignalDensityJudge(QueryPropertyBuilderAbstract):
 
     def getPriority(self) -> int:
         return 1
+
+    async def abuildProperty(self, msg: ChatMessage) -> List[tuple[str, Any, Any]] | List[tuple[str, Any]]:
+        # 纯 CPU 且耗时在微秒级：直接在当前协程里算，省掉线程切换
+        return self.buildProperty(msg)
+
+    def getFallback(self, msg: ChatMessage) -> List[tuple[str, Any, Any]] | List[tuple[str, Any]]:
+        return [("signal_density", 0.0)]
     # QueryPropertyBuilderAbstract 要求的主入口 :contentReference[oaicite:5]{index=5}
     def buildProperty(self, msg: ChatMessage) -> List[tuple[str, Any, Any]] | List[tuple[str, Any]]:
         ar = msg.analyze_result  # ChatMessage.analyze_result :contentReference[oaicite:6]{index=6}
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from DataClass.ChatMessage import ChatMessage
+
+
+class HistoryCache:
+    """
+    最近 N 条消息的环形缓存（RawChatHistory 使用）：
+    - 主序列是定长 deque，追加 O(1)，满了自动淘汰最旧的一条
+    - 二级索引：role -> deque、(role, sender_id) -> deque，插入时同步追加；
+      淘汰的一定是全局最旧的一条，因此在它所属的索引里也是最左边一条，popleft 即可
+    - 取最近 k 条（全部 / 按 role / 按 role + sender）都是从右往左 islice，O(k)，结果按时间正序
+    - turn_id -> 消息 的映射，get 为 O(1)；删除按 turn_id 从各 deque 中线性移除（很少发生）
+
+    complete=True 表示缓存里就是数据库中的全部消息（启动时 DB 不足 N 条），
+    此时缓存条数不足也能直接作答；一旦发生淘汰就不再完整
+
+    命中统计：hits（直接由缓存作答）/ misses（需要回落到 DB）
+    """
+
+    def __init__(self, maxlen: int):
+        self.maxlen = max(1, int(maxlen))
+        self._items: Deque[ChatMessage] = deque()
+        self._by_role: Dict[str, Deque[ChatMessage]] = {}
+        self._by_role_sender: Dict[Tuple[str, int], Deque[ChatMessage]] = {}
+        self._by_turn: Dict[int, ChatMessage] = {}
+        self.complete = False
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    # ---------------- 写 ----------------
+
+    def load(self, messages: Iterable[ChatMessage], *, complete: bool = False) -> None:
+        """用按时间正序排列的消息重建缓存"""
+        with self._lock:
+            self._items.clear()
+            self._by_role.clear()
+            self._by_role_sender.clear()
+            self._by_turn.clear()
+            self.complete = complete
+            for msg in messages:
+                self._append(msg)
+
+    def append(self, message: ChatMessage) -> None:
+        with self._lock:
+            self._append(message)
+
+    def remove(self, chat_turn_id: int) -> bool:
+        with self._lock:
+            msg = self._by_turn.pop(chat_turn_id, None)
+            if msg is None:
+                return False
+            self._items.remove(msg)
+            self._index_discard(msg)
+            return True
+
+    def _append(self, message: ChatMessage) -> None:
+        if len(self._items) >= self.maxlen:
+            evicted = self._items.popleft()
+            self._index_popleft(evicted)
+            if self._by_turn.get(evicted.chat_turn_id) is evicted:
+                del self._by_turn[evicted.chat_turn_id]
+            self.complete = False
+        self._items.append(message)
+        if message.chat_turn_id is not None:
+            self._by_turn[message.chat_turn_id] = message
+        self._by_role.setdefault(message.role, deque()).append(message)
+        self._by_role_sender.setdefault((message.role, message.sender_id), deque()).append(message)
+
+    def _index_popleft(self, message: ChatMessage) -> None:
+        for index, key in self._index_keys(message):
+            bucket = index.get(key)
+            if bucket and bucket[0] is message:
+                bucket.popleft()
+            elif bucket:
+                # 索引与主序列不一致时退化为线性删除，保证正确性
+                self._discard_from(bucket, message)
+            if bucket is not None and not bucket:
+                del index[key]
+
+    def _index_discard(self, message: ChatMessage) -> None:
+        for index, key in self._index_keys(message):
+            bucket = index.get(key)
+            if bucket is None:
+                continue
+            self._discard_from(bucket, message)
+            if not bucket:
+                del index[key]
+
+    def _index_keys(self, message: ChatMessage) -> List[Tuple[Dict[Any, Deque[ChatMessage]], Any]]:
+        return [
+            (self._by_role, message.role),
+            (self._by_role_sender, (message.role, message.sender_id)),
+        ]
+
+    @staticmethod
+    def _discard_from(bucket: Deque[ChatMessage], message: ChatMessage) -> None:
+        for i, m in enumerate(bucket):
+            if m is message:
+                del bucket[i]
+                return
+
+    # ---------------- 读 ----------------
+
+    def latest(self, k: int) -> Optional[List[ChatMessage]]:
+        """最近 k 条；缓存无法完整作答时返回 None（调用方回落到 DB）"""
+        with self._lock:
+            return self._take(self._items, k)
+
+    def latest_by_role(self, role: str, k: int, sender_id: Optional[int] = None) -> Optional[List[ChatMessage]]:
+        with self._lock:
+            bucket = self._by_role.get(role) if sender_id is None else self._by_role_sender.get((role, int(sender_id)))
+            return self._take(bucket or (), k)
+
+    def get(self, chat_turn_id: int) -> Optional[ChatMessage]:
+        with self._lock:
+            return self._by_turn.get(chat_turn_id)
+
+    def snapshot(self) -> List[ChatMessage]:
+        with self._lock:
+            return list(self._items)
+
+    def _take(self, bucket: Iterable[ChatMessage], k: int) -> Optional[List[ChatMessage]]:
+        k = max(0, int(k))
+        picked = list(islice(reversed(bucket), k))  # type: ignore[call-overload]
+        if len(picked) < k and not self.complete:
+            self.misses += 1
+            return None
+        self.hits += 1
+        picked.reverse()
+        return picked
+
+    def getStats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "maxlen": self.maxlen,
+                "complete": self.complete,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
@@ -1,61 +1,81 @@
+import asyncio
 import json
+from DataClass.AnalyzeResult import AnalyzeResult
 from DataClass.ChatMessage import ChatMessage
 from DataClass.DialogueMessage import DialogueMessage
 from pathlib import Path
 from loguru import logger
 import os
 
+from RawChatHistory.HistoryCache import HistoryCache
 from RawChatHistory.SqlitManagementSystem import SqlitManagementSystem
 
 class RawChatHistory:
-    def __init__(self, history_length: int, dialogue_length: int , db_path:str , echo:bool = False):
+    def __init__(self, history_length: int, dialogue_length: int , db_path:str , echo:bool = False, **kwargs):
 
-        self.sql_manager = SqlitManagementSystem(db_path=db_path, echo=echo)
+        # kwargs 透传给 SqlitManagementSystem（性能 PRAGMA / 写线程参数）
+        self.sql_manager = SqlitManagementSystem(db_path=db_path, echo=echo, **kwargs)
         self.history_length = history_length
         self.dialogue_length = dialogue_length
 
-        self.historys: list[ChatMessage] = self.sql_manager.getHistory(history_length)
+        # 最近 history_length 条消息的环形缓存（带 role / sender 索引），DB 不足 N 条时缓存即全集
+        self.history_cache = HistoryCache(history_length)
+        initial = self.sql_manager.getHistory(history_length)
+        self.history_cache.load(initial, complete=len(initial) < history_length)
         self.dialogues: list[DialogueMessage] = self.sql_manager.getDialogues(dialogue_length)
+        # 摘要每次新增/更新都 +1，供上层做缓存失效判断
+        self.dialogue_version = 0
 
-    def getHistory(self,length = -1) -> list[ChatMessage]:
+    def getHistory(self,length = -1, projection: str | None = None) -> list[ChatMessage]:
+        """
+        projection: 缓存不足时 DB 读取的投影（text / light / full），None 用 db_history_projection
+        """
         if length == -1:
             length = self.history_length
-        if len(self.historys) >= length:
-            return self.historys[-length:]
-        return self.sql_manager.getHistory(length)
-    def getHistoryByRole(self,role:str, length = -1, sender_id: int | None = None) -> list[ChatMessage]:
+        cached = self.history_cache.latest(length)
+        if cached is not None:
+            return cached
+        return self._prefer_cached(self.sql_manager.getHistory(length, projection=projection))
+    def getHistoryByRole(self,role:str, length = -1, sender_id: int | None = None, projection: str | None = None) -> list[ChatMessage]:
         """
         获取指定角色的历史消息
         Args:
             role (str): 角色名称
             length (int, optional): 获取的消息数量. Defaults to -1.
+            sender_id (int, optional): 只取该发送者的消息. Defaults to None.
+            projection (str, optional): 缓存不足时 DB 读取的投影. Defaults to None.
         Returns:
-            list[ChatMessage]: 指定角色的历史消息列表
+            list[ChatMessage]: 指定角色的历史消息列表（按时间正序）
         """
         if length == -1:
             length = self.history_length
 
-        # 首先从内存缓存中过滤出符合 role 的消息（保留时间顺序）
-        filtered = [m for m in self.historys if getattr(m, "role", None) == role]
-        if len(filtered) >= length:
-            return filtered[-length:]
+        # 缓存的 role / sender 索引足够时 O(k) 直接返回，不访问 DB
+        cached = self.history_cache.latest_by_role(role, length, sender_id=sender_id)
+        if cached is not None:
+            return cached
 
-        # 缓存不足，则从 DB 拉取指定 role（和 sender_id，如有） 的更多消息
-        remaining = length - len(filtered)
+        # 缓存不足：DB 中最新的 length 条本身就包含缓存里的那些，直接按 DB 结果返回
         if sender_id is None:
-            db_messages = self.sql_manager.getHistoryByRole(role, remaining)
+            db_messages = self.sql_manager.getHistoryByRole(role, length, projection=projection)
         else:
-            db_messages = self.sql_manager.getHistoryByRoleAndSender(role, sender_id, remaining)
+            db_messages = self.sql_manager.getHistoryByRoleAndSender(role, sender_id, length, projection=projection)
+        return self._prefer_cached(db_messages)
 
-        # 合并并按时间排序（确保时间顺序正确）
-        combined = filtered + db_messages
-        combined.sort(key=lambda m: getattr(m, "timestamp", 0))
-
-        # 返回最新的 length 条（按时间正序）
-        return combined[-length:]
+    def _prefer_cached(self, messages: list[ChatMessage]) -> list[ChatMessage]:
+        """DB 结果中已在缓存里的消息换成缓存对象（保留内存中已回填的分析结果等状态）"""
+        return [self.history_cache.get(m.chat_turn_id) or m for m in messages]
     
     def getHistoryLength(self) -> int:
         return self.sql_manager.getHistoryLength()
+
+    def getStats(self) -> dict:
+        """数据库统计（见 SqlitManagementSystem.getStats）+ 内存缓存条数"""
+        stats = self.sql_manager.getStats()
+        stats["cached_history"] = len(self.history_cache)
+        stats["history_cache"] = self.history_cache.getStats()
+        stats["cached_dialogues"] = len(self.dialogues)
+        return stats
     
     def getDialogueById(self, dialogue_id: int) -> DialogueMessage|None:
         return self.sql_manager.getDialoguesById(dialogue_id)
@@ -69,6 +89,7 @@ class RawChatHistory:
     
     def updateDialogue(self, dialogue: DialogueMessage):
         res = self.sql_manager.updateDialogue(dialogue)
+        self.dialogue_version += 1
         self.dialogues = [d for d in self.dialogues if d.dialogue_id != dialogue.dialogue_id]
         self.dialogues.append(dialogue)
         self.dialogues = self.dialogues[-self.dialogue_length:]
@@ -77,27 +98,37 @@ class RawChatHistory:
     def addDialogues(self, dialogue: DialogueMessage):
         self.dialogues.append(dialogue)
         self.dialogues = self.dialogues[-self.dialogue_length:]
+        self.dialogue_version += 1
         return self.sql_manager.addDialogue(dialogue)
 
     def addMessage(self, message: ChatMessage):
         turn_id = self.sql_manager.addMessage(message)
+        return self._remember_message(message, turn_id)
 
+    async def aaddMessage(self, message: ChatMessage) -> int:
+        """
+        异步写入：写请求交给 SqliteWriter，事件循环只等待 Future，不阻塞在磁盘 flush 上
+        """
+        turn_id = await asyncio.wrap_future(self.sql_manager.submitMessage(message))
+        return self._remember_message(message, turn_id)
+
+    def _remember_message(self, message: ChatMessage, turn_id: int) -> int:
         # 回填自增主键到内存对象，避免后续流程依赖 chat_turn_id 时拿到 None
         message.chat_turn_id = turn_id
         if message.analyze_result is not None:
             message.analyze_result.turn_id = turn_id
 
-        self.historys.append(message)
-        self.historys = self.historys[-self.history_length:]
+        self.history_cache.append(message)
         return turn_id
     
+    def attachAnalyze(self, chat_turn_id: int, analyze_result: AnalyzeResult) -> bool:
+        """回填/覆盖某条消息的分析结果（内存缓存中的消息对象由调用方负责替换）"""
+        return self.sql_manager.attachAnalyze(chat_turn_id, analyze_result)
+
     def deleteMessageById(self, chat_turn_id: int):
         # 先删 DB，再同步清理内存缓存
         res = self.sql_manager.deleteMessageById(chat_turn_id)
-        try:
-            self.historys = [m for m in self.historys if m.chat_turn_id != chat_turn_id]
-        except Exception:
-            pass
+        self.history_cache.remove(chat_turn_id)
         return res
         
     
\ No newline at end of file
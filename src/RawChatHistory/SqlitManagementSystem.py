@@ -1,15 +1,20 @@
 from __future__ import annotations
-from typing import List, Optional
+import os
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
 
-from sqlalchemy import text
+from sqlalchemy import event, text
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 
+from DataClass.AnalyzeResult import AnalyzeResult
 from DataClass.ChatMessage import ChatMessage
 from DataClass.DialogueMessage import DialogueMessage
 
 from RawChatHistory.sqlit.ChatCrud import ChatCrud
 from RawChatHistory.sqlit.DialogueCrud import DialogueCrud
+from RawChatHistory.sqlit.FtsIndex import FtsIndex
+from RawChatHistory.sqlit.SqliteWriter import SqliteWriter
 
 
 class SqlitManagementSystem:
@@ -17,11 +22,29 @@ class SqlitManagementSystem:
     Facade 层：
     - 内部使用 ChatStore / DialogueStore
     - 自己不碰 ORM
+    - 所有写操作经 SqliteWriter 单线程组提交；读操作直接走连接池（WAL 下读写互不阻塞）
+
+    **kwargs 参数说明**:
+    - db_performance_mode: 是否启用性能 PRAGMA（WAL / synchronous=NORMAL / mmap / cache），默认开启
+    - db_mmap_size: mmap_size（字节）
+    - db_cache_size_kb: page cache 大小（KB）
+    - db_busy_timeout_ms: 遇到锁时的等待时间（毫秒）
+    - db_writer_max_batch / db_writer_max_wait_ms: 透传给 SqliteWriter
+    - db_analyze_format: AnalyzeResult 存储格式，normalized（默认，五张子表）或 compact（单行压缩 blob），见 ChatCrud
+    - db_analyze_index: compact 格式下是否写实体 / 关键词侧索引
+    - db_raw_offload_keys: 从 AnalyzeResult.raw 剥离到 analyze_raw_evidence 的字段，默认 ["ltp"]
+    - db_raw_retention_turns: 原始证据只保留最近 N 条（None 不限，0 不存）
+    - db_history_projection: getHistory* 默认的读取投影 text / light / full（见 ChatCrud.PROJECTIONS），
+      默认 text：只查文本列，analyze_result 首次访问时再加载
+    - db_fts: 是否建立消息 / 摘要的 FTS5 全文索引（见 FtsIndex），默认开启
     """
 
-    def __init__(self, db_path: str, echo: bool = False):
+    def __init__(self, db_path: str, echo: bool = False, **kwargs):
         self.db_path = db_path
         self.engine = create_engine(f"sqlite:///{db_path}", echo=echo, future=True)
+        self.performance_mode = bool(kwargs.get("db_performance_mode", True))
+        self._pragmas = self._build_pragmas(**kwargs)
+        event.listen(self.engine, "connect", self._apply_pragmas)
 
         self.SessionLocal = sessionmaker(
             bind=self.engine,
@@ -29,9 +52,23 @@ class SqlitManagementSystem:
             expire_on_commit=False,
         )
 
+        # 全文索引由两个 store 在写入时维护，表在建完数据表后再建
+        self.fts: Optional[FtsIndex] = FtsIndex(self.engine) if bool(kwargs.get("db_fts", True)) else None
+
         # 两个 store
-        self.chat_store = ChatCrud(self.engine, self.SessionLocal)
-        self.dialogue_store = DialogueCrud(self.engine, self.SessionLocal)
+        self.chat_store = ChatCrud(
+            self.engine,
+            self.SessionLocal,
+            analyze_format=kwargs.get("db_analyze_format", "normalized"),
+            analyze_index=bool(kwargs.get("db_analyze_index", True)),
+            raw_offload_keys=kwargs.get("db_raw_offload_keys", ("ltp",)),
+            raw_retention_turns=kwargs.get("db_raw_retention_turns", 200),
+            fts=self.fts,
+        )
+        self.dialogue_store = DialogueCrud(self.engine, self.SessionLocal, fts=self.fts)
+        self.history_projection = kwargs.get("db_history_projection", "text")
+        if self.history_projection not in ChatCrud.PROJECTIONS:
+            raise ValueError(f"Unsupported db_history_projection: {self.history_projection}")
 
         # 建表
         self.chat_store.create_tables()
@@ -39,6 +76,36 @@ class SqlitManagementSystem:
         # 轻量迁移：为旧 DB 补齐 chat_messages.sender_name / sender_id
         self._migrate_chat_messages_sender_fields()
 
+        if self.fts is not None:
+            self.fts.create()
+
+        self.writer = SqliteWriter(self.SessionLocal, **kwargs)
+
+    def _build_pragmas(self, **kwargs) -> list[str]:
+        # busy_timeout 与性能模式无关，始终设置
+        pragmas = [
+            f"PRAGMA busy_timeout={int(kwargs.get('db_busy_timeout_ms', 5000))}",
+        ]
+        if self.performance_mode:
+            pragmas += [
+                "PRAGMA journal_mode=WAL",
+                # WAL 下 NORMAL 只在 checkpoint 时 fsync，断电最多丢最后几个事务，不会损坏
+                "PRAGMA synchronous=NORMAL",
+                "PRAGMA temp_store=MEMORY",
+                f"PRAGMA mmap_size={int(kwargs.get('db_mmap_size', 256 * 1024 * 1024))}",
+                # 负数表示 KB
+                f"PRAGMA cache_size=-{int(kwargs.get('db_cache_size_kb', 64 * 1024))}",
+            ]
+        return pragmas
+
+    def _apply_pragmas(self, dbapi_conn, connection_record) -> None:
+        cursor = dbapi_conn.cursor()
+        try:
+            for pragma in self._pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
     def _migrate_chat_messages_sender_fields(self) -> None:
         with self.engine.begin() as conn:
             try:
@@ -91,41 +158,127 @@ class SqlitManagementSystem:
     # ChatMessage
     # =====================
     def getHistoryLength(self) -> int:
-        """消息总数"""
-        msgs = self.chat_store.list_messages(limit=1_000_000, with_analyze=False)
-        return len(msgs)
+        """消息总数（COUNT(*)，不加载行）"""
+        return self.chat_store.count_messages()
+
+    def getStats(self) -> Dict[str, Any]:
+        """
+        数据库统计：消息总数 / 按 role 与 sender 的计数 / 摘要数 / 最早与最新消息时间戳 / 文件大小
+        全部由聚合查询得到，耗时与历史长度基本无关
+        """
+        stats = self.chat_store.message_stats()
+        by_role: Dict[str, int] = {}
+        for row in stats["by_sender"]:
+            by_role[row["role"]] = by_role.get(row["role"], 0) + row["count"]
+        return {
+            "message_count": sum(by_role.values()),
+            "by_role": by_role,
+            "by_sender": stats["by_sender"],
+            "dialogue_count": self.dialogue_store.count(),
+            "oldest_timestamp": stats["oldest_timestamp"],
+            "newest_timestamp": stats["newest_timestamp"],
+            "db_size_bytes": self._db_size_bytes(),
+        }
 
-    def getHistory(self, length: int) -> List[ChatMessage]:
+    def _db_size_bytes(self) -> int:
+        # WAL 模式下未 checkpoint 的数据在 -wal 文件里，一起算
+        total = 0
+        for path in (self.db_path, f"{self.db_path}-wal"):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def getHistory(self, length: int, projection: Optional[str] = None) -> List[ChatMessage]:
         return self.chat_store.list_messages(
             limit=length,
             order_desc=True,
-            with_analyze=True,
+            projection=projection or self.history_projection,
         )[::-1]
 
-    def getHistoryByRole(self, role: str, length: int) -> List[ChatMessage]:
+    def getHistoryByRole(self, role: str, length: int, projection: Optional[str] = None) -> List[ChatMessage]:
         """按 role 列出历史消息，返回按时间正序排列的列表（最早在前）。"""
         return self.chat_store.list_messages(
             limit=length,
             order_desc=True,
-            with_analyze=True,
             role=role,
+            projection=projection or self.history_projection,
         )[::-1]
 
-    def getHistoryByRoleAndSender(self, role: str, sender_id: Optional[int], length: int) -> List[ChatMessage]:
+    def getHistoryByRoleAndSender(
+        self, role: str, sender_id: Optional[int], length: int, projection: Optional[str] = None
+    ) -> List[ChatMessage]:
         """按 role + sender_id 列出历史消息，返回按时间正序排列的列表（最早在前）。"""
         return self.chat_store.list_messages(
             limit=length,
             order_desc=True,
-            with_analyze=True,
             role=role,
             sender_id=sender_id,
+            projection=projection or self.history_projection,
         )[::-1]
 
+    def getMessagesAfter(self, chat_turn_id: int, limit: int = 256) -> List[ChatMessage]:
+        """chat_turn_id 之后的消息（text 投影，不挂分析结果），按时间正序；用于增量同步"""
+        return self.chat_store.list_messages(
+            limit=limit, order_desc=False, projection="text", lazy_analyze=False, after_turn_id=chat_turn_id,
+        )
+
+    def getMessagesByIds(self, chat_turn_ids: List[int]) -> List[ChatMessage]:
+        """按 id 批量读取消息（text 投影，analyze_result 懒加载），按时间正序"""
+        if not chat_turn_ids:
+            return []
+        return self.chat_store.list_messages(
+            limit=len(chat_turn_ids), order_desc=False, projection="text", turn_ids=chat_turn_ids,
+        )
+
+    def getAnalyze(self, chat_turn_id: int) -> Optional[AnalyzeResult]:
+        return self.chat_store.get_analyze(chat_turn_id)
+
     def addMessage(self, message: ChatMessage) -> int:
-        return self.chat_store.insert_message(message)
+        return self.submitMessage(message).result()
+
+    def submitMessage(self, message: ChatMessage) -> Future:
+        """
+        非阻塞写入：返回 Future，commit 完成后结果为 chat_turn_id
+        """
+        return self.writer.submit(lambda session: self.chat_store.insert_message_in(session, message))
+
+    def findTurnIds(self, term: str, kind: Optional[str] = None, limit: int = 50) -> List[int]:
+        """按实体 / 关键词反查消息 turn_id（compact 格式的侧索引）"""
+        return self.chat_store.find_turn_ids(term, kind=kind, limit=limit)
+
+    def searchMessages(
+        self,
+        texts: List[str],
+        limit: int = 10,
+        before_turn_id: Optional[int] = None,
+        role: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """全文检索历史消息（BM25），未启用 db_fts 时返回空列表"""
+        if self.fts is None:
+            return []
+        return self.fts.search_messages(
+            FtsIndex.build_match(texts), limit=limit, before_turn_id=before_turn_id, role=role
+        )
+
+    def searchDialogues(self, texts: List[str], limit: int = 10) -> List[Dict[str, Any]]:
+        """全文检索对话摘要（BM25），未启用 db_fts 时返回空列表"""
+        if self.fts is None:
+            return []
+        return self.fts.search_dialogues(FtsIndex.build_match(texts), limit=limit)
+
+    def getRawEvidence(self, chat_turn_id: int) -> Optional[Dict[str, Any]]:
+        """按需读取被剥离的原始证据（如完整 LTP 输出）"""
+        return self.chat_store.get_raw_evidence(chat_turn_id)
 
     def deleteMessageById(self, chat_turn_id: int):
-        self.chat_store.delete_message(chat_turn_id)
+        return self.writer.run(lambda session: self.chat_store.delete_message_in(session, chat_turn_id))
+
+    def attachAnalyze(self, chat_turn_id: int, analyze_result: AnalyzeResult) -> bool:
+        return self.writer.run(
+            lambda session: self.chat_store.attach_or_replace_analyze_in(session, chat_turn_id, analyze_result)
+        )
 
     # =====================
     # Dialogue
@@ -140,25 +293,33 @@ class SqlitManagementSystem:
         if dialogue.dialogue_id is None:
             return
 
-        # summary
-        self.dialogue_store.update_summary(
-            dialogue.dialogue_id,
-            dialogue.summary,
-            entities=getattr(dialogue, "entities", None),
-            keywords=getattr(dialogue, "keywords", None),
-            emotion_cues=getattr(dialogue, "emotion_cues", None),
-        )
+        dialogue_id = dialogue.dialogue_id
 
-        # completed
-        if dialogue.is_completed and dialogue.end_turn_id is not None:
-            self.dialogue_store.mark_completed(
-                dialogue.dialogue_id,
-                dialogue.end_turn_id,
+        def _job(session) -> None:
+            # summary
+            self.dialogue_store.update_summary_in(
+                session,
+                dialogue_id,
+                dialogue.summary,
+                entities=getattr(dialogue, "entities", None),
+                keywords=getattr(dialogue, "keywords", None),
+                emotion_cues=getattr(dialogue, "emotion_cues", None),
             )
 
+            # completed
+            if dialogue.is_completed and dialogue.end_turn_id is not None:
+                self.dialogue_store.mark_completed_in(
+                    session,
+                    dialogue_id,
+                    dialogue.end_turn_id,
+                )
+
+        self.writer.run(_job)
+
     def addDialogue(self, dialogue: DialogueMessage) -> int:
-        return self.dialogue_store.create(dialogue)
+        return self.writer.run(lambda session: self.dialogue_store.create_in(session, dialogue))
 
     # =====================
     def exit(self):
+        self.writer.close()
         self.engine.dispose()
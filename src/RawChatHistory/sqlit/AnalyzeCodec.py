@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import json
+import zlib
+from typing import Any, List, Tuple
+
+from DataClass.AnalyzeResult import AnalyzeResult
+
+
+class AnalyzeCodec:
+    """
+    AnalyzeResult <-> 紧凑二进制（compact 存储格式使用）
+    - 编码：to_dict -> 紧凑 JSON（无空白、保留中文）-> zlib
+    - LTP 的 dep/sdp/sdpg 等原始输出重复度高，zlib 压缩率通常在 4~8 倍
+    - codec 名随行保存，以后换编码（如 msgpack / zstd）时旧数据仍可按原 codec 解码
+    """
+
+    CODEC = "zlib-json"
+
+    @staticmethod
+    def encode(ar: AnalyzeResult, level: int = 6) -> bytes:
+        return AnalyzeCodec.encode_json(ar.to_dict(), level)
+
+    @staticmethod
+    def decode(data: bytes, codec: str = CODEC) -> AnalyzeResult:
+        return AnalyzeResult.from_dict(AnalyzeCodec.decode_json(data, codec))
+
+    @staticmethod
+    def encode_json(obj: Any, level: int = 6) -> bytes:
+        payload = json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+        return zlib.compress(payload.encode("utf-8"), level)
+
+    @staticmethod
+    def decode_json(data: bytes, codec: str = CODEC) -> Any:
+        if codec != AnalyzeCodec.CODEC:
+            raise ValueError(f"Unsupported analyze codec: {codec}")
+        return json.loads(zlib.decompress(data).decode("utf-8"))
+
+    @staticmethod
+    def index_terms(ar: AnalyzeResult) -> List[Tuple[str, str]]:
+        """
+        side index 的 (kind, term)：实体文本与关键词，去重保序
+        """
+        terms: List[Tuple[str, str]] = []
+        seen = set()
+        for kind, values in (
+            ("entity", [e.text for e in ar.entities]),
+            ("keyword", ar.keywords),
+        ):
+            for v in values:
+                term = (v or "").strip()
+                if term and (kind, term) not in seen:
+                    seen.add((kind, term))
+                    terms.append((kind, term))
+        return terms
@@ -0,0 +1,55 @@
+"""
+AnalyzeResult 存储格式迁移工具（normalized <-> compact）
+
+用法（在仓库根目录，先停掉正在运行的服务或确认 busy_timeout 足够）:
+    PYTHONPATH=src python -m RawChatHistory.sqlit.AnalyzeStorageMigration --db chat_history.db --to compact
+
+迁移完成后把 db_analyze_format 配置成目标格式；可重复执行，只处理仍以源格式存储的行
+加 --offload-raw 时顺带把旧数据 raw 中的完整 LTP 输出剥离到 analyze_raw_evidence 并按保留期裁剪
+"""
+from __future__ import annotations
+
+import argparse
+
+from loguru import logger
+
+from RawChatHistory.SqlitManagementSystem import SqlitManagementSystem
+
+
+def migrate(
+    db_path: str,
+    to: str,
+    batch_size: int = 200,
+    vacuum: bool = False,
+    offload_raw: bool = False,
+    **kwargs,
+) -> int:
+    sql = SqlitManagementSystem(db_path=db_path, db_analyze_format=to, **kwargs)
+    try:
+        migrated = sql.chat_store.migrate_analyze_format(to, batch_size=batch_size)
+        logger.info(f"Migrated {migrated} analyze results in {db_path} to {to}")
+        if offload_raw:
+            offloaded = sql.chat_store.offload_raw_evidence(batch_size=batch_size)
+            logger.info(f"Offloaded raw evidence of {offloaded} analyze results in {db_path}")
+        if vacuum:
+            # 删除大量子表行后回收空间
+            with sql.engine.connect() as conn:
+                conn.exec_driver_sql("VACUUM")
+        return migrated
+    finally:
+        sql.exit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migrate AnalyzeResult storage format")
+    parser.add_argument("--db", default="chat_history.db")
+    parser.add_argument("--to", choices=["normalized", "compact"], required=True)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--vacuum", action="store_true")
+    parser.add_argument("--offload-raw", action="store_true")
+    args = parser.parse_args()
+    migrate(args.db, args.to, batch_size=args.batch_size, vacuum=args.vacuum, offload_raw=args.offload_raw)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Tuple, Union, Type
+import dataclasses
+import functools
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union, Type
 
-from sqlalchemy import select
+from sqlalchemy import delete, func, or_, select
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session as SASession
-from sqlalchemy.orm import sessionmaker, selectinload
+from sqlalchemy.orm import joinedload, sessionmaker, selectinload
 
 from DataClass.ChatMessage import ChatMessage
 from DataClass.AnalyzeResult import AnalyzeResult, Entity, Frame, Argument, Relation
@@ -18,7 +20,12 @@ from RawChatHistory.sqlit.SqiltModel import (
     FrameORM,
     ArgumentORM,
     RelationORM,
+    AnalyzeBlobORM,
+    AnalyzeIndexORM,
+    AnalyzeRawEvidenceORM,
 )
+from RawChatHistory.sqlit.AnalyzeCodec import AnalyzeCodec
+from RawChatHistory.sqlit.FtsIndex import FtsIndex
 
 
 SessionFactory = Union[Type[SASession], sessionmaker]
@@ -29,11 +36,73 @@ class ChatCrud:
     负责 ChatMessage + 可选 AnalyzeResult 的存取。
     - 插入 message 时：AnalyzeResult 为空就不插
     - 读取 message 时：自动组装 message.analyze_result（可能 None）
+
+    analyze_format（AnalyzeResult 的存储格式）:
+    - "normalized"：拆成 analyze_results / entities / frames / arguments / relations 五张表，读取需 4 次 selectinload
+    - "compact"：整体编码为 analyze_blobs 中的一行（AnalyzeCodec），随消息 joinedload，一次查询；
+      analyze_index=True 时另写 (entity|keyword, term) 侧索引，供 find_turn_ids 反查
+    切换格式后用 migrate_analyze_format() 迁移已有数据，未迁移的行在新格式下读不到分析结果
+
+    原始证据剥离（两种格式都适用）:
+    - raw_offload_keys 中的 raw 字段（默认 "ltp"，即完整 LTP pipeline 输出）不随 AnalyzeResult 存储，
+      压缩后写入 analyze_raw_evidence，历史读取不加载，需要时用 get_raw_evidence(turn_id) 单独读取
+    - raw_retention_turns: 只保留最近 N 条消息的原始证据；None 表示不限，0 表示直接丢弃不存
     """
 
-    def __init__(self, engine: Engine, SessionLocal: SessionFactory):
+    FORMATS = ("normalized", "compact")
+
+    # 历史读取投影（list_messages 的 projection）:
+    # - "text"：只查文本列（不含 voice / image / video），analyze_result 首次访问时才按 turn 单独加载
+    # - "light"：文本列 + 轻量信号（is_question / is_self_reference / emotion_cues / keywords / normalized_text），
+    #   normalized 格式下只 join analyze_results 一张表，entities / frames / relations / tokens / raw 为空；
+    #   compact 格式的 blob 本身就是完整结果，直接解码
+    # - "full"：完整对象图（与 with_analyze=True 相同）
+    PROJECTIONS = ("text", "light", "full")
+
+    _TEXT_COLUMNS = (
+        ChatMessageORM.chat_turn_id,
+        ChatMessageORM.sender_name,
+        ChatMessageORM.sender_id,
+        ChatMessageORM.role,
+        ChatMessageORM.content,
+        ChatMessageORM.timestamp,
+        ChatMessageORM.timedate,
+        ChatMessageORM.extra,
+    )
+    _LIGHT_COLUMNS = (
+        AnalyzeResultORM.turn_id.label("ar_turn_id"),
+        AnalyzeResultORM.timestamp.label("ar_timestamp"),
+        AnalyzeResultORM.media_type,
+        AnalyzeResultORM.schema_version,
+        AnalyzeResultORM.normalized_text,
+        AnalyzeResultORM.keywords,
+        AnalyzeResultORM.emotion_cues,
+        AnalyzeResultORM.is_question,
+        AnalyzeResultORM.is_self_reference,
+    )
+
+    def __init__(
+        self,
+        engine: Engine,
+        SessionLocal: SessionFactory,
+        analyze_format: str = "normalized",
+        analyze_index: bool = True,
+        raw_offload_keys: Sequence[str] = ("ltp",),
+        raw_retention_turns: Optional[int] = 200,
+        fts: Optional[FtsIndex] = None,
+    ):
+        if analyze_format not in self.FORMATS:
+            raise ValueError(f"Unsupported analyze_format: {analyze_format}")
         self.engine = engine
         self.SessionLocal = SessionLocal
+        self.analyze_format = analyze_format
+        self.analyze_index = analyze_index
+        self.raw_offload_keys = tuple(raw_offload_keys or ())
+        self.raw_retention_turns = raw_retention_turns
+        # 全文索引在写入的同一个 session 里维护（None 表示未启用）
+        self.fts = fts
+        # retention 裁剪不必每次写入都做，攒一批再裁
+        self._evidence_writes_since_prune = 0
 
     def _session(self) -> SASession:
         if isinstance(self.SessionLocal, sessionmaker):
@@ -146,37 +215,147 @@ class ChatCrud:
             raw=ar_row.raw or {},
         )
 
-    @staticmethod
-    def _chat_to_dataclass(chat_row: ChatMessageORM) -> ChatMessage:
+    def _chat_to_dataclass(self, chat_row: ChatMessageORM, *, with_analyze: bool = True) -> ChatMessage:
         ar_dc: Optional[AnalyzeResult] = None
-        if chat_row.analyze_result is not None:
-            ar_dc = ChatCrud._analyze_to_dataclass(chat_row.analyze_result)
+        if with_analyze:
+            ar_dc = self._row_analyze(chat_row)
+        return self._message_from_row(chat_row, ar_dc)
 
+    @staticmethod
+    def _message_from_row(row: Any, ar_dc: Optional[AnalyzeResult]) -> ChatMessage:
+        """row 可以是 ChatMessageORM，也可以是投影查询的 Row（没有的列按 None 处理）"""
         # Ensure role is one of the allowed literals
-        role_value = chat_row.role
+        role_value = row.role
         if role_value not in ('user', 'assistant', 'system'):
             raise ValueError(f"Invalid role value: {role_value}")
 
         default_name, default_id = ChatMessage._default_sender_for_role(role_value)
-        sender_name = getattr(chat_row, "sender_name", None) or default_name
-        sender_id = getattr(chat_row, "sender_id", None)
+        sender_name = getattr(row, "sender_name", None) or default_name
+        sender_id = getattr(row, "sender_id", None)
         sender_id = int(sender_id) if sender_id is not None else default_id
 
         return ChatMessage(
             sender_name=sender_name,
             sender_id=sender_id,
             role=role_value,  # type: ignore
-            content=chat_row.content,
-            timestamp=chat_row.timestamp,
-            timedate=chat_row.timedate,
-            extra=chat_row.extra,
-            chat_turn_id=chat_row.chat_turn_id,
-            voice=chat_row.voice,
-            image=chat_row.image,
-            video=chat_row.video,
+            content=row.content,
+            timestamp=row.timestamp,
+            timedate=row.timedate,
+            extra=row.extra,
+            chat_turn_id=row.chat_turn_id,
+            voice=getattr(row, "voice", None),
+            image=getattr(row, "image", None),
+            video=getattr(row, "video", None),
             analyze_result=ar_dc,
         )
 
+    def _row_analyze(self, chat_row: ChatMessageORM) -> Optional[AnalyzeResult]:
+        # 只读当前格式对应的关系，避免另一种格式触发逐行懒加载
+        if self.analyze_format == "compact":
+            blob = chat_row.analyze_blob
+            if blob is None:
+                return None
+            ar = AnalyzeCodec.decode(blob.data, blob.codec)
+            ar.turn_id = chat_row.chat_turn_id
+            return ar
+        if chat_row.analyze_result is not None:
+            return self._analyze_to_dataclass(chat_row.analyze_result)
+        return None
+
+    def _analyze_load_options(self) -> list:
+        if self.analyze_format == "compact":
+            return [joinedload(ChatMessageORM.analyze_blob)]
+        return [
+            selectinload(ChatMessageORM.analyze_result)
+                .selectinload(AnalyzeResultORM.entities),
+            selectinload(ChatMessageORM.analyze_result)
+                .selectinload(AnalyzeResultORM.relations),
+            selectinload(ChatMessageORM.analyze_result)
+                .selectinload(AnalyzeResultORM.frames)
+                .selectinload(FrameORM.arguments),
+        ]
+
+    def _split_raw(self, ar: AnalyzeResult) -> Tuple[AnalyzeResult, Dict[str, Any]]:
+        """拆出需要剥离的 raw 字段；返回新的 AnalyzeResult，不修改调用方持有的对象"""
+        evidence = {k: ar.raw[k] for k in self.raw_offload_keys if k in (ar.raw or {})}
+        if not evidence:
+            return ar, {}
+        slim_raw = {k: v for k, v in ar.raw.items() if k not in evidence}
+        return dataclasses.replace(ar, raw=slim_raw), evidence
+
+    def _store_evidence_in(self, session: SASession, turn_id: int, evidence: Dict[str, Any]) -> None:
+        if not evidence or self.raw_retention_turns == 0:
+            return
+        # merge：同一 turn 已有证据时覆盖
+        session.merge(AnalyzeRawEvidenceORM(
+            turn_id=turn_id,
+            codec=AnalyzeCodec.CODEC,
+            data=AnalyzeCodec.encode_json(evidence),
+        ))
+        self._evidence_writes_since_prune += 1
+        if self.raw_retention_turns is not None and self._evidence_writes_since_prune >= 50:
+            self._evidence_writes_since_prune = 0
+            self.prune_raw_evidence_in(session)
+
+    def prune_raw_evidence_in(self, session: SASession) -> int:
+        """按 raw_retention_turns 删除较早消息的原始证据，返回删除行数"""
+        if self.raw_retention_turns is None:
+            return 0
+        session.flush()
+        keep = select(AnalyzeRawEvidenceORM.turn_id).order_by(
+            AnalyzeRawEvidenceORM.turn_id.desc()
+        ).limit(self.raw_retention_turns)
+        res = session.execute(
+            delete(AnalyzeRawEvidenceORM).where(AnalyzeRawEvidenceORM.turn_id.not_in(keep.scalar_subquery()))
+        )
+        return int(res.rowcount or 0)  # type: ignore[attr-defined]
+
+    def get_raw_evidence(self, chat_turn_id: int) -> Optional[Dict[str, Any]]:
+        """读取某条消息被剥离的原始证据（如 {"ltp": {...}}），已过保留期或从未存储时返回 None"""
+        with self._session() as session:
+            row = session.get(AnalyzeRawEvidenceORM, chat_turn_id)
+            if row is None:
+                return None
+            return AnalyzeCodec.decode_json(row.data, row.codec)
+
+    def _add_analyze_in(self, session: SASession, turn_id: int, ar: AnalyzeResult, *, fmt: Optional[str] = None) -> None:
+        fmt = fmt or self.analyze_format
+        ar, evidence = self._split_raw(ar)
+        self._store_evidence_in(session, turn_id, evidence)
+        if fmt == "compact":
+            session.add(AnalyzeBlobORM(
+                turn_id=turn_id,
+                codec=AnalyzeCodec.CODEC,
+                schema_version=ar.schema_version,
+                data=AnalyzeCodec.encode(ar),
+            ))
+            if self.analyze_index:
+                session.add_all([
+                    AnalyzeIndexORM(turn_id=turn_id, kind=kind, term=term)
+                    for kind, term in AnalyzeCodec.index_terms(ar)
+                ])
+        else:
+            session.add(self._analyze_to_orm(ar, turn_id=turn_id))
+
+    def _remove_analyze_in(self, session: SASession, turn_id: int, *, keep_evidence: bool = False) -> bool:
+        """删除两种格式下该消息的全部分析数据，返回是否删到了东西；keep_evidence 时保留已剥离的原始证据"""
+        removed = False
+        ar_row = session.execute(
+            select(AnalyzeResultORM).where(AnalyzeResultORM.turn_id == turn_id)
+        ).scalar_one_or_none()
+        if ar_row is not None:
+            session.delete(ar_row)
+            removed = True
+        blob = session.get(AnalyzeBlobORM, turn_id)
+        if blob is not None:
+            session.delete(blob)
+            removed = True
+        session.execute(delete(AnalyzeIndexORM).where(AnalyzeIndexORM.turn_id == turn_id))
+        if not keep_evidence:
+            session.execute(delete(AnalyzeRawEvidenceORM).where(AnalyzeRawEvidenceORM.turn_id == turn_id))
+        session.flush()
+        return removed
+
     # =========================
     # Create
     # =========================
@@ -186,18 +365,26 @@ class ChatCrud:
         返回 chat_turn_id（自增主键）。
         """
         with self._session() as session:
-            chat_row = self._chat_to_orm(msg)
-            session.add(chat_row)
-            session.flush()  # 生成 chat_row.chat_turn_id
+            turn_id = self.insert_message_in(session, msg)
+            session.commit()
+            return turn_id
 
-            turn_id = int(chat_row.chat_turn_id)
+    def insert_message_in(self, session: SASession, msg: ChatMessage) -> int:
+        """
+        在调用方的 session 中插入（不 commit），供 SqliteWriter 组提交使用
+        """
+        chat_row = self._chat_to_orm(msg)
+        session.add(chat_row)
+        session.flush()  # 生成 chat_row.chat_turn_id
 
-            if msg.analyze_result is not None:
-                ar_row = self._analyze_to_orm(msg.analyze_result, turn_id=turn_id)
-                session.add(ar_row)
+        turn_id = int(chat_row.chat_turn_id)
+        if self.fts is not None:
+            self.fts.index_message_in(session, turn_id)
 
-            session.commit()
-            return turn_id
+        if msg.analyze_result is not None:
+            self._add_analyze_in(session, turn_id, msg.analyze_result)
+            session.flush()
+        return turn_id
 
     # =========================
     # Read (组合返回 dataclass)
@@ -210,19 +397,35 @@ class ChatCrud:
             stmt = select(ChatMessageORM).where(ChatMessageORM.chat_turn_id == chat_turn_id)
 
             if with_analyze:
-                stmt = stmt.options(
-                    selectinload(ChatMessageORM.analyze_result)
-                        .selectinload(AnalyzeResultORM.entities),
-                    selectinload(ChatMessageORM.analyze_result)
-                        .selectinload(AnalyzeResultORM.relations),
-                    selectinload(ChatMessageORM.analyze_result)
-                        .selectinload(AnalyzeResultORM.frames)
-                        .selectinload(FrameORM.arguments),
-                )
-            row = session.execute(stmt).scalar_one_or_none()
+                stmt = stmt.options(*self._analyze_load_options())
+            row = session.execute(stmt).unique().scalar_one_or_none()
             if row is None:
                 return None
-            return self._chat_to_dataclass(row)
+            return self._chat_to_dataclass(row, with_analyze=with_analyze)
+
+    def get_analyze(self, chat_turn_id: int) -> Optional[AnalyzeResult]:
+        """
+        只读一条消息的完整分析结果（懒加载入口），不加载消息本身
+        """
+        with self._session() as session:
+            if self.analyze_format == "compact":
+                blob = session.get(AnalyzeBlobORM, chat_turn_id)
+                if blob is None:
+                    return None
+                ar = AnalyzeCodec.decode(blob.data, blob.codec)
+                ar.turn_id = chat_turn_id
+                return ar
+
+            row = session.execute(
+                select(AnalyzeResultORM)
+                .where(AnalyzeResultORM.turn_id == chat_turn_id)
+                .options(
+                    selectinload(AnalyzeResultORM.entities),
+                    selectinload(AnalyzeResultORM.relations),
+                    selectinload(AnalyzeResultORM.frames).selectinload(FrameORM.arguments),
+                )
+            ).scalar_one_or_none()
+            return self._analyze_to_dataclass(row) if row is not None else None
 
     def list_messages(
         self,
@@ -233,36 +436,180 @@ class ChatCrud:
         with_analyze: bool = True,
         role: Optional[str] = None,
         sender_id: Optional[int] = None,
+        projection: Optional[str] = None,
+        lazy_analyze: bool = True,
+        after_turn_id: Optional[int] = None,
+        turn_ids: Optional[Sequence[int]] = None,
     ) -> List[ChatMessage]:
         """
-        列表查询（可选按 role 过滤），返回 ChatMessage dataclass 列表
-        """
-        with self._session() as session:
-            stmt = select(ChatMessageORM)
+        列表查询（可选按 role / sender_id 过滤，after_turn_id 只取其后的消息，turn_ids 只取指定消息），
+        返回 ChatMessage dataclass 列表
 
-            if role is not None:
-                stmt = stmt.where(ChatMessageORM.role == role)
+        projection 见 PROJECTIONS；为 None 时按 with_analyze 走完整 ORM 读取（原有行为）
+        lazy_analyze: "text" 投影下是否挂懒加载函数，False 时 analyze_result 恒为 None
+        """
+        if projection is not None and projection != "full":
+            return self._list_projected(
+                projection,
+                limit=limit,
+                offset=offset,
+                order_desc=order_desc,
+                role=role,
+                sender_id=sender_id,
+                lazy_analyze=lazy_analyze,
+                after_turn_id=after_turn_id,
+                turn_ids=turn_ids,
+            )
 
-            if sender_id is not None:
-                stmt = stmt.where(ChatMessageORM.sender_id == int(sender_id))
+        with self._session() as session:
+            stmt = self._filter_messages(
+                select(ChatMessageORM),
+                role=role, sender_id=sender_id, after_turn_id=after_turn_id, turn_ids=turn_ids,
+            )
 
             stmt = stmt.order_by(
                 ChatMessageORM.chat_turn_id.desc() if order_desc else ChatMessageORM.chat_turn_id.asc()
             ).limit(limit).offset(offset)
 
             if with_analyze:
-                stmt = stmt.options(
-                    selectinload(ChatMessageORM.analyze_result)
-                        .selectinload(AnalyzeResultORM.entities),
-                    selectinload(ChatMessageORM.analyze_result)
-                        .selectinload(AnalyzeResultORM.relations),
-                    selectinload(ChatMessageORM.analyze_result)
-                        .selectinload(AnalyzeResultORM.frames)
-                        .selectinload(FrameORM.arguments),
-                )
+                stmt = stmt.options(*self._analyze_load_options())
+
+            # joinedload 一对一不会产生重复行，unique() 只是 ORM 的要求
+            rows = session.execute(stmt).unique().scalars().all()
+            return [self._chat_to_dataclass(r, with_analyze=with_analyze) for r in rows]
+
+    def _list_projected(
+        self,
+        projection: str,
+        *,
+        limit: int,
+        offset: int,
+        order_desc: bool,
+        role: Optional[str],
+        sender_id: Optional[int],
+        lazy_analyze: bool,
+        after_turn_id: Optional[int] = None,
+        turn_ids: Optional[Sequence[int]] = None,
+    ) -> List[ChatMessage]:
+        """投影读取：一次只选所需列的查询，不构建 ORM 对象图"""
+        if projection not in self.PROJECTIONS:
+            raise ValueError(f"Unsupported projection: {projection}")
+
+        columns: list = list(self._TEXT_COLUMNS)
+        if projection == "light":
+            if self.analyze_format == "compact":
+                columns += [AnalyzeBlobORM.codec, AnalyzeBlobORM.data]
+            else:
+                columns += list(self._LIGHT_COLUMNS)
+
+        stmt = select(*columns)
+        if projection == "light":
+            if self.analyze_format == "compact":
+                stmt = stmt.outerjoin(AnalyzeBlobORM, AnalyzeBlobORM.turn_id == ChatMessageORM.chat_turn_id)
+            else:
+                stmt = stmt.outerjoin(AnalyzeResultORM, AnalyzeResultORM.turn_id == ChatMessageORM.chat_turn_id)
+        stmt = self._filter_messages(
+            stmt, role=role, sender_id=sender_id, after_turn_id=after_turn_id, turn_ids=turn_ids,
+        )
+        stmt = stmt.order_by(
+            ChatMessageORM.chat_turn_id.desc() if order_desc else ChatMessageORM.chat_turn_id.asc()
+        ).limit(limit).offset(offset)
+
+        with self._session() as session:
+            rows = session.execute(stmt).all()
+
+        messages: List[ChatMessage] = []
+        for row in rows:
+            if projection == "light":
+                messages.append(self._message_from_row(row, self._light_analyze(row)))
+                continue
+            msg = self._message_from_row(row, None)
+            if lazy_analyze:
+                msg.setAnalyzeLoader(functools.partial(self.get_analyze, row.chat_turn_id))
+            messages.append(msg)
+        return messages
+
+    @staticmethod
+    def _filter_messages(
+        stmt,
+        *,
+        role: Optional[str],
+        sender_id: Optional[int],
+        after_turn_id: Optional[int],
+        turn_ids: Optional[Sequence[int]],
+    ):
+        if role is not None:
+            stmt = stmt.where(ChatMessageORM.role == role)
+        if sender_id is not None:
+            stmt = stmt.where(ChatMessageORM.sender_id == int(sender_id))
+        if after_turn_id is not None:
+            stmt = stmt.where(ChatMessageORM.chat_turn_id > int(after_turn_id))
+        if turn_ids is not None:
+            stmt = stmt.where(ChatMessageORM.chat_turn_id.in_([int(i) for i in turn_ids]))
+        return stmt
+
+    def _light_analyze(self, row: Any) -> Optional[AnalyzeResult]:
+        if self.analyze_format == "compact":
+            if row.data is None:
+                return None
+            ar = AnalyzeCodec.decode(row.data, row.codec)
+            ar.turn_id = row.chat_turn_id
+            return ar
+        if row.ar_turn_id is None:
+            return None
+        return AnalyzeResult(
+            turn_id=row.ar_turn_id,
+            timestamp=row.ar_timestamp,
+            media_type=row.media_type,
+            schema_version=row.schema_version,
+            keywords=row.keywords or [],
+            normalized_text=row.normalized_text,
+            is_question=row.is_question,
+            is_self_reference=row.is_self_reference,
+            emotion_cues=row.emotion_cues or [],
+        )
 
-            rows = session.execute(stmt).scalars().all()
-            return [self._chat_to_dataclass(r) for r in rows]
+    # =========================
+    # Count / Stats（COUNT(*) 聚合，不加载行）
+    # =========================
+    def count_messages(self, *, role: Optional[str] = None, sender_id: Optional[int] = None) -> int:
+        with self._session() as session:
+            stmt = select(func.count()).select_from(ChatMessageORM)
+            if role is not None:
+                stmt = stmt.where(ChatMessageORM.role == role)
+            if sender_id is not None:
+                stmt = stmt.where(ChatMessageORM.sender_id == int(sender_id))
+            return int(session.execute(stmt).scalar_one())
+
+    def message_stats(self) -> Dict[str, Any]:
+        """
+        返回：
+        - by_sender: [{role, sender_id, sender_name, count}]（按 role, sender_id 分组）
+        - oldest_timestamp / newest_timestamp: 毫秒时间戳，空表为 None
+        """
+        with self._session() as session:
+            rows = session.execute(
+                select(
+                    ChatMessageORM.role,
+                    ChatMessageORM.sender_id,
+                    func.max(ChatMessageORM.sender_name),
+                    func.count(),
+                )
+                .group_by(ChatMessageORM.role, ChatMessageORM.sender_id)
+                .order_by(ChatMessageORM.role, ChatMessageORM.sender_id)
+            ).all()
+            oldest, newest = session.execute(
+                select(func.min(ChatMessageORM.timestamp), func.max(ChatMessageORM.timestamp))
+            ).one()
+
+        return {
+            "by_sender": [
+                {"role": role, "sender_id": sender_id, "sender_name": sender_name, "count": int(count)}
+                for role, sender_id, sender_name, count in rows
+            ],
+            "oldest_timestamp": oldest,
+            "newest_timestamp": newest,
+        }
 
     # =========================
     # Delete
@@ -272,12 +619,17 @@ class ChatCrud:
         删除 ChatMessage；AnalyzeResult 会 CASCADE 自动删除
         """
         with self._session() as session:
-            row = session.get(ChatMessageORM, chat_turn_id)
-            if row is None:
-                return False
-            session.delete(row)
+            ok = self.delete_message_in(session, chat_turn_id)
             session.commit()
-            return True
+            return ok
+
+    def delete_message_in(self, session: SASession, chat_turn_id: int) -> bool:
+        row = session.get(ChatMessageORM, chat_turn_id)
+        if row is None:
+            return False
+        session.delete(row)
+        session.flush()
+        return True
 
     # =========================
     # Optional helpers
@@ -288,27 +640,130 @@ class ChatCrud:
         - 若已有 analyze_result：覆盖（先删旧再插新）
         """
         with self._session() as session:
-            chat_row = session.get(ChatMessageORM, chat_turn_id)
-            if chat_row is None:
-                return False
+            ok = self.attach_or_replace_analyze_in(session, chat_turn_id, ar)
+            session.commit()
+            return ok
 
-            # 删除旧（如果存在）
-            if chat_row.analyze_result is not None:
-                session.delete(chat_row.analyze_result)
-                session.flush()
+    def attach_or_replace_analyze_in(self, session: SASession, chat_turn_id: int, ar: AnalyzeResult) -> bool:
+        chat_row = session.get(ChatMessageORM, chat_turn_id)
+        if chat_row is None:
+            return False
 
-            ar_row = self._analyze_to_orm(ar, turn_id=chat_turn_id)
-            session.add(ar_row)
-            session.commit()
-            return True
+        # 删除旧（如果存在，两种格式都清掉）
+        self._remove_analyze_in(session, chat_turn_id)
+        session.expire(chat_row)
+
+        self._add_analyze_in(session, chat_turn_id, ar)
+        session.flush()
+        return True
 
     def remove_analyze(self, chat_turn_id: int) -> bool:
         """删除某条消息的 AnalyzeResult（提醒：消息本身不删）"""
         with self._session() as session:
-            stmt = select(AnalyzeResultORM).where(AnalyzeResultORM.turn_id == chat_turn_id)
-            ar_row = session.execute(stmt).scalar_one_or_none()
-            if ar_row is None:
-                return False
-            session.delete(ar_row)
+            removed = self._remove_analyze_in(session, chat_turn_id)
+            session.commit()
+            return removed
+
+    def find_turn_ids(self, term: str, *, kind: Optional[str] = None, limit: int = 50) -> List[int]:
+        """
+        通过侧索引按实体 / 关键词反查消息（compact 格式且 analyze_index=True 时才有数据），新的在前
+        """
+        with self._session() as session:
+            stmt = select(AnalyzeIndexORM.turn_id).where(AnalyzeIndexORM.term == term)
+            if kind is not None:
+                stmt = stmt.where(AnalyzeIndexORM.kind == kind)
+            stmt = stmt.distinct().order_by(AnalyzeIndexORM.turn_id.desc()).limit(limit)
+            return [int(x) for x in session.execute(stmt).scalars().all()]
+
+    # =========================
+    # Migration
+    # =========================
+    def migrate_analyze_format(self, to: str, *, batch_size: int = 200) -> int:
+        """
+        在两种存储格式之间迁移已有数据，每批一个事务；返回迁移的消息数。
+        可重复执行：只处理仍以源格式存储的行
+        """
+        if to not in self.FORMATS:
+            raise ValueError(f"Unsupported analyze_format: {to}")
+        migrated = 0
+        while True:
+            with self._session() as session:
+                if to == "compact":
+                    rows = session.execute(
+                        select(AnalyzeResultORM)
+                        .options(
+                            selectinload(AnalyzeResultORM.entities),
+                            selectinload(AnalyzeResultORM.relations),
+                            selectinload(AnalyzeResultORM.frames).selectinload(FrameORM.arguments),
+                        )
+                        .order_by(AnalyzeResultORM.turn_id)
+                        .limit(batch_size)
+                    ).scalars().all()
+                    items = [(r.turn_id, self._analyze_to_dataclass(r)) for r in rows]
+                else:
+                    blobs = session.execute(
+                        select(AnalyzeBlobORM).order_by(AnalyzeBlobORM.turn_id).limit(batch_size)
+                    ).scalars().all()
+                    items = [(b.turn_id, AnalyzeCodec.decode(b.data, b.codec)) for b in blobs]
+
+                if not items:
+                    return migrated
+                for turn_id, ar in items:
+                    self._remove_analyze_in(session, turn_id, keep_evidence=True)
+                    self._add_analyze_in(session, turn_id, ar, fmt=to)
+                session.commit()
+                migrated += len(items)
+
+    def offload_raw_evidence(self, *, batch_size: int = 200) -> int:
+        """
+        把旧数据中仍内嵌在 raw 里的 raw_offload_keys 剥离到 analyze_raw_evidence，并按保留期裁剪；
+        两种格式的行都会处理，返回处理的消息数
+        """
+        if not self.raw_offload_keys:
+            return 0
+        processed = 0
+
+        # normalized：用 json_extract 只挑出还带着这些 key 的行
+        has_key = [func.json_extract(AnalyzeResultORM.raw, f"$.{k}").is_not(None) for k in self.raw_offload_keys]
+        while True:
+            with self._session() as session:
+                rows = session.execute(
+                    select(AnalyzeResultORM).where(or_(*has_key)).order_by(AnalyzeResultORM.turn_id).limit(batch_size)
+                ).scalars().all()
+                if not rows:
+                    break
+                for row in rows:
+                    raw = dict(row.raw or {})
+                    evidence = {k: raw.pop(k) for k in self.raw_offload_keys if k in raw}
+                    row.raw = raw
+                    self._store_evidence_in(session, row.turn_id, evidence)
+                session.commit()
+                processed += len(rows)
+
+        # compact：blob 不可查询，按 turn_id 游标逐批解码检查
+        cursor = 0
+        while True:
+            with self._session() as session:
+                blobs = session.execute(
+                    select(AnalyzeBlobORM)
+                    .where(AnalyzeBlobORM.turn_id > cursor)
+                    .order_by(AnalyzeBlobORM.turn_id)
+                    .limit(batch_size)
+                ).scalars().all()
+                if not blobs:
+                    break
+                cursor = blobs[-1].turn_id
+                for blob in blobs:
+                    ar, evidence = self._split_raw(AnalyzeCodec.decode(blob.data, blob.codec))
+                    if not evidence:
+                        continue
+                    blob.codec = AnalyzeCodec.CODEC
+                    blob.data = AnalyzeCodec.encode(ar)
+                    self._store_evidence_in(session, blob.turn_id, evidence)
+                    processed += 1
+                session.commit()
+
+        with self._session() as session:
+            self.prune_raw_evidence_in(session)
             session.commit()
-            return True
+        return processed
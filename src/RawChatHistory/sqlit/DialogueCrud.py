@@ -1,10 +1,11 @@
 from typing import Optional, List, Union, Type
-from sqlalchemy import select, update
+from sqlalchemy import func, select, update
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session as SASession
 from sqlalchemy.orm import sessionmaker
 
 from DataClass.DialogueMessage import DialogueMessage
+from RawChatHistory.sqlit.FtsIndex import FtsIndex
 from RawChatHistory.sqlit.SqiltModel import Base, DialogueMessageORM
 
 
@@ -13,9 +14,11 @@ SessionFactory = Union[Type[SASession], sessionmaker]
 
 class DialogueCrud:
 
-    def __init__(self, engine: Engine, SessionLocal: SessionFactory):
+    def __init__(self, engine: Engine, SessionLocal: SessionFactory, fts: Optional[FtsIndex] = None):
         self.engine = engine
         self.SessionLocal = SessionLocal
+        # 全文索引在写入的同一个 session 里维护（None 表示未启用）
+        self.fts = fts
 
     def _session(self) -> SASession:
         if isinstance(self.SessionLocal, sessionmaker):
@@ -55,11 +58,18 @@ class DialogueCrud:
     def create(self, dm: DialogueMessage) -> int:
         """新建对话"""
         with self._session() as session:
-            row = self._to_orm(dm)
-            session.add(row)
+            dialogue_id = self.create_in(session, dm)
             session.commit()
-            session.refresh(row)
-            return int(row.dialogue_id)
+            return dialogue_id
+
+    def create_in(self, session: SASession, dm: DialogueMessage) -> int:
+        """在调用方的 session 中新建（不 commit），供 SqliteWriter 组提交使用"""
+        row = self._to_orm(dm)
+        session.add(row)
+        session.flush()
+        if self.fts is not None:
+            self.fts.index_dialogue_in(session, int(row.dialogue_id))
+        return int(row.dialogue_id)
 
     def get(self, dialogue_id: int) -> Optional[DialogueMessage]:
         with self._session() as session:
@@ -77,19 +87,27 @@ class DialogueCrud:
 
             return [self._to_dataclass(r) for r in rows]
 
+    def count(self) -> int:
+        with self._session() as session:
+            return int(session.execute(select(func.count()).select_from(DialogueMessageORM)).scalar_one())
+
     def mark_completed(self, dialogue_id: int, end_turn_id: int) -> bool:
         """结束对话"""
         with self._session() as session:
-            res = session.execute(
-                update(DialogueMessageORM)
-                .where(DialogueMessageORM.dialogue_id == dialogue_id)
-                .values(
-                    is_completed=True,
-                    end_turn_id=end_turn_id,
-                )
-            )
+            ok = self.mark_completed_in(session, dialogue_id, end_turn_id)
             session.commit()
-            return (res.rowcount or 0) > 0 # type: ignore
+            return ok
+
+    def mark_completed_in(self, session: SASession, dialogue_id: int, end_turn_id: int) -> bool:
+        res = session.execute(
+            update(DialogueMessageORM)
+            .where(DialogueMessageORM.dialogue_id == dialogue_id)
+            .values(
+                is_completed=True,
+                end_turn_id=end_turn_id,
+            )
+        )
+        return (res.rowcount or 0) > 0 # type: ignore
 
     def update_summary(
         self,
@@ -100,21 +118,39 @@ class DialogueCrud:
         emotion_cues: Optional[list] = None,
     ) -> bool:
         with self._session() as session:
-            values = {"summary": summary}
-            if entities is not None:
-                values["entities"] = entities
-            if keywords is not None:
-                values["keywords"] = keywords
-            if emotion_cues is not None:
-                values["emotion_cues"] = emotion_cues
-
-            res = session.execute(
-                update(DialogueMessageORM)
-                .where(DialogueMessageORM.dialogue_id == dialogue_id)
-                .values(**values)
+            ok = self.update_summary_in(
+                session, dialogue_id, summary,
+                entities=entities, keywords=keywords, emotion_cues=emotion_cues,
             )
             session.commit()
-            return (res.rowcount or 0) > 0 # type: ignore
+            return ok
+
+    def update_summary_in(
+        self,
+        session: SASession,
+        dialogue_id: int,
+        summary: str,
+        entities: Optional[list] = None,
+        keywords: Optional[list] = None,
+        emotion_cues: Optional[list] = None,
+    ) -> bool:
+        values = {"summary": summary}
+        if entities is not None:
+            values["entities"] = entities
+        if keywords is not None:
+            values["keywords"] = keywords
+        if emotion_cues is not None:
+            values["emotion_cues"] = emotion_cues
+
+        res = session.execute(
+            update(DialogueMessageORM)
+            .where(DialogueMessageORM.dialogue_id == dialogue_id)
+            .values(**values)
+        )
+        ok = (res.rowcount or 0) > 0 # type: ignore
+        if ok and self.fts is not None:
+            self.fts.index_dialogue_in(session, dialogue_id)
+        return ok
 
     def delete(self, dialogue_id: int) -> bool:
         with self._session() as session:
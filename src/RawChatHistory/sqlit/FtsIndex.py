@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+
+class FtsIndex:
+    """
+    chat_messages / dialogue_messages 的 SQLite FTS5 全文索引（BM25 排序）：
+    - 中文没有空格分词，unicode61 会把整段汉字当成一个词；这里在写入时用 bigram() 把汉字串切成二元组，
+      英文 / 数字按词小写保留，索引列存的是空格分隔的切分结果
+    - 切分在 Python 里做：ChatCrud / DialogueCrud 的 *_in 写方法在写入者的同一个 session 里调用
+      index_message_in / index_dialogue_in，与数据行一起提交；库里只有删除触发器（纯 SQL，不依赖自定义函数），
+      其他客户端（sqlite3 命令行、备份脚本等）照常读写这张库
+    - 其他客户端新增的行不会立刻进索引：create()（每次启动）会补齐缺失的行；
+      它们对已有行的修改、或切分规则变化后，需要调用 rebuild() 全量重建
+    - 查询同样切成二元组，用 OR 连接交给 MATCH，bm25() 排序（SQLite 中越小越相关，这里取反作为 score）
+
+    限制：单个汉字只在孤立出现时被索引为一元组，单字查询基本匹配不到
+    """
+
+    MESSAGE_TABLE = "chat_messages_fts"
+    DIALOGUE_TABLE = "dialogue_messages_fts"
+
+    _RUN_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[0-9a-z]+")
+
+    _SCHEMA = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {MESSAGE_TABLE} USING fts5(terms, tokenize='unicode61')",
+        f"""CREATE TRIGGER IF NOT EXISTS {MESSAGE_TABLE}_ad AFTER DELETE ON chat_messages BEGIN
+            DELETE FROM {MESSAGE_TABLE} WHERE rowid = old.chat_turn_id;
+        END""",
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {DIALOGUE_TABLE} USING fts5(terms, tokenize='unicode61')",
+        f"""CREATE TRIGGER IF NOT EXISTS {DIALOGUE_TABLE}_ad AFTER DELETE ON dialogue_messages BEGIN
+            DELETE FROM {DIALOGUE_TABLE} WHERE rowid = old.dialogue_id;
+        END""",
+    ]
+
+    # 旧版本的插入 / 更新触发器调用自定义函数 fts_bigram，其他客户端写入时会报 no such function
+    _LEGACY_TRIGGERS = [
+        f"{MESSAGE_TABLE}_ai", f"{MESSAGE_TABLE}_au",
+        f"{DIALOGUE_TABLE}_ai", f"{DIALOGUE_TABLE}_au",
+    ]
+
+    # 各索引表的数据来源：(主键列, 查询)
+    _SOURCES = {
+        MESSAGE_TABLE: ("chat_turn_id", "SELECT chat_turn_id, content FROM chat_messages"),
+        DIALOGUE_TABLE: ("dialogue_id", "SELECT dialogue_id, summary, keywords, entities FROM dialogue_messages"),
+    }
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+
+    # ---------------- 切分 ----------------
+
+    @classmethod
+    def terms(cls, value: Optional[str]) -> List[str]:
+        """汉字串 -> 二元组（单字串保留单字），英文 / 数字 -> 小写整词"""
+        out: List[str] = []
+        for run in cls._RUN_RE.findall((value or "").lower()):
+            if run[0].isascii() or len(run) == 1:
+                out.append(run)
+            else:
+                out.extend(run[i:i + 2] for i in range(len(run) - 1))
+        return out
+
+    @classmethod
+    def bigram(cls, value: Optional[str]) -> str:
+        return " ".join(cls.terms(value))
+
+    @classmethod
+    def build_match(cls, texts: Iterable[str], max_terms: int = 64) -> str:
+        """把若干查询文本切分、去重后拼成 FTS5 MATCH 表达式（OR），没有可用词时返回空串"""
+        seen: Dict[str, None] = {}
+        for t in texts:
+            for term in cls.terms(t):
+                if len(seen) >= max_terms:
+                    break
+                seen.setdefault(term, None)
+        return " OR ".join(f'"{term}"' for term in seen)
+
+    @staticmethod
+    def _json_text(value: Any) -> str:
+        """JSON 列在库里默认是 ASCII 转义（\\uXXXX），还原成原文再切分"""
+        if value is None:
+            return ""
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                return value
+        return json.dumps(value, ensure_ascii=False)
+
+    @classmethod
+    def _row_terms(cls, table: str, row: Any) -> str:
+        if table == cls.MESSAGE_TABLE:
+            return cls.bigram(row[1])
+        return cls.bigram(" ".join([row[1] or "", cls._json_text(row[2]), cls._json_text(row[3])]))
+
+    # ---------------- 写入 ----------------
+
+    @classmethod
+    def _index(cls, conn: Any, table: str, *, rowid: Optional[int] = None, missing_only: bool = False) -> int:
+        """
+        按数据表重写索引行：rowid 给定时只处理这一行，missing_only 时只补索引里没有的行；
+        conn 可以是 Connection 也可以是 ORM Session（写入者的事务内）
+        """
+        key, sql = cls._SOURCES[table]
+        params: Dict[str, Any] = {}
+        if rowid is not None:
+            sql += f" WHERE {key} = :rowid"
+            params["rowid"] = int(rowid)
+            conn.execute(text(f"DELETE FROM {table} WHERE rowid = :rowid"), params)
+        elif missing_only:
+            sql += f" WHERE {key} NOT IN (SELECT rowid FROM {table})"
+        rows = [{"rowid": r[0], "terms": cls._row_terms(table, r)} for r in conn.execute(text(sql), params)]
+        if rows:
+            conn.execute(text(f"INSERT INTO {table}(rowid, terms) VALUES (:rowid, :terms)"), rows)
+        return len(rows)
+
+    def index_message_in(self, session: Any, chat_turn_id: int) -> None:
+        """在调用方的 session 中（重新）索引一条消息，随数据行一起提交"""
+        self._index(session, self.MESSAGE_TABLE, rowid=chat_turn_id)
+
+    def index_dialogue_in(self, session: Any, dialogue_id: int) -> None:
+        """在调用方的 session 中（重新）索引一条对话摘要"""
+        self._index(session, self.DIALOGUE_TABLE, rowid=dialogue_id)
+
+    # ---------------- 建表 ----------------
+
+    def create(self) -> None:
+        """建 FTS 表与删除触发器，清掉旧版触发器，并补齐索引里缺失的行（新建的表 / 其他客户端写入的行）"""
+        with self.engine.begin() as conn:
+            for name in self._LEGACY_TRIGGERS:
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            for stmt in self._SCHEMA:
+                conn.execute(text(stmt))
+            for table in self._SOURCES:
+                n = self._index(conn, table, missing_only=True)
+                if n:
+                    logger.info(f"FtsIndex backfilled {n} rows into {table}")
+
+    def rebuild(self) -> None:
+        """
+        丢弃索引内容并按当前数据重建：切分规则变化后，或其他客户端修改过已有行（create() 只补缺失的行）后使用
+        """
+        with self.engine.begin() as conn:
+            for table in self._SOURCES:
+                conn.execute(text(f"DELETE FROM {table}"))
+                self._index(conn, table)
+
+    # ---------------- 查询 ----------------
+
+    def search_messages(
+        self,
+        match: str,
+        *,
+        limit: int = 10,
+        before_turn_id: Optional[int] = None,
+        role: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        返回 dict 列表（chat_turn_id / role / sender_name / sender_id / content / timestamp / timedate / score），
+        score 越大越相关；before_turn_id 用于排除已经在上下文里的最近消息
+        """
+        if not match:
+            return []
+        sql = (
+            f"SELECT m.chat_turn_id, m.role, m.sender_name, m.sender_id, m.content, m.timestamp, m.timedate, "
+            f"-bm25({self.MESSAGE_TABLE}) AS score "
+            f"FROM {self.MESSAGE_TABLE} JOIN chat_messages m ON m.chat_turn_id = {self.MESSAGE_TABLE}.rowid "
+            f"WHERE {self.MESSAGE_TABLE} MATCH :match"
+        )
+        params: Dict[str, Any] = {"match": match, "limit": int(limit)}
+        if before_turn_id is not None:
+            sql += " AND m.chat_turn_id < :before"
+            params["before"] = int(before_turn_id)
+        if role is not None:
+            sql += " AND m.role = :role"
+            params["role"] = role
+        sql += " ORDER BY score DESC LIMIT :limit"
+        with self.engine.connect() as conn:
+            return [dict(r._mapping) for r in conn.execute(text(sql), params)]
+
+    def search_dialogues(self, match: str, *, limit: int = 10) -> List[Dict[str, Any]]:
+        """返回 dict 列表（dialogue_id / start_turn_id / end_turn_id / summary / score）"""
+        if not match:
+            return []
+        sql = (
+            f"SELECT d.dialogue_id, d.start_turn_id, d.end_turn_id, d.summary, "
+            f"-bm25({self.DIALOGUE_TABLE}) AS score "
+            f"FROM {self.DIALOGUE_TABLE} JOIN dialogue_messages d ON d.dialogue_id = {self.DIALOGUE_TABLE}.rowid "
+            f"WHERE {self.DIALOGUE_TABLE} MATCH :match ORDER BY score DESC LIMIT :limit"
+        )
+        with self.engine.connect() as conn:
+            return [dict(r._mapping) for r in conn.execute(text(sql), {"match": match, "limit": int(limit)})]
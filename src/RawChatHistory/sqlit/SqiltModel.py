@@ -9,6 +9,7 @@ from sqlalchemy import (
     Index,
     Integer,
     BigInteger,
+    LargeBinary,
     String,
     Text,
     event,
@@ -80,6 +81,14 @@ class ChatMessageORM(Base):
         passive_deletes=True,
     )
 
+    # compact 存储格式：整个 AnalyzeResult 压缩为一行 blob（与 analyze_result 二选一）
+    analyze_blob: Mapped[Optional["AnalyzeBlobORM"]] = relationship(
+        back_populates="chat_message",
+        uselist=False,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
 
 Index("ix_chat_messages_role_time", ChatMessageORM.role, ChatMessageORM.timestamp)
 Index("ix_chat_messages_sender_time", ChatMessageORM.sender_id, ChatMessageORM.timestamp)
@@ -214,3 +223,56 @@ class RelationORM(Base):
 
 Index("ix_entities_result_eid", EntityORM.analyze_result_id, EntityORM.eid, unique=False)
 Index("ix_relations_spo", RelationORM.subject, RelationORM.relation, RelationORM.obj, unique=False)
+
+
+class AnalyzeBlobORM(Base):
+    """
+    compact 存储格式：一条消息的 AnalyzeResult 整体编码为一个 blob（见 AnalyzeCodec）
+    读写都只涉及一行，配合 joinedload 随消息一次查询取回
+    """
+    __tablename__ = "analyze_blobs"
+
+    turn_id: Mapped[int] = mapped_column(
+        ForeignKey("chat_messages.chat_turn_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    codec: Mapped[str] = mapped_column(String(16), default="zlib-json")
+    schema_version: Mapped[str] = mapped_column(String(32), default="analyze_v1")
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+
+    chat_message: Mapped["ChatMessageORM"] = relationship(back_populates="analyze_blob")
+
+
+class AnalyzeIndexORM(Base):
+    """
+    compact 格式的可选侧索引：按实体文本 / 关键词反查消息
+    """
+    __tablename__ = "analyze_index"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    turn_id: Mapped[int] = mapped_column(
+        ForeignKey("chat_messages.chat_turn_id", ondelete="CASCADE"),
+        index=True,
+        nullable=False,
+    )
+    kind: Mapped[str] = mapped_column(String(16))  # entity|keyword
+    term: Mapped[str] = mapped_column(Text)
+
+
+Index("ix_analyze_index_kind_term", AnalyzeIndexORM.kind, AnalyzeIndexORM.term, unique=False)
+
+
+class AnalyzeRawEvidenceORM(Base):
+    """
+    从 AnalyzeResult.raw 中剥离出来的大块原始证据（如 raw["ltp"] 的完整 pipeline 输出）
+    - 压缩存储，历史读取不加载；需要时按 turn_id 单独读取
+    - 只保留最近 N 条（retention），库大小不随解析器调试输出线性增长
+    """
+    __tablename__ = "analyze_raw_evidence"
+
+    turn_id: Mapped[int] = mapped_column(
+        ForeignKey("chat_messages.chat_turn_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    codec: Mapped[str] = mapped_column(String(16), default="zlib-json")
+    data: Mapped[bytes] = mapped_column(LargeBinary)
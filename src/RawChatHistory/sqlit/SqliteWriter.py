@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from loguru import logger
+from sqlalchemy.orm import Session
+
+
+WriteJob = Callable[[Session], Any]
+
+
+@dataclass
+class _WriteRequest:
+    job: WriteJob
+    future: Future = field(default_factory=Future)
+
+
+class SqliteWriter:
+    """
+    SQLite 单写线程 + 组提交：
+    - SQLite 同一时刻只允许一个写事务，所有写操作都交给一个工作线程串行执行，避免 database is locked
+    - 收到第一个写请求后在 max_wait_ms 窗口内继续收集，一批写入共用一个 session、一次 commit（一次 fsync）
+    - 每个写请求是 job(session) -> result，commit 成功后才通过 Future 返回结果（如自增 id）
+    - 整批 commit 失败时回滚，并逐个单独重试，坏请求只影响自己
+
+    job 内只能 add / flush / execute，不要自行 commit
+
+    **kwargs 参数说明**:
+    - db_writer_max_batch: 单次组提交的最大写请求数
+    - db_writer_max_wait_ms: 收到第一个请求后最多等待多久再提交（毫秒）
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], **kwargs):
+        self.session_factory = session_factory
+        self.max_batch_size = max(1, int(kwargs.get("db_writer_max_batch", 64)))
+        self.max_wait = max(0.0, float(kwargs.get("db_writer_max_wait_ms", 2))) / 1000.0
+
+        self._queue: queue.Queue[_WriteRequest | None] = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="SqliteWriter", daemon=True)
+        self._worker.start()
+
+    def submit(self, job: WriteJob) -> Future:
+        if self._closed:
+            raise RuntimeError("SqliteWriter is closed")
+        req = _WriteRequest(job=job)
+        self._queue.put(req)
+        return req.future
+
+    def run(self, job: WriteJob, timeout: float | None = None) -> Any:
+        """阻塞调用：提交并等待 commit 完成，返回 job 的结果"""
+        return self.submit(job).result(timeout=timeout)
+
+    def flush(self, timeout: float | None = None) -> None:
+        """等待此前提交的写请求全部落盘"""
+        self.run(lambda session: None, timeout=timeout)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join(timeout=5)
+
+    # ---------------- worker ----------------
+
+    def _collect(self, first: _WriteRequest) -> tuple[list[_WriteRequest], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                req = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if req is None:
+                return batch, True
+            batch.append(req)
+        return batch, False
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stop = self._collect(first)
+            self._run_batch(batch)
+
+        # 关闭信号之后仍在队列里的请求照常写完，保证已返回 Future 的写入不丢
+        leftovers: list[_WriteRequest] = []
+        while True:
+            try:
+                req = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if req is not None:
+                leftovers.append(req)
+        if leftovers:
+            self._run_batch(leftovers)
+
+    def _run_batch(self, batch: list[_WriteRequest]) -> None:
+        start = time.perf_counter()
+        try:
+            with self.session_factory() as session:
+                results = [req.job(session) for req in batch]
+                session.commit()
+        except Exception as e:
+            if len(batch) == 1:
+                logger.exception(f"SqliteWriter write failed: {e}")
+                batch[0].future.set_exception(e)
+                return
+            logger.warning(f"SqliteWriter group commit of {len(batch)} failed, retrying one by one: {e}")
+            for req in batch:
+                self._run_batch([req])
+            return
+
+        logger.debug(
+            f"SqliteWriter committed {len(batch)} writes in {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+        for req, result in zip(batch, results):
+            req.future.set_result(result)
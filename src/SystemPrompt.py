@@ -10,35 +10,44 @@ from pathlib import Path
 class SystemPrompt:
     def __init__(self):
         self.prompt_map: dict[str, PromptTemplate] = {}
+        # 每次加载模板 +1，供上层做缓存失效判断
+        self.version = 0
+        self.yaml_path = Path(__file__).resolve().parents[1] / "config" / "system_prompt.yaml"
         self.load_template()
 
     def load_template(self):
+        """
+        加载 / 重新加载模板：先在局部 dict 中解析完整，再一次赋值替换 prompt_map，
+        并发读取方要么看到旧模板、要么看到新模板；解析失败时保留旧模板
+        """
         # Try to load from YAML first; fall back to builders when missing
-        yaml_path = Path(__file__).resolve().parents[1] / "config" / "system_prompt.yaml"
-        if yaml_path.exists():
-            try:
-                raw = yaml.safe_load(yaml_path.read_text(encoding="utf-8")) or {}
-                prompts = raw.get("prompts", {})
-                for key, p in prompts.items():
-                    name = p.get("name", key)
-                    template = p.get("template", "")
-                    # normalize indentation
-                    template = textwrap.dedent(template).strip()
-                    required_fields = p.get("required_fields", [])
-                    output_schema = p.get("output_schema", {})
-                    lines = p.get("lines", []) or []
-                    self.prompt_map[name] = PromptTemplate(
-                        name=name,
-                        template=template,
-                        required_fields=required_fields,
-                        output_schema=output_schema,
-                        lines=lines,
-                    )
-                # If loaded from YAML, return early
-                if self.prompt_map:
-                    return
-            except Exception:
-                # on any YAML error, fallback to original builders
-                pass
+        if not self.yaml_path.exists():
+            return
+        try:
+            raw = yaml.safe_load(self.yaml_path.read_text(encoding="utf-8")) or {}
+            prompts = raw.get("prompts", {})
+            prompt_map: dict[str, PromptTemplate] = {}
+            for key, p in prompts.items():
+                name = p.get("name", key)
+                template = p.get("template", "")
+                # normalize indentation
+                template = textwrap.dedent(template).strip()
+                required_fields = p.get("required_fields", [])
+                output_schema = p.get("output_schema", {})
+                lines = p.get("lines", []) or []
+                prompt_map[name] = PromptTemplate(
+                    name=name,
+                    template=template,
+                    required_fields=required_fields,
+                    output_schema=output_schema,
+                    lines=lines,
+                )
+        except Exception:
+            # on any YAML error, keep the previously loaded templates
+            return
+        if prompt_map:
+            self.prompt_map = prompt_map
+            self.version += 1
+
     def getPrompt(self, prompt_name: str) -> PromptTemplate:
-        return self.prompt_map[prompt_name]
\ No newline at end of file
+        return self.prompt_map[prompt_name]
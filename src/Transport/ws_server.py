@@ -3,6 +3,8 @@ WebSocket server to integrate with Alice.
 
 - Broadcasts selected EventBus events to connected WS clients.
 - Receives messages from clients and forwards them to `alice.respond(...)`.
+- With `"stream": true` the reply is forwarded incrementally via `alice.respond_stream(...)`.
+- `{"type": "stats"}` returns `alice.getStats()` (history counts, DB size, cache hit rates).
 
 Usage:
     from Transport.ws_server import start_ws_server
@@ -31,6 +33,11 @@ async def _client_handler(ws, alice):
         Expect client to send JSON objects like:
             {"type":"user_input","content":"...","sender_name":"aki","sender_id":1}
         or  {"type":"user_input","content":"...","sender": {"name":"aki","id":1}}
+        Add "stream": true to receive incremental frames:
+            {"type":"assistant_delta","content":"..."}  (0..n times)
+            {"type":"assistant_done","content":"<full reply>"}
+        Stats query:
+            {"type":"stats"}  ->  {"type":"stats","data":{...}}
     """
     logger.debug(f"WS client connected: {ws.remote_address}")
     _connected.add(ws)
@@ -59,6 +66,10 @@ async def _client_handler(ws, alice):
                     "sender_name": sender_name,
                     "sender_id": sender_id,
                 }
+                if data.get("stream"):
+                    await _stream_response(ws, alice, user_inputs)
+                    continue
+
                 try:
                     # call alice.respond asynchronously
                     resp = await alice.respond(user_inputs)
@@ -68,6 +79,8 @@ async def _client_handler(ws, alice):
 
                 # return response to client
                 # await ws.send(json.dumps({"type": "assistant_response", "content": resp}, ensure_ascii=False))
+            elif msg_type == "stats":
+                await _send_stats(ws, alice)
             else:
                 # unknown type: echo
                 await ws.send(json.dumps({"type": "error", "message": "unknown type"}))
@@ -77,6 +90,31 @@ async def _client_handler(ws, alice):
         _connected.discard(ws)
 
 
+async def _stream_response(ws, alice, user_inputs: dict[str, Any]) -> None:
+    """Forward `alice.respond_stream` deltas as incremental frames, then a final done frame."""
+    parts: list[str] = []
+    try:
+        async for delta in alice.respond_stream(user_inputs):
+            parts.append(delta)
+            await ws.send(json.dumps({"type": "assistant_delta", "content": delta}, ensure_ascii=False))
+    except websockets.exceptions.ConnectionClosed:
+        raise
+    except Exception as e:
+        logger.exception(f"alice.respond_stream failed: {e}")
+    await ws.send(json.dumps({"type": "assistant_done", "content": "".join(parts)}, ensure_ascii=False))
+
+
+async def _send_stats(ws, alice) -> None:
+    """Reply with `alice.getStats()`; the DB queries run in a worker thread."""
+    try:
+        stats = await asyncio.to_thread(alice.getStats)
+    except Exception as e:
+        logger.exception(f"alice.getStats failed: {e}")
+        await ws.send(json.dumps({"type": "error", "message": "stats unavailable"}))
+        return
+    await ws.send(json.dumps({"type": "stats", "data": stats}, ensure_ascii=False, default=_json_default))
+
+
 def _json_default(obj: Any):
     # Best-effort conversion for event payloads (ChatMessage, dataclasses, etc.)
     if hasattr(obj, "to_dict") and callable(getattr(obj, "to_dict")):
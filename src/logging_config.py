@@ -76,10 +76,11 @@ def _log_timing(name: str, elapsed_ms: float, level: str = "INFO"):
 def timeit_logger(name: str | None = None, level: str = "INFO"):
     """装饰器：记录函数执行时间并通过 loguru 输出。
 
-    支持同步和异步函数。
+    支持同步、异步函数以及异步生成器（计时覆盖到生成器耗尽为止）。
     """
     def decorator(func):
         is_coro = inspect.iscoroutinefunction(func)
+        is_async_gen = inspect.isasyncgenfunction(func)
 
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
@@ -99,6 +100,18 @@ def timeit_logger(name: str | None = None, level: str = "INFO"):
                 elapsed = (time.perf_counter() - start) * 1000
                 _log_timing(name or f"{func.__module__}.{func.__qualname__}", elapsed, level)
 
+        @wraps(func)
+        async def async_gen_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                async for item in func(*args, **kwargs):
+                    yield item
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                _log_timing(name or f"{func.__module__}.{func.__qualname__}", elapsed, level)
+
+        if is_async_gen:
+            return async_gen_wrapper
         return async_wrapper if is_coro else sync_wrapper
 
     return decorator
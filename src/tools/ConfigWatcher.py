@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+
+class ConfigWatcher:
+    """
+    配置文件热更新：后台守护线程按固定间隔轮询文件 mtime，变化后调用注册的回调。
+    - 只依赖 os.stat，不引入 watchdog 等额外依赖；配置文件很少，轮询开销可以忽略
+    - 回调在监视线程中执行，回调内部应自行保证“先构建、再一次赋值替换”
+    - 回调抛出的异常只记录日志，不影响其他回调与后续轮询
+
+    **kwargs 参数说明**:
+    - config_watch_interval: 轮询间隔（秒）
+    """
+
+    def __init__(self, **kwargs):
+        self.interval = max(0.1, float(kwargs.get("config_watch_interval", 2.0)))
+        self._callbacks: Dict[str, List[Callable[[], None]]] = {}
+        self._mtimes: Dict[str, Optional[float]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, path: str, callback: Callable[[], None]) -> None:
+        """注册文件与回调；同一文件可注册多个回调，按注册顺序执行"""
+        path = os.path.abspath(path)
+        with self._lock:
+            if path not in self._callbacks:
+                self._callbacks[path] = []
+                self._mtimes[path] = self._mtime(path)
+            self._callbacks[path].append(callback)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ConfigWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1.0)
+            self._thread = None
+
+    def poll(self) -> List[str]:
+        """
+        检查一次所有文件，返回发生变化的路径（监视线程每个间隔调用一次，也便于测试直接调用）
+        """
+        with self._lock:
+            items = [(path, list(cbs)) for path, cbs in self._callbacks.items()]
+
+        changed: List[str] = []
+        for path, callbacks in items:
+            mtime = self._mtime(path)
+            # 文件暂时不存在（编辑器保存时的替换过程）不算变化，等它重新出现
+            if mtime is None or mtime == self._mtimes.get(path):
+                continue
+            self._mtimes[path] = mtime
+            changed.append(path)
+            logger.info(f"ConfigWatcher detected change: {path}")
+            for cb in callbacks:
+                try:
+                    cb()
+                except Exception as e:
+                    logger.exception(f"ConfigWatcher callback failed for {path}: {e}")
+        return changed
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    @staticmethod
+    def _mtime(path: str) -> Optional[float]:
+        try:
+            return os.stat(path).st_mtime_ns / 1e9
+        except OSError:
+            return None
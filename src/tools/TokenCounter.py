@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import math
+import re
+
+
+class TokenCounter:
+    """
+    近似 token 计数（不依赖任何 tokenizer）：
+    - 汉字 / 全角字符按 1 个 token 计（Qwen 等中文模型大多数常用汉字是单 token）
+    - 英文 / 数字按连续串长度 / 4 向上取整
+    - 其余标点、符号各按 1 个计
+    只用于预算裁剪，结果偏保守（略多于真实值）即可
+
+    **kwargs 参数说明**（create）:
+    - token_counter: approx（默认，本类）或 transformers（用模型自己的 tokenizer 精确计数，见 TransformersTokenCounter）
+    """
+
+    name = "approx"
+
+    @staticmethod
+    def create(**kwargs) -> "TokenCounter":
+        kind = kwargs.get("token_counter", "approx")
+        if kind == "transformers":
+            from tools.TransformersTokenCounter import TransformersTokenCounter
+            return TransformersTokenCounter(**kwargs)
+        if kind == "approx":
+            return TokenCounter()
+        raise ValueError(f"Unsupported token_counter: {kind}")
+
+    _CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+    _WORD_RE = re.compile(r"[0-9A-Za-z]+")
+    _SYMBOL_RE = re.compile(r"[^\s0-9A-Za-z\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        n = len(self._CJK_RE.findall(text))
+        n += sum(math.ceil(len(w) / 4) for w in self._WORD_RE.findall(text))
+        n += len(self._SYMBOL_RE.findall(text))
+        return n
+
+    def truncate(self, text: str, max_tokens: int, suffix: str = "…") -> str:
+        """截断到不超过 max_tokens（按字符二分），被截断时追加 suffix"""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        budget = max_tokens - self.count(suffix)
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.count(text[:mid]) <= budget:
+                lo = mid
+            else:
+                hi = mid - 1
+        return text[:lo] + suffix if lo > 0 else ""
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from loguru import logger
+
+from tools.TokenCounter import TokenCounter
+
+
+class TransformersTokenCounter(TokenCounter):
+    """
+    用对话模型自己的 tokenizer（transformers AutoTokenizer，只加载分词器不加载权重）精确计数：
+    - tokenizer 在首次计数时才加载，不拖慢启动
+    - 不含 special tokens；chat template 的角色标记由 ContextPacker 按条另计
+    - truncate 直接在 token id 上截断再 decode，不走二分
+
+    **kwargs 参数说明**:
+    - tokenizer_model: 分词器名或本地路径，应与实际对话模型一致（qwen3:8b -> Qwen/Qwen3-8B）
+    """
+
+    def __init__(self, **kwargs):
+        self.model_name = kwargs.get("tokenizer_model", "Qwen/Qwen3-8B")
+        self.name = f"transformers-{self.model_name}"
+        self._tokenizer = None
+
+    def _load(self):
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            logger.info(f"TransformersTokenCounter loaded {self.model_name}")
+        return self._tokenizer
+
+    def _encode(self, text: str) -> list[int]:
+        return self._load().encode(text, add_special_tokens=False)
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return len(self._encode(text))
+
+    def truncate(self, text: str, max_tokens: int, suffix: str = "…") -> str:
+        if max_tokens <= 0:
+            return ""
+        ids = self._encode(text)
+        if len(ids) <= max_tokens:
+            return text
+        budget = max_tokens - self.count(suffix)
+        if budget <= 0:
+            return ""
+        return self._load().decode(ids[:budget]) + suffix
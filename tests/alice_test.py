@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("ltp")
+pytest.importorskip("torch")
+
+from Alice import Alice  # noqa: E402
+
+
+def _alice(intent_judge) -> SimpleNamespace:
+    return SimpleNamespace(
+        raw_history=SimpleNamespace(getStats=lambda: {}),
+        llm_management=SimpleNamespace(getCacheStats=lambda: {}),
+        assembler=SimpleNamespace(analyze_cache=SimpleNamespace(getStats=lambda: {})),
+        query_builder=SimpleNamespace(getBuilder=lambda name: intent_judge if name == "IntentJudgeL" else None),
+    )
+
+
+def test_stats_expose_intent_router_metrics():
+    metrics = {"hit_rate": 0.5, "saved_ms_est": 120.0}
+    stats = Alice.getStats(_alice(SimpleNamespace(getMetrics=lambda: metrics)))
+    assert stats["intent"] == metrics
+
+    assert Alice.getStats(_alice(None))["intent"] == {}
+
+
+class _StreamAlice(SimpleNamespace):
+    DEFAULT_ERROR_MSG = Alice.DEFAULT_ERROR_MSG
+
+    def __init__(self, deltas):
+        async def stream(messages, model):
+            for d in deltas:
+                yield d
+
+        async def prepare_turn(user_inputs, route):
+            return [], 7
+
+        async def finish_turn(response):
+            self.finished.append(response)
+            return 8
+
+        super().__init__(
+            finished=[],
+            deleted=[],
+            _prepare_turn=prepare_turn,
+            _finish_turn=finish_turn,
+            llm_management=SimpleNamespace(astream_chat=stream),
+        )
+        self.memory_system = SimpleNamespace(storage=SimpleNamespace(delete_history_by_id=self.deleted.append))
+
+
+def test_client_disconnect_mid_stream_persists_partial_reply():
+    import asyncio
+
+    async def run(fake, take):
+        gen = Alice._respond_stream(fake, {}, "full")
+        got = [await gen.__anext__() for _ in range(take)]
+        await gen.aclose()  # 客户端断开
+        return got
+
+    fake = _StreamAlice(["你", "好", "呀"])
+    assert asyncio.run(run(fake, 2)) == ["你", "好"]
+    assert fake.finished == ["你好"] and fake.deleted == []
+
+
+def test_client_disconnect_before_first_delta_drops_user_turn():
+    import asyncio
+
+    async def run():
+        fake = _StreamAlice([])
+
+        async def never(messages, model):
+            await asyncio.Event().wait()
+            yield ""
+
+        fake.llm_management.astream_chat = never
+        gen = Alice._respond_stream(fake, {}, "full")
+        task = asyncio.ensure_future(gen.__anext__())
+        await asyncio.sleep(0.01)
+        task.cancel()  # ws 连接关闭时发送任务被取消
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return fake
+
+    fake = asyncio.run(run())
+    assert fake.finished == [] and fake.deleted == [7]
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from ContextAssembler.AnalyzePromptCache import AnalyzePromptCache
+from DataClass.AnalyzeResult import AnalyzeResult, Argument, Entity, Frame, Relation
+from DataClass.ChatMessage import ChatMessage
+from DataClass.TagType import TagType
+from tools.PromptBuilder import PromptBuilder
+
+
+def _result() -> AnalyzeResult:
+    return AnalyzeResult(
+        is_question=True,
+        tokens=[["我", "r"], ["去", "v"], ["北京", "ns"]],
+        keywords=["北京"],
+        entities=[Entity(text="北京", typ="LOC")],
+        frames=[Frame(predicate="去", arguments=[Argument(role="A0", text="我"), Argument(role="A1", text="北京")])]
+        * 5,
+        relations=[Relation(subject="我", relation="plan", obj="北京")] * 8,
+    )
+
+
+def _msg(turn_id: int, anl: AnalyzeResult | None) -> ChatMessage:
+    return ChatMessage(role="user", content="我想去北京", timestamp=0, timedate="t",
+                       sender_name="aki", sender_id=1, chat_turn_id=turn_id, analyze_result=anl)
+
+
+def test_compact_prompt_caps_frames_and_relations():
+    text = _result().analyze_result_to_compact_prompt().build()
+    assert "tokens_pos" not in text
+    assert text.count("去(ARG0: 我, ARG1: 北京)") == 3
+    assert text.count("(我, plan, 北京)") == 5
+    assert len(text) < len(_result().analyze_result_to_prompt().build())
+
+
+def test_rendering_is_cached_per_turn_and_matches_nested_builder():
+    cache = AnalyzePromptCache("full", max_entries=2)
+    msg = _msg(1, _result())
+    first = cache.render(msg)
+    assert cache.render(_msg(1, _result())) == first
+    assert cache.getStats()["hits"] == 1
+
+    # 缓存文本嵌进 <ANALYZE> 与直接 include 子 builder 的渲染一致
+    b = PromptBuilder("User Message ID 1")
+    b.add(msg.buildContent())
+    b.add("TimeDate: t")
+    b.include(msg.analyze_result.analyze_result_to_prompt())
+    direct = PromptBuilder(TagType.ANALYZE_TAG).include(b).build()
+    cached = PromptBuilder(TagType.ANALYZE_TAG)
+    cached.add(first)
+    assert cached.build() == direct
+
+    # 分析结果回填后重新渲染；超出容量按 LRU 淘汰
+    filled = _result()
+    filled.keywords.append("旅行")
+    assert "旅行" in cache.render(_msg(1, filled))
+    cache.render(_msg(2, None))
+    cache.render(_msg(3, None))
+    assert cache.getStats()["entries"] == 2 and cache.getStats()["misses"] == 4
+
+
+def test_fingerprint_follows_content_not_sizes():
+    a, b = _result(), _result()
+    assert a.prompt_fingerprint() == b.prompt_fingerprint()
+    b.relations = [Relation(subject="我", relation="plan", obj="上海")] * 8
+    assert a.prompt_fingerprint() != b.prompt_fingerprint()
+    b = _result()
+    b.keywords = ["上海"]
+    assert a.prompt_fingerprint() != b.prompt_fingerprint()
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import event
+
+from DataClass.AnalyzeResult import AnalyzeResult, Argument, Entity, Frame, Relation
+from DataClass.ChatMessage import ChatMessage
+from RawChatHistory.SqlitManagementSystem import SqlitManagementSystem
+from RawChatHistory.sqlit.AnalyzeCodec import AnalyzeCodec
+
+
+def _analyze() -> AnalyzeResult:
+    return AnalyzeResult(
+        entities=[Entity(text="ollama", typ="TOOL", span=[2, 2])],
+        frames=[Frame(predicate="用", predicate_span=[1, 1], arguments=[Argument(role="A0", text="我", span=[0, 0])])],
+        tokens=[("我", "r"), ("用", "v"), ("ollama", "nz")],
+        keywords=["ollama", "本地"],
+        relations=[Relation(subject="我", relation="use", obj="ollama")],
+        normalized_text="我用ollama",
+        is_question=False,
+        emotion_cues=["开心"],
+        raw={"ltp": {"dep": [{"head": [2, 0, 2]}]}},
+    )
+
+
+def _msg(ar: AnalyzeResult | None = None) -> ChatMessage:
+    return ChatMessage(role="user", content="我用ollama", timestamp=0, timedate="", sender_name="aki",
+                       sender_id=1, analyze_result=ar)
+
+
+def _comparable(ar: AnalyzeResult) -> dict:
+    d = ar.to_dict()
+    d.pop("turn_id")
+    d["tokens"] = [list(t) for t in d["tokens"]]
+    return d
+
+
+def _stored() -> dict:
+    """历史读取得到的形态：raw["ltp"] 已剥离到 analyze_raw_evidence"""
+    d = _comparable(_analyze())
+    d["raw"].pop("ltp")
+    return d
+
+
+def test_codec_roundtrip():
+    ar = _analyze()
+    assert _comparable(AnalyzeCodec.decode(AnalyzeCodec.encode(ar))) == _comparable(ar)
+    assert AnalyzeCodec.index_terms(ar) == [("entity", "ollama"), ("keyword", "ollama"), ("keyword", "本地")]
+
+
+def test_compact_format_reads_history_in_one_query(tmp_path):
+    sql = SqlitManagementSystem(str(tmp_path / "c.db"), db_analyze_format="compact")
+    try:
+        for _ in range(3):
+            sql.addMessage(_msg(_analyze()))
+        sql.addMessage(_msg())
+
+        statements: list[str] = []
+
+        def _record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(sql.engine, "before_cursor_execute", _record)
+        history = sql.getHistory(4)
+        event.remove(sql.engine, "before_cursor_execute", _record)
+
+        assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) == 1
+        assert _comparable(history[0].analyze_result) == _stored()
+        assert history[0].analyze_result.turn_id == history[0].chat_turn_id
+        assert history[-1].analyze_result is None
+        assert sql.findTurnIds("本地", kind="keyword") == [3, 2, 1]
+
+        assert sql.deleteMessageById(3)
+        assert sql.findTurnIds("本地") == [2, 1]
+    finally:
+        sql.exit()
+
+
+def test_migration_between_formats(tmp_path):
+    db = str(tmp_path / "m.db")
+    sql = SqlitManagementSystem(db)
+    turn_id = sql.addMessage(_msg(_analyze()))
+    sql.exit()
+
+    sql = SqlitManagementSystem(db, db_analyze_format="compact")
+    try:
+        assert sql.getHistory(1)[0].analyze_result is None  # 未迁移前读不到
+        assert sql.chat_store.migrate_analyze_format("compact", batch_size=1) == 1
+        assert sql.chat_store.migrate_analyze_format("compact") == 0
+        assert _comparable(sql.getHistory(1)[0].analyze_result) == _stored()
+        assert sql.getRawEvidence(turn_id) == _analyze().raw
+        assert sql.findTurnIds("ollama", kind="entity") == [turn_id]
+
+        assert sql.chat_store.migrate_analyze_format("normalized") == 1
+        assert sql.findTurnIds("ollama") == []
+    finally:
+        sql.exit()
+
+    sql = SqlitManagementSystem(db)
+    try:
+        assert _comparable(sql.getHistory(1)[0].analyze_result) == _stored()
+        assert sql.getRawEvidence(turn_id) == _analyze().raw
+    finally:
+        sql.exit()
+
+
+@pytest.mark.parametrize("fmt", ["normalized", "compact"])
+def test_raw_evidence_offload_and_retention(tmp_path, fmt):
+    sql = SqlitManagementSystem(str(tmp_path / "r.db"), db_analyze_format=fmt, db_raw_retention_turns=2)
+    try:
+        ar = _analyze()
+        ids = [sql.addMessage(_msg(ar)) for _ in range(3)]
+        assert ar.raw == {"ltp": {"dep": [{"head": [2, 0, 2]}]}}  # 调用方对象不被修改
+        assert _comparable(sql.getHistory(1)[0].analyze_result) == _stored()
+        assert sql.getRawEvidence(ids[-1]) == ar.raw
+
+        with sql.chat_store._session() as session:
+            sql.chat_store.prune_raw_evidence_in(session)
+            session.commit()
+        assert sql.getRawEvidence(ids[0]) is None
+        assert [sql.getRawEvidence(i) for i in ids[1:]] == [ar.raw, ar.raw]
+    finally:
+        sql.exit()
+
+
+def test_offload_existing_raw_evidence(tmp_path):
+    db = str(tmp_path / "o.db")
+    sql = SqlitManagementSystem(db, db_raw_offload_keys=[])
+    turn_id = sql.addMessage(_msg(_analyze()))
+    sql.exit()
+
+    sql = SqlitManagementSystem(db)
+    try:
+        assert _comparable(sql.getHistory(1)[0].analyze_result) == _comparable(_analyze())
+        assert sql.chat_store.offload_raw_evidence() == 1
+        assert sql.chat_store.offload_raw_evidence() == 0
+        assert _comparable(sql.getHistory(1)[0].analyze_result) == _stored()
+        assert sql.getRawEvidence(turn_id) == _analyze().raw
+    finally:
+        sql.exit()
+
+
+@pytest.mark.parametrize("fmt", ["normalized", "compact"])
+def test_history_projections(tmp_path, fmt):
+    sql = SqlitManagementSystem(str(tmp_path / "p.db"), db_analyze_format=fmt)
+    try:
+        for _ in range(2):
+            sql.addMessage(_msg(_analyze()))
+
+        statements: list[str] = []
+
+        def _record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(sql.engine, "before_cursor_execute", _record)
+        history = sql.getHistory(2, projection="text")
+        event.remove(sql.engine, "before_cursor_execute", _record)
+
+        assert len(statements) == 1
+        assert "analyze" not in statements[0] and "voice" not in statements[0]
+        assert [m.content for m in history] == ["我用ollama", "我用ollama"]
+        assert not history[-1].isAnalyzeLoaded()
+        assert _comparable(history[-1].analyze_result) == _stored()  # 首次访问时加载
+        assert history[-1].isAnalyzeLoaded()
+
+        light = sql.getHistory(1, projection="light")[0].analyze_result
+        assert light.keywords == ["ollama", "本地"] and light.emotion_cues == ["开心"]
+        assert light.is_question is False and light.turn_id == 2
+
+        no_analyze = sql.chat_store.list_messages(limit=1, projection="text", lazy_analyze=False)[0]
+        assert no_analyze.analyze_result is None
+    finally:
+        sql.exit()
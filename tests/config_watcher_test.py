@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import os
+
+import yaml
+
+from DataClass.ChatMessage import ChatMessage
+from QuerySystem.LowSignalGate import LowSignalGate
+from QuerySystem.SignalDensity.PrototypeCosineRouter import PrototypeCosineRouter
+from tools.ConfigWatcher import ConfigWatcher
+
+
+def _write(path, cfg: dict, mtime: int) -> None:
+    path.write_text(yaml.safe_dump(cfg, allow_unicode=True), encoding="utf-8")
+    # 显式设置 mtime，避免文件系统时间精度导致两次写入 mtime 相同
+    os.utime(path, (mtime, mtime))
+
+
+def test_watcher_fires_callback_only_on_change(tmp_path):
+    cfg = tmp_path / "a.yaml"
+    _write(cfg, {"x": 1}, 1_000)
+    calls: list[str] = []
+
+    watcher = ConfigWatcher(config_watch_interval=0.1)
+    watcher.watch(str(cfg), lambda: calls.append("a"))
+    watcher.watch(str(cfg), lambda: 1 / 0)  # 失败的回调不影响其他回调
+    watcher.watch(str(cfg), lambda: calls.append("b"))
+
+    assert watcher.poll() == []
+    _write(cfg, {"x": 2}, 2_000)
+    assert watcher.poll() == [os.path.abspath(cfg)]
+    assert calls == ["a", "b"]
+    assert watcher.poll() == []
+
+
+def test_gate_and_router_reload_swap_config(tmp_path):
+    cfg = tmp_path / "template_input.yaml"
+    _write(cfg, {"low_signal_patterns": ["在吗"], "prototypes": {"env": ["今天天气怎么样"]}}, 1_000)
+    gate = LowSignalGate(template_path=str(cfg))
+    router = PrototypeCosineRouter(config_path=str(cfg), analyzer="char_bigram")
+    msg = ChatMessage(role="user", content="帮我查一下代码", timestamp=0, timedate="", sender_name="aki", sender_id=1)
+    assert gate.judge("再见") is None
+    assert router.route(msg).best_label is None
+
+    _write(cfg, {"low_signal_patterns": ["再见"], "prototypes": {"kb": ["帮我查一下代码"]}}, 2_000)
+    gate.reload()
+    router.reload()
+    assert gate.judge("再见") is not None
+    assert gate.judge("在吗") is None
+    assert router.route(msg).best_label == "kb"
+
+    # 配置损坏时保留旧快照
+    cfg.write_text("low_signal_patterns: [", encoding="utf-8")
+    gate.reload()
+    assert gate.judge("再见") is not None
+
+
+def test_llm_model_map_survives_broken_yaml_on_reload(tmp_path):
+    from LLM.LLMManagement import LLMManagement
+    from SystemPrompt import SystemPrompt
+
+    cfg = tmp_path / "system_prompt.yaml"
+    _write(cfg, {"prompts": {"qw8": {"model": "qwen3:8b"}, "fused_perception": {"model": "qwen3:4b"}}}, 1_000)
+    llm = LLMManagement(SystemPrompt(), llm_cache=False)
+    llm.config_path = str(cfg)
+    watcher = ConfigWatcher(config_watch_interval=0.1)
+    watcher.watch(str(cfg), llm.reload_config)
+
+    _write(cfg, {"prompts": {"qw8": {"model": "qwen3:8b"}, "fused_perception": {"model": "qwen3:1.7b"}}}, 2_000)
+    watcher.poll()
+    expected = {"qw8": "qwen3:8b", "fused_perception": "qwen3:1.7b"}
+    assert llm.model_map == expected
+
+    # 编辑器保存到一半：YAML 损坏时保留当前映射，而不是换成内置默认值
+    cfg.write_text("prompts:\n  qw8: {model: [", encoding="utf-8")
+    os.utime(cfg, (3_000, 3_000))
+    watcher.poll()
+    assert llm.model_map == expected
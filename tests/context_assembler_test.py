@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from ContextAssembler.DefaultGlobalContextAssembler import DefaultGlobalContextAssembler
+from DataClass.ChatMessage import ChatMessage
+from DataClass.ChatState import ChatState
+from DataClass.TagType import TagType
+from MemorySystem.MemoryStore.WordCoreStorage import WordCoreStorage
+from SystemPrompt import SystemPrompt
+from tools.PromptBuilder import PromptBuilder
+
+
+def _make_assembler():
+    calls = {"identity": 0, "chat_state": 0}
+    versions = {"identity": 1.0, "dialogue": 0, "chat_state": (0, None)}
+    msgs = [
+        ChatMessage(role="user", content=f"hi {i}", timestamp=0, timedate="t",
+                    sender_name="aki", sender_id=1, chat_turn_id=i)
+        for i in range(1, 4)
+    ]
+
+    def identity():
+        calls["identity"] += 1
+        b = PromptBuilder(TagType.IDENTITY_CORE_TAG)
+        b.add(f"identity v{versions['identity']}")
+        return b
+
+    def chat_state():
+        calls["chat_state"] += 1
+        return ChatState(interaction="闲聊", user_attitude="积极",
+                         emotional_state="平静", leading_approach="用户主导").to_prompt()
+
+    storage = SimpleNamespace(
+        get_history_by_role=lambda *a, **k: msgs[-3:],
+        get_history=lambda n, **k: msgs,
+    )
+    memory = SimpleNamespace(
+        storage=storage,
+        assembleWorldCore=WordCoreStorage().getWorldCore,
+        assembleIdentity=identity,
+        assembleShortMemory=lambda: PromptBuilder(TagType.MEMORY_SHORT_TAG),
+        getIdentityVersion=lambda: versions["identity"],
+        getShortMemoryVersion=lambda: versions["dialogue"],
+    )
+    chat = SimpleNamespace(assemble=chat_state, getVersion=lambda: versions["chat_state"])
+    assembler = DefaultGlobalContextAssembler(memory, chat, SystemPrompt(), history_window=20)
+    return assembler, calls, versions, msgs
+
+
+def test_unchanged_sections_are_reused():
+    assembler, calls, _, _ = _make_assembler()
+    first = assembler.build_messages()
+    second = assembler.build_messages()
+    assert first == second
+    assert calls == {"identity": 1, "chat_state": 1}
+
+
+def test_only_changed_sections_are_rebuilt():
+    assembler, calls, versions, msgs = _make_assembler()
+    assembler.build_messages()
+
+    versions["identity"] = 2.0
+    msgs.append(ChatMessage(role="user", content="new turn", timestamp=0, timedate="t",
+                            sender_name="aki", sender_id=1, chat_turn_id=4))
+    content = assembler.build_messages()[0]["content"]
+
+    assert calls == {"identity": 2, "chat_state": 1}
+    assert "identity v2.0" in content
+    assert "User Message ID 4" in content
+    assert "User Message ID 1" not in content
+
+
+def test_prefix_stable_layout_keeps_volatile_sections_last():
+    assembler, _, _, msgs = _make_assembler()
+    assembler.layout = "prefix_stable"
+    first = assembler.build_messages()[0]["content"]
+    msgs.append(ChatMessage(role="user", content="new turn", timestamp=0, timedate="t",
+                            sender_name="aki", sender_id=1, chat_turn_id=4))
+    second = assembler.build_messages()[0]["content"]
+
+    analyze_at = second.index(f"<{TagType.ANALYZE_TAG.value}>")
+    assert first[:analyze_at] == second[:analyze_at]
+    assert second.index(f"<{TagType.RESPONSE_PROTOCOL_TAG.value}>") < analyze_at
+
+
+def test_recalled_memory_shrinks_history_window():
+    assembler, _, _, msgs = _make_assembler()
+    windows = []
+    assembler.memory_system.storage.get_history = lambda n, **k: windows.append(n) or msgs[-n:]
+    assembler.retrieval_history_window = 2
+
+    recalled = f"{TagType.MEMORY_RECALL_TAG.open()}\n  [1] (long_term) t aki: 很久以前\n{TagType.MEMORY_RECALL_TAG.close()}"
+    messages = assembler.build_messages(retrieved=recalled)
+    assert recalled in messages[0]["content"]
+    assert len(messages) == 3 and windows[-1] == 2
+
+    assert len(assembler.build_messages()) == 4 and windows[-1] == 20
+
+
+def test_backfilled_analyze_result_reaches_the_prompt():
+    from DataClass.AnalyzeResult import AnalyzeResult, Relation
+
+    assembler, _, _, msgs = _make_assembler()
+    msgs[-1].analyze_result = AnalyzeResult(keywords=["北京"], relations=[Relation("我", "plan", "北京")])
+    first = assembler.build_analyze_section()
+    assert "(我, plan, 北京)" in first
+
+    # 延后的深层分析回填：条数不变、内容不同，也要重新渲染
+    msgs[-1].analyze_result = AnalyzeResult(keywords=["上海"], relations=[Relation("我", "plan", "上海")])
+    second = assembler.build_analyze_section()
+    assert "(我, plan, 上海)" in second and "北京" not in second
+    assert assembler.build_analyze_section() == second
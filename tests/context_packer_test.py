@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from ContextAssembler.ContextPacker import ContextPacker
+from DataClass.TagType import TagType
+from tools.TokenCounter import TokenCounter
+
+
+def _msg(i: int, text: str) -> dict:
+    return {"role": "user", "content": f"{i}:{text}"}
+
+
+def test_history_is_packed_newest_first_under_budget():
+    packer = ContextPacker(context_max_message_tokens=50, context_message_overhead=4)
+    counter = TokenCounter()
+    history = [_msg(i, "你好" * 10) for i in range(10)]
+    cost = counter.count(history[0]["content"]) + 4
+
+    packed = packer.fit_history(history, cost * 3)
+    assert packed == history[-3:]
+    assert packer.last_stats["history_dropped"] == 7
+
+    # 粘贴的长文被截断到单条上限，最新一条即使超出剩余预算也会保留
+    pasted = history[:2] + [_msg(99, "长" * 5000)]
+    packed = packer.fit_history(pasted, 30)
+    assert len(packed) == 1 and counter.count(packed[0]["content"]) <= 26
+    assert pasted[-1]["content"].endswith("长")
+
+
+def test_sections_are_capped_and_trimmed_by_priority():
+    packer = ContextPacker(
+        context_token_budget=400,
+        context_min_history_tokens=100,
+        context_message_overhead=0,
+        context_section_budgets={"analyze": 120},
+    )
+    analyze = TagType.ANALYZE_TAG.wrap("析" * 500)
+    sections = {
+        "response_protocol": TagType.RESPONSE_PROTOCOL_TAG.wrap("规" * 100),
+        "retrieval": TagType.MEMORY_RECALL_TAG.wrap("忆" * 200),
+        "analyze": analyze,
+    }
+    fitted = packer.fit_sections(sections)
+
+    tokens = {name: packer.count(text) for name, text in fitted.items()}
+    assert sum(tokens.values()) <= 300
+    # 高优先级的协议不动，先裁 analyze（已经到单片段上限），再裁 retrieval
+    assert fitted["response_protocol"] == sections["response_protocol"]
+    assert tokens["analyze"] < 120 or fitted["analyze"] == ""
+    assert fitted["retrieval"].endswith(TagType.MEMORY_RECALL_TAG.close())
+    assert packer.last_stats["trimmed"] == ["analyze", "retrieval"]
+    assert packer.fit_sections({"analyze": "短"}) == {"analyze": "短"}
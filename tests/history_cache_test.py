@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from DataClass.ChatMessage import ChatMessage
+from RawChatHistory.HistoryCache import HistoryCache
+from RawChatHistory.RawChatHistory import RawChatHistory
+
+
+def _msg(turn_id: int, role: str = "user", sender_id: int = 1) -> ChatMessage:
+    return ChatMessage(role=role, content=f"m{turn_id}", timestamp=turn_id, timedate="",
+                       sender_name="aki", sender_id=sender_id, chat_turn_id=turn_id)
+
+
+def test_ring_buffer_keeps_indexes_in_sync():
+    cache = HistoryCache(4)
+    cache.load([], complete=True)
+    for i, (role, sid) in enumerate([("user", 1), ("assistant", -1), ("user", 2), ("user", 1), ("assistant", -1)], 1):
+        cache.append(_msg(i, role, sid))
+
+    # 第 1 条被淘汰，索引同步移除
+    assert [m.chat_turn_id for m in cache.latest(4)] == [2, 3, 4, 5]
+    assert [m.chat_turn_id for m in cache.latest_by_role("user", 2)] == [3, 4]
+    assert [m.chat_turn_id for m in cache.latest_by_role("user", 1, sender_id=1)] == [4]
+    assert cache.latest_by_role("user", 2, sender_id=1) is None  # 淘汰后不再完整，交给 DB
+    assert cache.get(1) is None and cache.get(4).content == "m4"
+
+    assert cache.remove(4) and not cache.remove(4)
+    assert [m.chat_turn_id for m in cache.latest_by_role("user", 1)] == [3]
+    assert cache.latest_by_role("user", 1, sender_id=1) is None
+
+    stats = cache.getStats()
+    assert stats["size"] == 3 and stats["misses"] == 2 and stats["hits"] == 4
+
+
+def test_raw_chat_history_serves_role_queries_from_cache(tmp_path):
+    history = RawChatHistory(3, 5, str(tmp_path / "h.db"))
+    try:
+        for i in range(4):
+            m = _msg(0, "user" if i % 2 == 0 else "assistant", 1 if i % 2 == 0 else -1)
+            m.chat_turn_id = None
+            history.addMessage(m)
+
+        calls: list[str] = []
+        history.sql_manager.getHistoryByRoleAndSender = lambda *a, **k: calls.append("db") or []
+        assert [m.chat_turn_id for m in history.getHistoryByRole("user", 1, sender_id=1)] == [3]
+        assert calls == []
+
+        # 缓存只有 3 条（2 条 user 里只剩 1 条），需要 2 条时回落 DB
+        del history.sql_manager.getHistoryByRoleAndSender
+        users = history.getHistoryByRole("user", 2, sender_id=1)
+        assert [m.chat_turn_id for m in users] == [1, 3]
+        assert users[-1] is history.history_cache.get(3)  # 缓存中的对象优先
+        assert history.getStats()["history_cache"]["misses"] == 1
+    finally:
+        history.sql_manager.exit()
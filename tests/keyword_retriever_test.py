@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import sqlite3
+
+from DataClass.ChatMessage import ChatMessage
+from DataClass.DialogueMessage import DialogueMessage
+from DataClass.QuerySchema import QuerySchema
+from MemorySystem.MemoryStore.KeywordRetriever import KeywordRetriever
+from RawChatHistory.RawChatHistory import RawChatHistory
+from RawChatHistory.SqlitManagementSystem import SqlitManagementSystem
+from RawChatHistory.sqlit.FtsIndex import FtsIndex
+from tools.TokenCounter import TokenCounter
+
+
+def _msg(text: str) -> ChatMessage:
+    return ChatMessage(role="user", content=text, timestamp=0, timedate="", sender_name="aki", sender_id=1)
+
+
+def _schema(**kw) -> QuerySchema:
+    base = dict(retrieve=True, sources=["long_term", "mid_term"], top_k=5, token_budget=512)
+    base.update(kw)
+    return QuerySchema(**base)
+
+
+def test_bigram_terms():
+    assert FtsIndex.terms("我用Ollama跑本地模型") == ["我用", "ollama", "跑本", "本地", "地模", "模型"]
+    assert FtsIndex.build_match(["本地模型", "本地"]) == '"本地" OR "地模" OR "模型"'
+    assert FtsIndex.build_match(["！？"]) == ""
+
+
+def test_fts_follows_inserts_updates_and_deletes(tmp_path):
+    history = RawChatHistory(5, 5, str(tmp_path / "k.db"))
+    try:
+        ids = [history.addMessage(_msg(t)) for t in ["今天去公园散步", "我在用本地模型跑推理", "晚饭吃了火锅"]]
+        history.addDialogues(DialogueMessage(start_turn_id=1, summary="聊了周末散步的计划", keywords=["公园"]))
+
+        retriever = KeywordRetriever(history)
+        hits = retriever.retrieve(_schema(query_text="本地模型推理"))
+        assert [(h.kind, h.ref_id) for h in hits] == [("message", ids[1])]
+        assert hits[0].score == 1.0 and hits[0].tokens == TokenCounter().count("我在用本地模型跑推理")
+
+        hits = retriever.retrieve(_schema(keywords=["公园", "散步"]))
+        assert {(h.kind, h.ref_id) for h in hits} == {("message", ids[0]), ("dialogue", 1)}
+        assert retriever.retrieve(_schema(keywords=["公园"]), before_turn_id=ids[0]) == [
+            h for h in retriever.retrieve(_schema(keywords=["公园"])) if h.kind == "dialogue"
+        ]
+
+        # 摘要更新在写入时重新索引，消息删除由触发器同步
+        history.updateDialogue(DialogueMessage(start_turn_id=1, summary="讨论了火锅", keywords=["火锅"], dialogue_id=1))
+        history.deleteMessageById(ids[0])
+        assert retriever.retrieve(_schema(keywords=["公园"])) == []
+        assert [h.kind for h in retriever.retrieve(_schema(keywords=["火锅"]))] == ["message", "dialogue"]
+
+        # 预算：放不下的跳过
+        assert retriever.retrieve(_schema(keywords=["火锅"], token_budget=5)) == [
+            h for h in retriever.retrieve(_schema(keywords=["火锅"])) if h.tokens <= 5
+        ]
+        assert retriever.retrieve(_schema(keywords=["火锅"], retrieve=False)) == []
+    finally:
+        history.sql_manager.exit()
+
+
+def test_fts_backfills_existing_database(tmp_path):
+    db = str(tmp_path / "b.db")
+    sql = SqlitManagementSystem(db, db_fts=False)
+    sql.addMessage(_msg("很久以前聊过量子计算"))
+    sql.exit()
+
+    sql = SqlitManagementSystem(db)
+    try:
+        assert [r["content"] for r in sql.searchMessages(["量子"])] == ["很久以前聊过量子计算"]
+    finally:
+        sql.exit()
+
+
+def test_fts_keeps_database_writable_for_other_clients(tmp_path):
+    db = str(tmp_path / "c.db")
+    sql = SqlitManagementSystem(db)
+    sql.addMessage(_msg("我在用本地模型跑推理"))
+    sql.exit()
+
+    # 旧版本留下的、调用自定义函数的触发器在启动时被清掉
+    conn = sqlite3.connect(db)
+    conn.execute(
+        "CREATE TRIGGER chat_messages_fts_ai AFTER INSERT ON chat_messages BEGIN "
+        "INSERT INTO chat_messages_fts(rowid, terms) VALUES (new.chat_turn_id, fts_bigram(new.content)); END"
+    )
+    conn.commit()
+    conn.close()
+    SqlitManagementSystem(db).exit()
+
+    # 不注册任何自定义函数的普通连接照常增删改
+    conn = sqlite3.connect(db)
+    conn.execute(
+        "INSERT INTO chat_messages(role, sender_name, sender_id, content, timestamp, timedate) "
+        "VALUES ('user', 'aki', 1, '外部脚本导入的量子计算笔记', 0, '')"
+    )
+    conn.execute("UPDATE chat_messages SET content = '改过的内容' WHERE chat_turn_id = 1")
+    conn.commit()
+    conn.close()
+
+    sql = SqlitManagementSystem(db)
+    try:
+        # 新增的行启动时补进索引；已有行的修改要 rebuild() 才会生效
+        assert [r["content"] for r in sql.searchMessages(["量子"])] == ["外部脚本导入的量子计算笔记"]
+        assert [r["content"] for r in sql.searchMessages(["本地"])] == ["改过的内容"]
+        sql.fts.rebuild()
+        assert sql.searchMessages(["本地"]) == []
+
+        sql.deleteMessageById(2)
+        assert sql.searchMessages(["量子"]) == []
+    finally:
+        sql.exit()
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from LLM.LLMResponseCache import LLMResponseCache
+
+
+def test_key_is_content_addressed():
+    k = LLMResponseCache.make_key("qwen3:1.7b", "p", {"temperature": 0, "top_p": 1})
+    assert k == LLMResponseCache.make_key("qwen3:1.7b", "p", {"top_p": 1, "temperature": 0})
+    assert k != LLMResponseCache.make_key("qwen3:4b", "p", {"temperature": 0, "top_p": 1})
+    assert k != LLMResponseCache.make_key("qwen3:1.7b", "p2", {"temperature": 0, "top_p": 1})
+
+
+def test_lru_eviction_and_counters():
+    cache = LLMResponseCache(llm_cache_max_entries=2)
+    cache.put("a", "m", {"v": 1})
+    cache.put("b", "m", {"v": 2})
+    assert cache.get("a") == {"v": 1}  # a 变为最近使用
+    cache.put("c", "m", {"v": 3})      # 淘汰 b
+    assert cache.get("b") is None
+    assert cache.get("c") == {"v": 3}
+    stats = cache.getStats()
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["entries"] == 2
+
+
+def test_hits_are_isolated_copies_and_empty_results_skipped():
+    cache = LLMResponseCache()
+    cache.put("a", "m", {"v": [1]})
+    cache.get("a")["v"].append(2)
+    assert cache.get("a") == {"v": [1]}
+    cache.put("empty", "m", {})
+    assert cache.get("empty") is None
+
+
+def test_ttl_expiry():
+    cache = LLMResponseCache(llm_cache_ttl=0.001)
+    cache._remember("a", '{"v": 1}', 0.0)
+    assert cache.get("a") is None
+
+
+def test_sqlite_backing_survives_restart(tmp_path):
+    db = str(tmp_path / "cache.db")
+    cache = LLMResponseCache(llm_cache_db_path=db)
+    cache.put("a", "m", {"v": "中文"})
+    cache.close()
+
+    cache = LLMResponseCache(llm_cache_db_path=db)
+    assert cache.get("a") == {"v": "中文"}
+    assert cache.getStats()["disk_hits"] == 1
+    cache.close()
+
+
+def test_async_path_keeps_disk_io_off_the_event_loop(tmp_path, monkeypatch):
+    import asyncio
+    import threading
+
+    db = str(tmp_path / "cache.db")
+    cache = LLMResponseCache(llm_cache_db_path=db)
+    loop_thread = threading.get_ident()
+    disk_threads = []
+    real_put = cache._db_put
+    monkeypatch.setattr(cache, "_db_put", lambda *a: (disk_threads.append(threading.get_ident()), real_put(*a)))
+
+    async def run():
+        cache.put_background("a", "m", {"v": 1})
+        assert await cache.aget("a") == {"v": 1}  # 内存层立即可见
+        cache.flush()
+        cache._memory.clear()
+        assert await cache.aget("a") == {"v": 1}  # 磁盘层在线程里读
+        assert await cache.aget("missing") is None
+
+    asyncio.run(run())
+    assert disk_threads and loop_thread not in disk_threads
+    assert cache.getStats()["disk_hits"] == 1 and cache.getStats()["misses"] == 1
+    cache.close()
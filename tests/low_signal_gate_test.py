@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import pytest
+
+from QuerySystem.LowSignalGate import LowSignalGate
+
+
+@pytest.fixture(scope="module")
+def gate() -> LowSignalGate:
+    return LowSignalGate(template_path="config/template_input.yaml")
+
+
+@pytest.mark.parametrize(
+    "text", ["在吗", " 在吗？", "OK", "ok!", "?", "？？", "嗯嗯", "...", "👋", "嗯嗯好的呀", "ok在吗", "哈哈哦"]
+)
+def test_low_signal_inputs_are_gated(gate, text):
+    assert gate.judge(text) is not None
+
+
+@pytest.mark.parametrize("text", ["在吗，帮我看下这个报错", "memory模块怎么实现", "okay let's start", "你好呀", "好的谢谢"])
+def test_contentful_inputs_pass(gate, text):
+    assert gate.judge(text) is None
+
+
+@pytest.mark.parametrize("text", ["不", "1", "是", "3", "对"])
+def test_single_char_answers_pass(gate, text):
+    # 单字可能是在回答上一句提问（“选1还是2？”“要我提醒你吗？”），不能按重复字符命中
+    assert gate.judge(text) is None
+
+
+def test_density_threshold_is_configurable():
+    strict = LowSignalGate(template_path="config/template_input.yaml", low_signal_min_density=0.5)
+    assert strict.judge("嗯嗯你好") is not None
+    off = LowSignalGate(template_path="config/template_input.yaml", low_signal_min_density=-1)
+    assert off.judge("嗯嗯好的呀") is None
+
+
+def test_query_schema_uses_ping_presence_config(gate):
+    schema = gate.build_query_schema()
+    assert schema.intent == "ping_presence"
+    assert schema.retrieve is False
+    assert schema.top_k == 0 and schema.token_budget == 0
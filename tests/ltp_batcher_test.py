@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PerceptionSystem.LtpBatcher import LtpBatcher
+
+
+class _FakeLTP:
+    def __init__(self):
+        self.calls: list[tuple[list[str], list[str]]] = []
+        self.lock = threading.Lock()
+
+    def pipeline(self, texts, tasks):
+        with self.lock:
+            self.calls.append((list(texts), list(tasks)))
+        return {"cws": [list(t) for t in texts], "pos": [["n"] * len(t) for t in texts]}
+
+
+def test_concurrent_requests_are_merged_into_one_pipeline_call():
+    ltp = _FakeLTP()
+    batcher = LtpBatcher(ltp, ltp_max_batch_size=8, ltp_max_wait_ms=200)
+    texts = ["你好", "天气", "怎么样"]
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        outs = list(pool.map(lambda t: batcher.pipeline(t, ["cws", "pos"]), texts))
+    batcher.close()
+
+    assert len(ltp.calls) == 1
+    assert sorted(ltp.calls[0][0]) == sorted(texts)
+    for text, out in zip(texts, outs):
+        assert out.cws == [list(text)]
+        assert out["pos"] == [["n"] * len(text)]
+
+
+def test_batches_respect_size_and_task_groups():
+    ltp = _FakeLTP()
+    batcher = LtpBatcher(ltp, ltp_max_batch_size=2, ltp_max_wait_ms=200)
+    futures = [
+        batcher.submit("a", ["cws"]),
+        batcher.submit("b", ["cws", "pos"]),
+        batcher.submit("c", ["cws"]),
+    ]
+    results = [f.result(timeout=2) for f in futures]
+    batcher.close()
+
+    assert [r.cws for r in results] == [[["a"]], [["b"]], [["c"]]]
+    assert all(len(texts) <= 2 for texts, _ in ltp.calls)
+    assert (["b"], ["cws", "pos"]) in ltp.calls
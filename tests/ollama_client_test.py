@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from LLM.OllamaClient import OllamaClient
+
+
+class _FakeResponse:
+    def __init__(self, data: dict):
+        self._data = data
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._data
+
+
+class _FakeAsyncClient:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def post(self, url, json):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return _FakeResponse({"model": json["model"], "response": "{}"})
+
+
+@pytest.mark.asyncio
+async def test_apost_respects_per_model_concurrency():
+    client = OllamaClient(model_concurrency={"qwen3:8b": 1}, default_model_concurrency=3)
+    fake = _FakeAsyncClient()
+    client._ensure_async = lambda: fake  # type: ignore[method-assign]
+
+    await asyncio.gather(*[client.apost("api/chat", {"model": "qwen3:8b"}) for _ in range(4)])
+    assert fake.peak == 1
+
+    fake.peak = 0
+    await asyncio.gather(*[client.apost("api/generate", {"model": "qwen3:1.7b"}) for _ in range(6)])
+    assert fake.peak == 3
+
+
+def test_url_join():
+    client = OllamaClient(ollama_base_url="http://127.0.0.1:11434/")
+    assert client.url("/api/chat") == "http://127.0.0.1:11434/api/chat"
+
+
+@pytest.mark.asyncio
+async def test_ollama_chat_astream_yields_deltas_until_done():
+    from LLM.OllamaChat import OllamaChat
+
+    class _StreamClient:
+        async def astream(self, path, payload):
+            assert path == "api/chat"
+            for chunk in [
+                {"message": {"content": "你"}, "done": False},
+                {"message": {"content": "好"}, "done": False},
+                {"message": {"content": ""}, "done": True, "eval_count": 2},
+                {"message": {"content": "ignored"}, "done": False},
+            ]:
+                yield chunk
+
+    chat = OllamaChat(_StreamClient())  # type: ignore[arg-type]
+    deltas = [d async for d in chat.astream([{"role": "user", "content": "hi"}], "qwen3:8b")]
+    assert deltas == ["你", "好"]
+
+
+def test_ollama_chat_keep_alive_for_pinned_models():
+    from LLM.OllamaChat import OllamaChat
+
+    chat = OllamaChat(OllamaClient(), ollama_keep_alive="30m", pinned_models=["qwen3:8b"])
+    assert chat._build_payload([], "qwen3:8b", None)["keep_alive"] == -1
+    assert chat._build_payload([], "qwen3:1.7b", None)["keep_alive"] == "30m"
+    assert "keep_alive" not in OllamaChat(OllamaClient())._build_payload([], "qwen3:8b", None)
+
+
+def test_ollama_chat_estimates_cached_prompt_tokens_only_for_debug_log():
+    from loguru import logger
+    from LLM.OllamaChat import OllamaChat
+    from tools.TokenCounter import TokenCounter
+
+    class CountingCounter(TokenCounter):
+        calls = 0
+
+        def count(self, text):
+            CountingCounter.calls += 1
+            return super().count(text)
+
+    chat = OllamaChat(OllamaClient(), prompt_token_counter=CountingCounter(), context_message_overhead=4)
+    messages = [{"role": "system", "content": "你是 Alice" * 10}, {"role": "user", "content": "在吗"}]
+    total = TokenCounter().count("你是 Alice" * 10) + TokenCounter().count("在吗") + 8
+    assert chat.estimate_prompt_tokens(messages) == total
+    CountingCounter.calls = 0
+
+    # 统计按调用返回，不写到共享实例上；没有 DEBUG sink 时不重新计数
+    stats = chat._log_stats({"model": "qwen3:8b", "prompt_eval_count": 10, "eval_count": 3}, messages)
+    assert stats["prompt_eval_count"] == 10 and stats["eval_count"] == 3
+    assert not hasattr(chat, "last_stats")
+    assert CountingCounter.calls == 0
+
+    lines: list[str] = []
+    sink = logger.add(lambda m: lines.append(m.record["message"]), level="DEBUG")
+    try:
+        chat._log_stats({"model": "qwen3:8b", "prompt_eval_count": 10, "eval_count": 3}, messages)
+        # prompt_eval_count 超过估算值（近似计数偏差）时不报负数
+        chat._log_stats({"prompt_eval_count": total + 5}, messages)
+    finally:
+        logger.remove(sink)
+    estimates = [line for line in lines if "estimate" in line]
+    assert f"prompt≈{total} tok, cached≈{total - 10} tok" in estimates[0]
+    assert "cached≈0 tok" in estimates[1]
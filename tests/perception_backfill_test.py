@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("ltp")
+pytest.importorskip("torch")
+
+from ContextAssembler.DefaultGlobalContextAssembler import DefaultGlobalContextAssembler  # noqa: E402
+from DataClass.AnalyzeResult import AnalyzeResult, Relation  # noqa: E402
+from DataClass.ChatMessage import ChatMessage  # noqa: E402
+from DataClass.TagType import TagType  # noqa: E402
+from MemorySystem.MemoryStore.WordCoreStorage import WordCoreStorage  # noqa: E402
+from PerceptionSystem.PerceptionSystem import PerceptionSystem  # noqa: E402
+from SystemPrompt import SystemPrompt  # noqa: E402
+from tools.PromptBuilder import PromptBuilder  # noqa: E402
+
+
+class _DeepAnalyzer:
+    def backfill_deferred(self, text: str, ar: AnalyzeResult) -> AnalyzeResult:
+        return AnalyzeResult(keywords=list(ar.keywords), relations=[Relation("我", "plan", "北京")])
+
+
+def _assembler(msg: ChatMessage) -> DefaultGlobalContextAssembler:
+    storage = SimpleNamespace(get_history_by_role=lambda *a, **k: [msg], get_history=lambda n, **k: [msg])
+    memory = SimpleNamespace(
+        storage=storage,
+        assembleWorldCore=WordCoreStorage().getWorldCore,
+        assembleIdentity=lambda: PromptBuilder(TagType.IDENTITY_CORE_TAG),
+        assembleShortMemory=lambda: PromptBuilder(TagType.MEMORY_SHORT_TAG),
+        getIdentityVersion=lambda: 1.0,
+        getShortMemoryVersion=lambda: 0,
+    )
+    chat = SimpleNamespace(assemble=lambda: PromptBuilder(TagType.CHAT_STATE_TAG), getVersion=lambda: 0)
+    return DefaultGlobalContextAssembler(memory, chat, SystemPrompt(), history_window=20)
+
+
+def test_deferred_backfill_replaces_result_persists_and_reaches_prompt():
+    shallow = AnalyzeResult(keywords=["北京"], raw={"ltp_deferred": True})
+    msg = ChatMessage(role="user", content="我想去北京", timestamp=0, timedate="t",
+                      sender_name="aki", sender_id=1, chat_turn_id=5, analyze_result=shallow)
+    assembler = _assembler(msg)
+    assert "(我, plan, 北京)" not in assembler.build_messages()[0]["content"]
+
+    perception = PerceptionSystem.__new__(PerceptionSystem)
+    perception.analyzers = {"text": [object(), _DeepAnalyzer()]}
+    perception._deferred_tasks = set()
+    persisted = []
+
+    async def run():
+        assert perception.schedule_deferred(msg, lambda turn_id, ar: persisted.append((turn_id, ar)))
+        await asyncio.gather(*perception._deferred_tasks)
+
+    asyncio.run(run())
+
+    assert msg.analyze_result is not shallow and msg.analyze_result.turn_id == 5
+    assert persisted == [(5, msg.analyze_result)]
+    assert "(我, plan, 北京)" in assembler.build_messages()[0]["content"]
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+
+from DataClass.ChatMessage import ChatMessage
+from QuerySystem.SignalDensity.PrototypeCosineRouter import PrototypeCosineRouter
+
+
+def _msg(text: str) -> ChatMessage:
+    return ChatMessage(role="user", content=text, timestamp=0, timedate="", sender_name="aki", sender_id=1)
+
+
+def _naive_scores(router: PrototypeCosineRouter, text: str) -> dict[str, float]:
+    def cos(a, b):
+        dot = sum(v * b.get(k, 0.0) for k, v in a.items())
+        na = math.sqrt(sum(v * v for v in a.values()))
+        nb = math.sqrt(sum(v * v for v in b.values()))
+        return dot / (na * nb) if na and nb else 0.0
+
+    q = router._tfidf_vector(router._extract_tokens(_msg(text)))
+    return {
+        label: max((cos(q, router._tfidf_vector(router._tokenize_text(t))) for t in texts), default=0.0)
+        for label, texts in router.prototypes.items()
+    }
+
+
+@pytest.fixture(scope="module")
+def router() -> PrototypeCosineRouter:
+    return PrototypeCosineRouter(config_path="config/template_input.yaml", analyzer="char_bigram")
+
+
+def test_matrix_scores_match_pairwise_cosine(router):
+    for text in ["现在cpu占用多少", "memory模块是怎么实现的", "今天吃什么"]:
+        got = router.route(_msg(text)).scores
+        for label, expected in _naive_scores(router, text).items():
+            assert got[label] == pytest.approx(expected, abs=1e-5)
+
+
+def test_route_batch_matches_single_routing(router):
+    texts = ["readme怎么写", "你还记得我喜欢什么吗", "在吗", ""]
+    batch = router.route_batch([_msg(t) for t in texts])
+    for text, res in zip(texts, batch):
+        single = router.route(_msg(text))
+        assert res.best_label == single.best_label
+        assert res.scores == pytest.approx(single.scores)
+    assert batch[0].best_label == "kb"
+    assert batch[2].best_label is None
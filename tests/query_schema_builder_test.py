@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from DataClass.ChatMessage import ChatMessage
+from QuerySystem.DefaultQuerySchemaBuilder import DefaultQuerySchemaBuilder
+from QuerySystem.QueryPropertyBuilderAbstract import QueryPropertyBuilderAbstract
+
+
+def _msg(text: str) -> ChatMessage:
+    return ChatMessage(role="user", content=text, timestamp=0, timedate="", sender_name="aki", sender_id=1)
+
+
+class _FakeLLM:
+    def __init__(self, delay: float, out: dict):
+        self.delay = delay
+        self.out = out
+
+    async def agenerate(self, prompt_name, options=None, **kwargs):
+        await asyncio.sleep(self.delay)
+        return self.out
+
+
+class _SlowBuilder(QueryPropertyBuilderAbstract):
+    def __init__(self, key, val, delay, priority=5, deps=None, timeout=None):
+        self.key, self.val, self.delay = key, val, delay
+        self.priority, self.deps, self.timeout = priority, deps or [], timeout
+
+    def buildProperty(self, msg):
+        time.sleep(self.delay)
+        return [(self.key, self.val)]
+
+    def getPriority(self):
+        return self.priority
+
+    def getDependencies(self):
+        return self.deps
+
+    def getTimeout(self):
+        return self.timeout
+
+    def getFallback(self, msg):
+        return [(self.key, "fallback")]
+
+
+@pytest.mark.asyncio
+async def test_abuild_runs_intent_classifier_through_async_llm():
+    llm = _FakeLLM(0.01, {"intent": "clarify", "confidence": 0.9})
+    builder = DefaultQuerySchemaBuilder(llm_management=llm, template_path="config/template_input.yaml")
+    msg = await builder.aaddMessage(_msg("什么意思"))
+    assert msg.query_schema.intent == "clarify"
+    assert msg.query_schema.sources == ["short_term", "mid_term"]
+
+
+@pytest.mark.asyncio
+async def test_abuild_uses_fallback_on_timeout():
+    llm = _FakeLLM(1.0, {"intent": "clarify", "confidence": 0.9})
+    builder = DefaultQuerySchemaBuilder(
+        llm_management=llm, template_path="config/template_input.yaml", intent_timeout=0.05
+    )
+    schema = await builder.abuild_query_schema(_msg("什么意思"))
+    assert schema.intent == "unknown"
+    assert schema.sources == ["short_term"]
+
+
+@pytest.mark.asyncio
+async def test_independent_builders_run_concurrently_and_dependants_wait():
+    builder = DefaultQuerySchemaBuilder(llm_management=None, template_path="config/template_input.yaml")
+    builder.property_builders = [
+        _SlowBuilder("query_text", "a", 0.2, priority=1),
+        _SlowBuilder("mode", "vector", 0.2, priority=2),
+        _SlowBuilder("top_k", 9, 0.0, priority=3, deps=["_SlowBuilder"]),
+    ]
+    start = time.perf_counter()
+    schema = await builder.abuild_query_schema(_msg("hi"))
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.35
+    assert (schema.query_text, schema.mode, schema.top_k) == ("a", "vector", 9)
+
+
+@pytest.mark.asyncio
+async def test_intent_router_answers_clear_inputs_without_llm():
+    llm = _FakeLLM(0.0, {"intent": "clarify", "confidence": 0.9})
+    builder = DefaultQuerySchemaBuilder(llm_management=llm, template_path="config/template_input.yaml")
+    intent_judge = next(b for b in builder.property_builders if type(b).__name__ == "IntentJudgeL")
+
+    schema = await builder.abuild_query_schema(_msg("现在cpu占用多少"))
+    assert schema.intent == "environment_status"
+    assert schema.sources == ["env"]
+
+    schema = await builder.abuild_query_schema(_msg("什么意思"))
+    assert schema.intent == "clarify"
+
+    metrics = intent_judge.getMetrics()
+    assert (metrics["total"], metrics["router_hits"], metrics["llm_calls"]) == (2, 1, 1)
+    assert metrics["hit_rate"] == 0.5
+
+
+class _SyncFakeLLM:
+    def __init__(self, out: dict):
+        self.out = out
+        self.calls: list[tuple[str, dict]] = []
+
+    def generate(self, prompt_name, options=None, **kwargs):
+        self.calls.append((prompt_name, kwargs))
+        return self.out
+
+
+@pytest.mark.asyncio
+async def test_fused_perception_fills_analyze_result_and_intent_in_one_call():
+    from PerceptionSystem.FusedAnalyze import FusedAnalyze
+
+    llm = _FakeLLM(0.0, {"intent": "unknown", "confidence": 0.0})
+    builder = DefaultQuerySchemaBuilder(llm_management=llm, template_path="config/template_input.yaml")
+    intent_judge = builder.getBuilder("IntentJudgeL")
+    fused_llm = _SyncFakeLLM({"is_question": True, "emotional_cues": ["好奇"], "intent": "clarify", "confidence": 0.8})
+
+    msg = _msg("什么意思")
+    msg.analyze_result = FusedAnalyze(fused_llm, intent_judge.build_router_input).analyze(msg.content)
+    assert msg.analyze_result.is_question is True
+    assert msg.analyze_result.emotion_cues == ["好奇"]
+    assert '"text": "什么意思"' in fused_llm.calls[0][1]["router_input"]
+
+    schema = await builder.abuild_query_schema(msg)
+    assert schema.intent == "clarify"
+    metrics = intent_judge.getMetrics()
+    assert (metrics["fused_hits"], metrics["llm_calls"]) == (1, 0)
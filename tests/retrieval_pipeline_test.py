@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from DataClass.ChatMessage import ChatMessage
+from DataClass.DialogueMessage import DialogueMessage
+from DataClass.QuerySchema import QuerySchema
+from DataClass.RetrievalHit import RetrievalHit
+from DataClass.TagType import TagType
+from MemorySystem.MemoryStore.KeywordRetriever import KeywordRetriever
+from MemorySystem.RetrievalPipeline import RetrievalPipeline
+from RawChatHistory.RawChatHistory import RawChatHistory
+from tools.TokenCounter import TokenCounter
+
+
+def _msg(text: str, role: str = "user") -> ChatMessage:
+    name, sid = ("aki", 1) if role == "user" else ("Alice", -1)
+    return ChatMessage(role=role, content=text, timestamp=0, timedate="t", sender_name=name, sender_id=sid)
+
+
+def _schema(**kw) -> QuerySchema:
+    base = dict(retrieve=True, sources=["long_term", "mid_term", "user_profile", "kb"], top_k=5, token_budget=512)
+    base.update(kw)
+    return QuerySchema(**base)
+
+
+def _pipeline(history: RawChatHistory, **kwargs) -> RetrievalPipeline:
+    kr = KeywordRetriever(history)
+    storage = SimpleNamespace(
+        keyword_retriever=kr,
+        retrieve=lambda schema, before_turn_id=None: kr.retrieve(schema, before_turn_id=before_turn_id),
+    )
+    return RetrievalPipeline(storage, **kwargs)
+
+
+def test_fans_out_dedupes_and_fits_budget(tmp_path):
+    history = RawChatHistory(5, 5, str(tmp_path / "r.db"))
+    try:
+        ids = [history.addMessage(_msg(t, r)) for t, r in [
+            ("我养了一只猫叫团子", "user"),
+            ("团子这只猫听起来很可爱", "assistant"),
+            ("今天天气不错", "user"),
+        ]]
+        history.addDialogues(DialogueMessage(start_turn_id=1, summary="用户介绍了自己的猫团子", end_turn_id=2))
+        pipeline = _pipeline(history)
+
+        hits = asyncio.run(pipeline.aretrieve(_schema(keywords=["团子", "猫"])))
+        # 用户自己的消息同时被 long_term 和 user_profile 命中，只保留一份（权重高的 user_profile）
+        assert sorted(h.key() for h in hits) == [("dialogue", 1), ("message", ids[0]), ("message", ids[1])]
+        assert next(h for h in hits if h.ref_id == ids[0] and h.kind == "message").source == "user_profile"
+        assert hits == pipeline.retrieve(_schema(keywords=["团子", "猫"]))
+
+        text = pipeline.render_text(hits)
+        assert text.strip().startswith(TagType.MEMORY_RECALL_TAG.open()) and "对话摘要 #1-2" in text
+
+        # 整个渲染块不超过预算
+        for budget in (20, 30, 45):
+            packed = pipeline.retrieve(_schema(keywords=["团子", "猫"], token_budget=budget))
+            assert TokenCounter().count(pipeline.render_text(packed)) <= budget
+        assert pipeline.retrieve(_schema(keywords=["团子"], top_k=1))[0].meta["rank_score"] >= 1.0
+
+        # before_turn_id 排除窗口内的消息（摘要不受影响）
+        hits = pipeline.retrieve(_schema(keywords=["团子"]), before_turn_id=ids[1])
+        assert sorted(h.key() for h in hits) == [("dialogue", 1), ("message", ids[0])]
+        assert pipeline.retrieve(_schema(keywords=["团子"], retrieve=False)) == []
+    finally:
+        history.sql_manager.exit()
+
+
+def test_slow_or_failing_source_does_not_block_others(tmp_path):
+    history = RawChatHistory(5, 5, str(tmp_path / "s.db"))
+    try:
+        history.addMessage(_msg("周末去爬山"))
+        pipeline = _pipeline(history, retrieval_timeout=0.2)
+
+        def slow(schema, before):
+            time.sleep(1)
+            return [RetrievalHit(source="kb", kind="message", ref_id=99, text="slow", score=1.0)]
+
+        def broken(schema, before):
+            raise RuntimeError("boom")
+
+        pipeline.register_source("kb", slow)
+        pipeline.register_source("mid_term", broken)
+        hits = asyncio.run(pipeline.aretrieve(_schema(keywords=["爬山"])))
+        assert [h.text for h in hits] == ["周末去爬山"]
+    finally:
+        history.sql_manager.exit()
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from DataClass.AnalyzeResult import AnalyzeResult
+from DataClass.ChatMessage import ChatMessage
+from DataClass.DialogueMessage import DialogueMessage
+from RawChatHistory.RawChatHistory import RawChatHistory
+from RawChatHistory.SqlitManagementSystem import SqlitManagementSystem
+
+
+def _msg(text_: str) -> ChatMessage:
+    return ChatMessage(role="user", content=text_, timestamp=0, timedate="", sender_name="aki", sender_id=1)
+
+
+@pytest.fixture
+def db(tmp_path):
+    sql = SqlitManagementSystem(str(tmp_path / "chat.db"), db_writer_max_wait_ms=20)
+    yield sql
+    sql.exit()
+
+
+def test_performance_pragmas_applied(db):
+    with db.engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+
+def test_concurrent_writes_are_group_committed(db):
+    futures = [db.submitMessage(_msg(f"m{i}")) for i in range(20)]
+    ids = [f.result(timeout=5) for f in futures]
+    assert ids == sorted(ids) and len(set(ids)) == 20
+    assert [m.content for m in db.getHistory(20)] == [f"m{i}" for i in range(20)]
+
+
+def test_failed_write_does_not_poison_batch(db):
+    def _bad(session):
+        raise ValueError("boom")
+
+    good = db.submitMessage(_msg("ok"))
+    bad = db.writer.submit(_bad)
+    assert good.result(timeout=5) > 0
+    with pytest.raises(ValueError):
+        bad.result(timeout=5)
+
+
+def test_sync_facade_writes_go_through_writer(db):
+    turn_id = db.addMessage(_msg("hi"))
+    assert db.attachAnalyze(turn_id, AnalyzeResult(keywords=["hi"]))
+    assert db.getHistory(1)[0].analyze_result.keywords == ["hi"]
+
+    dialogue_id = db.addDialogue(DialogueMessage(start_turn_id=turn_id, summary="s"))
+    db.updateDialogue(DialogueMessage(start_turn_id=turn_id, summary="s2", dialogue_id=dialogue_id,
+                                      is_completed=True, end_turn_id=turn_id))
+    d = db.getDialoguesById(dialogue_id)
+    assert (d.summary, d.is_completed, d.end_turn_id) == ("s2", True, turn_id)
+
+    assert db.deleteMessageById(turn_id)
+    assert db.getHistory(1) == []
+
+
+@pytest.mark.asyncio
+async def test_async_add_message_backfills_turn_id(tmp_path):
+    history = RawChatHistory(10, 5, str(tmp_path / "chat.db"))
+    try:
+        msgs = [_msg("a"), _msg("b")]
+        ids = await asyncio.gather(*(history.aaddMessage(m) for m in msgs))
+        assert [m.chat_turn_id for m in msgs] == list(ids)
+        assert [m.content for m in history.getHistory(2)] == ["a", "b"]
+    finally:
+        history.sql_manager.exit()
+
+
+def test_stats_use_aggregates(db):
+    for role, name, sid, ts in [("user", "aki", 1, 100), ("assistant", "Alice", -1, 200), ("user", "bob", 2, 300)]:
+        m = ChatMessage(role=role, content="x", timestamp=ts, timedate="", sender_name=name, sender_id=sid)
+        db.addMessage(m)
+    db.addDialogue(DialogueMessage(start_turn_id=1, summary="s"))
+
+    assert db.getHistoryLength() == 3
+    stats = db.getStats()
+    assert stats["message_count"] == 3
+    assert stats["by_role"] == {"assistant": 1, "user": 2}
+    assert {(r["sender_name"], r["count"]) for r in stats["by_sender"]} == {("aki", 1), ("Alice", 1), ("bob", 1)}
+    assert stats["dialogue_count"] == 1
+    assert (stats["oldest_timestamp"], stats["newest_timestamp"]) == (100, 300)
+    assert stats["db_size_bytes"] > 0
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import numpy as np
+
+from DataClass.ChatMessage import ChatMessage
+from DataClass.DialogueMessage import DialogueMessage
+from DataClass.QuerySchema import QuerySchema
+from MemorySystem.MemoryStore.HashingEmbedder import HashingEmbedder
+from MemorySystem.MemoryStore.KeywordRetriever import KeywordRetriever
+from MemorySystem.MemoryStore.TextEmbedder import TextEmbedder
+from MemorySystem.MemoryStore.VectorIndex import VectorIndex
+from MemorySystem.MemoryStore.VectorMemoryStore import VectorMemoryStore
+from RawChatHistory.RawChatHistory import RawChatHistory
+
+
+def _vecs(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    return TextEmbedder.normalize(np.random.default_rng(seed).standard_normal((n, dim)))
+
+
+def test_index_persists_and_supports_upsert_and_delete(tmp_path):
+    x = _vecs(50, 16)
+    index = VectorIndex(str(tmp_path / "v"), 16, name="t")
+    index.add(range(50), x)
+    index.add([7], x[8:9])  # 覆盖：key 7 现在与 8 相同
+    assert index.remove(3) and not index.remove(3)
+    index.flush()
+
+    reopened = VectorIndex(str(tmp_path / "v"), 16, name="t")
+    assert len(reopened) == 49 and 3 not in reopened
+    top = reopened.search(x[10], 1)
+    assert top[0][0] == 10 and abs(top[0][1] - 1.0) < 2e-2  # int8 量化误差
+    assert {k for k, _ in reopened.search(x[8], 2)} == {7, 8}
+    assert [k for k, _ in reopened.search(x[10], 3, candidates=[1, 2, 10])][0] == 10
+    assert all(k % 2 == 0 for k, _ in reopened.search(x[11], 5, key_filter=lambda keys: keys % 2 == 0))
+
+    # 换了 embedder（name / dim）时旧索引作废
+    assert len(VectorIndex(str(tmp_path / "v"), 16, name="other")) == 0
+
+
+def test_ivf_recall_matches_brute_force():
+    x = _vecs(3000, 32, seed=1)
+    exact = VectorIndex(None, 32, vector_dtype="float32", vector_train_threshold=10 ** 9)
+    ivf = VectorIndex(None, 32, vector_dtype="float32", vector_train_threshold=1000, vector_nprobe=16)
+    exact.add(range(3000), x)
+    ivf.add(range(3000), x)
+    assert ivf.getStats()["lists"] > 0
+
+    queries = _vecs(20, 32, seed=2)
+    recall = np.mean([
+        len({k for k, _ in exact.search(q, 10)} & {k for k, _ in ivf.search(q, 10)}) / 10 for q in queries
+    ])
+    assert recall >= 0.8
+
+
+def _schema(mode: str, text: str, **kw) -> QuerySchema:
+    base = dict(retrieve=True, mode=mode, query_text=text, sources=["long_term", "mid_term"], top_k=3, token_budget=256)
+    base.update(kw)
+    return QuerySchema(**base)
+
+
+def test_vector_memory_store_sync_and_retrieve(tmp_path):
+    history = RawChatHistory(10, 5, str(tmp_path / "m.db"))
+    try:
+        for text in ["今天去公园散步了", "我在用本地模型跑推理", "晚饭吃了火锅", "周末想去爬山"]:
+            history.addMessage(ChatMessage(role="user", content=text, timestamp=0, timedate="",
+                                           sender_name="aki", sender_id=1))
+        history.addDialogues(DialogueMessage(start_turn_id=1, summary="聊了周末散步和爬山的计划"))
+
+        keyword = KeywordRetriever(history)
+        store = VectorMemoryStore(history, keyword, HashingEmbedder(vector_dim=128),
+                                  vector_memory_path=str(tmp_path / "vec"))
+        assert store.sync() == 5 and store.sync() == 0
+
+        hits = store.retrieve(_schema("vector", "本地模型推理"))
+        assert (hits[0].kind, hits[0].ref_id) == ("message", 2)
+        assert all(h.ref_id < 2 for h in store.retrieve(_schema("vector", "本地模型", sources=["long_term"]),
+                                                        before_turn_id=2))
+
+        hybrid = store.retrieve(_schema("hybrid", "周末散步", keywords=["散步"]))
+        assert hybrid[0].kind == "dialogue" and hybrid[0].meta["cosine"] is not None
+
+        # 摘要更新后重新 embed；删除后不再召回
+        history.updateDialogue(DialogueMessage(start_turn_id=1, summary="讨论了吃火锅", dialogue_id=1))
+        assert store.sync() == 1
+        store.remove_message(3)
+        top = store.retrieve(_schema("vector", "火锅"))
+        assert [(h.kind, h.ref_id) for h in top][:1] == [("dialogue", 1)]
+        assert ("message", 3) not in [(h.kind, h.ref_id) for h in top]
+
+        # 重启后从水位继续，不重复 embed
+        store.index.flush()
+        reopened = VectorMemoryStore(history, keyword, HashingEmbedder(vector_dim=128),
+                                     vector_memory_path=str(tmp_path / "vec"))
+        assert reopened.sync() == 0 and len(reopened.index) == 4
+    finally:
+        history.sql_manager.exit()